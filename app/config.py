@@ -1,24 +1,96 @@
 import os
-from dotenv import load_dotenv
-
-#load environment variables from .env file
-load_dotenv()
+from typing import Optional
 
 #Frequency of scheduled task to be ran (minutes)
 TASK_FREQ = 30
 
-#Email Credentials for Email Service
+#Email Credentials for Email Service (read from the environment, load_env() adds the .env file)
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 PASSWORD = os.getenv("PASSWORD")
 
+#SMTP server emails are sent through
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+
+#send each subscriber one email per cycle listing all their new filings, instead of one email per filing
+EMAIL_DIGEST = False
+
+#emails sent at once, and emails per second each SMTP provider accepts (SMTP_RATE_LIMIT for unlisted ones)
+EMAIL_WORKERS = 4
+SMTP_RATE_LIMIT = 5
+SMTP_RATE_LIMITS = {"smtp.gmail.com": 2}
+SMTP_RATE_BURST = 4
+
+#Where emails wait until they are delivered, seconds between looks for due retries, first retry delay
+#(doubling each attempt up to the max), attempts before an email is moved to failed/, and seconds a
+#delivered email is remembered so the same filing isn't sent to the same subscriber twice
+OUTBOX_PATH = os.path.join(os.getcwd(), "data", "outbox")
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_MAX_RETRY_DELAY = 60 * 60
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_KEEP_DELIVERED = 7 * 24 * 60 * 60
+
+#rendered messages each EmailService keeps for reuse across recipients
+RENDER_CACHE_SIZE = 256
+
+#SMTP sessions kept logged in at once, messages sent on one before it is replaced,
+#and seconds a session may sit idle before it is checked with a NOOP
+SMTP_SESSIONS = EMAIL_WORKERS
+SMTP_MAX_MESSAGES = 100
+SMTP_NOOP_AFTER = 30
+
 #header for SEC Web Scraping
 HEADERS = {'User-Agent': EMAIL_ADDRESS}
 
 #URLs for SEC
 SEC_CIK_URL = "https://www.sec.gov/files/company_tickers.json"
 SEC_FILINGS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+SEC_CURRENT_FEED_URL = "https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&owner=include&start={start}&count={count}&output=atom"
 API_TIMEOUT = 30
 
+#How tickers are polled: "submissions" requests every watched CIK each cycle,
+#"feed" reads the EDGAR latest filings feed and only requests the CIKs that filed
+POLL_BACKEND = "submissions"
+#entries per feed page, most pages read per cycle, and seconds re-read before the last cycle's newest entry
+FEED_PAGE_SIZE = 100
+FEED_MAX_PAGES = 20
+FEED_OVERLAP = 5 * 60
+
+#SEC fair access limit (requests per second), requests allowed back to back and number of tickers polled at once
+SEC_RATE_LIMIT = 10
+SEC_RATE_BURST = 1
+POLL_WORKERS = 4
+
+#Ticker -> CIK lookup table (seconds before a background refresh, None to disable the on-disk copy)
+CIK_CACHE_TTL = 24 * 60 * 60
+CIK_CACHE_PATH = os.path.join(os.getcwd(), "data", "company_tickers.json")
+
+#Seconds subscriber changes are held so a burst of them is written in one go (0 writes each change straight away)
+WRITE_DELAY = 2
+
+#Size (in bytes) the JSON stores' change journals grow to before the files are rewritten (None rewrites the file on every change)
+JOURNAL_MAX_BYTES = 256 * 1024
+
+#Where subscribers and tickers are kept: "json" files or one "sqlite" database
+STORAGE_BACKEND = "json"
+DB_PATH = os.path.join(os.getcwd(), "data", "sec_watcher.db")
+
 #paths for both stores
 SUB_PATH = os.path.join(os.getcwd(), "data", "subscribers.json")
-TICK_PATH = os.path.join(os.getcwd(), "data", "tickers.json")
\ No newline at end of file
+TICK_PATH = os.path.join(os.getcwd(), "data", "tickers.json")
+
+
+def load_env(dotenv_path: Optional[str] = None) -> None:
+    """Loads the .env file into the environment and re-reads the settings taken from it
+
+    Called once by the entry points (see app.startup.init) instead of on import,
+    so importing the app for tests or maintenance commands never touches the file.
+    """
+    global EMAIL_ADDRESS, PASSWORD
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path)
+    EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
+    PASSWORD = os.getenv("PASSWORD")
+    #updated in place, modules that imported HEADERS see the new User-Agent
+    HEADERS['User-Agent'] = EMAIL_ADDRESS
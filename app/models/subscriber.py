@@ -2,20 +2,33 @@
 
 from typing import List
 import re
+import sys
 from datetime import datetime
 
-from app.services.sec_service import get_cik
+from app.services.sec_service import is_known_ticker
 
 class Subscriber:
-    """Class for creating subscriber objects"""
-    def __init__(self, email: str, name: str, tickers: List[str]):
-        self.validate_name(name)
-        self.validate_email(email)
-        self.validate_tickers(tickers)
+    """Class for creating subscriber objects
+
+    New subscribers are validated on creation. Records read back from a store
+    were validated when they were added, pass validate=False (or use
+    from_dict) to skip the checks, including the ticker table lookup.
+
+    The stores keep one of these per subscriber in memory, so it is slotted
+    (no per-instance __dict__) and its tickers are interned: every subscriber
+    of AAPL points at the same "AAPL" string instead of its own copy.
+    """
+    __slots__ = ("name", "email", "tickers")
+
+    def __init__(self, email: str, name: str, tickers: List[str], validate: bool = True):
+        if validate:
+            self.validate_name(name)
+            self.validate_email(email)
+            self.validate_tickers(tickers)
 
         self.name = name
         self.email = email
-        self.tickers = [ticker.upper() for ticker in tickers]
+        self.tickers = [sys.intern(ticker.upper()) for ticker in tickers]
 
     @staticmethod
     def validate_name(name: str) -> None:
@@ -38,24 +51,29 @@ class Subscriber:
     def validate_tickers(tickers: List[str]) -> None:
         if len(tickers) == 0:
             raise ValueError('Tickers cannot be empty')
-        for ticker in tickers:
-            cik: str = get_cik(ticker)
-            if cik == "":
-                raise ValueError('Invalid ticker')
+        #membership checks against the shared ticker table, one lookup per distinct ticker
+        invalid = [ticker for ticker in dict.fromkeys(tickers) if not is_known_ticker(ticker)]
+        if invalid:
+            raise ValueError(f"Invalid ticker: {', '.join(invalid)}")
 
     def to_dict(self) -> dict:
         return {
             'name': self.name,
             'email': self.email,
-            'tickers': self.tickers
+            'tickers': list(self.tickers)
         }
 
+    def __repr__(self) -> str:
+        return f"Subscriber(email={self.email!r}, name={self.name!r}, tickers={self.tickers!r})"
+
     @classmethod
-    def from_dict(cls, data: dict) -> 'Subscriber':
+    def from_dict(cls, data: dict, validate: bool = False) -> 'Subscriber':
+        """Builds a subscriber from a stored record, trusted unless validate is set"""
         return cls(
             name=data.get("name",""),
             email=data.get("email",""),
-            tickers=data.get("tickers",[])
+            tickers=data.get("tickers",[]),
+            validate=validate
         )
 
 
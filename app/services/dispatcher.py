@@ -0,0 +1,142 @@
+"""Sends a cycle's emails concurrently"""
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.config import EMAIL_WORKERS, SMTP_SERVER, SMTP_RATE_LIMIT, SMTP_RATE_LIMITS, SMTP_RATE_BURST, OUTBOX_POLL_INTERVAL
+from app.services.email_service import EmailService
+from app.services.rate_limiter import RateLimiter
+from app.storage.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+#one limiter per SMTP provider, shared by every cycle sending through it
+provider_limiters: Dict[str, RateLimiter] = {}
+_provider_limiters_lock = threading.Lock()
+
+
+def provider_limiter(smtp_server: str) -> RateLimiter:
+    with _provider_limiters_lock:
+        limiter = provider_limiters.get(smtp_server)
+        if limiter is None:
+            rate = SMTP_RATE_LIMITS.get(smtp_server, SMTP_RATE_LIMIT)
+            limiter = provider_limiters[smtp_server] = RateLimiter(rate=rate, burst=SMTP_RATE_BURST)
+        return limiter
+
+
+class Dispatcher:
+    """Drains a list of emails through up to `workers` sends at once
+
+    Each email is a dict with "to", "subject", "message" and optionally
+    "html". Every send first takes a token from the provider's limiter, so
+    adding workers never pushes us past what the SMTP provider accepts.
+    """
+    def __init__(self, emailer: EmailService, limiter: Optional[RateLimiter] = None,
+                 workers: int = EMAIL_WORKERS, clock: Callable[[], float] = time.monotonic):
+        self.emailer = emailer
+        self.limiter = limiter
+        self.workers = max(1, workers)
+        self._clock = clock
+
+    def send_all(self, emails: Iterable[Dict[str, str]],
+                 on_result: Optional[Callable[[Dict[str, str], bool], None]] = None) -> Dict[str, Any]:
+        """Sends every email, returns how many went out and how long they took from the start of the cycle
+
+        on_result, if given, is called with each email and whether it was sent.
+        """
+        emails = list(emails)
+        started = self._clock()
+
+        def deliver(email: Dict[str, str]) -> tuple:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            sent = self.emailer.send_email(subscriber_email=email["to"],
+                                           subject=email["subject"],
+                                           message=email["message"],
+                                           html=email.get("html"))
+            return bool(sent), self._clock() - started
+
+        latencies: List[float] = []
+        failed = 0
+        if emails:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(emails))) as pool:
+                for email, (sent, latency) in zip(emails, pool.map(deliver, emails)):
+                    latencies.append(latency)
+                    if not sent:
+                        failed += 1
+                    if on_result is not None:
+                        on_result(email, sent)
+
+        report = self._report(latencies, failed, self._clock() - started)
+        logger.info(f"Delivered {report['sent']} of {len(emails)} emails in {report['elapsed']:.2f}s "
+                    f"(latency avg {report['avg_latency']:.2f}s, p95 {report['p95_latency']:.2f}s, "
+                    f"max {report['max_latency']:.2f}s)")
+        return report
+
+    @staticmethod
+    def _report(latencies: List[float], failed: int, elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(latencies)
+        return {
+            'sent': len(ordered) - failed,
+            'failed': failed,
+            'elapsed': elapsed,
+            'avg_latency': sum(ordered) / len(ordered) if ordered else 0.0,
+            'p95_latency': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+            'max_latency': ordered[-1] if ordered else 0.0,
+        }
+
+
+class OutboxSender:
+    """Delivers the outbox in the background, so a slow SMTP server never holds up polling"""
+    def __init__(self, outbox: Outbox, workers: int = EMAIL_WORKERS, interval: float = OUTBOX_POLL_INTERVAL,
+                 emailer_factory: Callable[[], EmailService] = lambda: EmailService(sessions=EMAIL_WORKERS)):
+        self.outbox = outbox
+        self.workers = workers
+        #seconds between looks at the outbox for retries that came due
+        self.interval = interval
+        self.emailer_factory = emailer_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self.outbox.queued.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def send_due(self) -> Optional[Dict[str, Any]]:
+        """Sends every email that is due once, returns the delivery report or None if none were due"""
+        self.outbox.queued.clear()
+        due = self.outbox.due()
+        if not due:
+            return None
+
+        def on_result(email: Dict[str, Any], sent: bool) -> None:
+            if sent:
+                self.outbox.mark_sent(email)
+            else:
+                self.outbox.mark_failed(email)
+
+        emailer = self.emailer_factory()
+        try:
+            return Dispatcher(emailer, limiter=provider_limiter(SMTP_SERVER),
+                              workers=self.workers).send_all(due, on_result=on_result)
+        finally:
+            emailer.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.send_due()
+            except Exception as e:
+                #left in the outbox, tried again next round
+                logger.error(f"Error delivering the outbox: {str(e)}")
+            self.outbox.queued.wait(self.interval)
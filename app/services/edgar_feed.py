@@ -0,0 +1,108 @@
+"""EDGAR latest filings feed"""
+import re
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from app.config import SEC_CURRENT_FEED_URL, FEED_PAGE_SIZE, FEED_MAX_PAGES, FEED_OVERLAP
+from app.services import sec_service
+
+logger = logging.getLogger(__name__)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+CIK_PATTERN = re.compile(r"\((\d{10})\)")
+ACCESSION_PATTERN = re.compile(r"accession-number=(\d{10}-\d{2}-\d{6})")
+
+
+def parse_feed(xml_text: str) -> List[Dict[str, str]]:
+    """Returns the entries of one feed page, newest first
+
+    Each entry has the filer's zero padded cik, form, accessionNumber and the
+    updated timestamp. A filing made by an insider is listed twice, once
+    for the reporting owner and once for the issuer.
+    """
+    if not xml_text.strip():
+        return []
+    entries = []
+    for entry in ET.fromstring(xml_text).iter(f"{ATOM}entry"):
+        cik = CIK_PATTERN.search(entry.findtext(f"{ATOM}title", ""))
+        accession = ACCESSION_PATTERN.search(entry.findtext(f"{ATOM}id", ""))
+        category = entry.find(f"{ATOM}category")
+        if cik is None or accession is None:
+            continue
+        entries.append({
+            "cik": cik.group(1),
+            "form": category.get("term", "") if category is not None else "",
+            "accessionNumber": accession.group(1),
+            "updated": entry.findtext(f"{ATOM}updated", "")
+        })
+    return entries
+
+
+def fetch_page(start: int, count: int) -> str:
+    """Downloads one page of the feed through the shared SEC client"""
+    return sec_service.sec_client.get(SEC_CURRENT_FEED_URL.format(start=start, count=count)).text
+
+
+class EdgarFeed:
+    """Tells which CIKs filed since the previous cycle from the latest filings feed
+
+    Pages are read newest first until they reach the newest entry seen last
+    cycle, less `overlap` seconds so filings the submissions endpoint had not
+    picked up yet get another look. When that point can't be reached (the
+    first cycle, or more filings than max_pages holds) changed_ciks returns
+    None and the caller has to poll everything. The newest entry read only
+    becomes the next cycle's starting point once the caller has polled and
+    saved what it was told and calls commit(), so a failed cycle is read again.
+    """
+    def __init__(self, fetch: Callable[[int, int], str] = fetch_page, page_size: int = FEED_PAGE_SIZE,
+                 max_pages: int = FEED_MAX_PAGES, overlap: float = FEED_OVERLAP,
+                 since: Optional[datetime] = None):
+        self.fetch = fetch
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.overlap = timedelta(seconds=overlap)
+        self.since = since
+        #newest entry read by the last changed_ciks, waiting for commit()
+        self._pending_since: Optional[datetime] = None
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'EdgarFeed':
+        """Replays a recorded feed page, for tests and dry runs"""
+        with open(path, 'r') as f:
+            xml_text = f.read()
+        return cls(fetch=lambda start, count: xml_text if start == 0 else "", **kwargs)
+
+    def changed_ciks(self) -> Optional[Set[str]]:
+        """Returns the CIKs with filings since the last call, None if the feed can't tell"""
+        ciks: Set[str] = set()
+        newest: Optional[datetime] = None
+        stop_at = self.since - self.overlap if self.since is not None else None
+        covered = False
+
+        for page in range(self.max_pages):
+            entries = parse_feed(self.fetch(page * self.page_size, self.page_size))
+            for entry in entries:
+                updated = datetime.fromisoformat(entry["updated"])
+                newest = max(newest, updated) if newest is not None else updated
+                if stop_at is not None and updated < stop_at:
+                    covered = True
+                    break
+                ciks.add(entry["cik"])
+            #a short page means the feed has nothing older to give
+            if covered or len(entries) < self.page_size:
+                break
+
+        self._pending_since = newest
+        if not covered:
+            logger.info("Latest filings feed does not reach back to the last cycle, polling every CIK")
+            return None
+        logger.info(f"Latest filings feed lists {len(ciks)} CIKs since the last cycle")
+        return ciks
+
+    def commit(self) -> None:
+        """Moves the next cycle's starting point to the newest entry of the last changed_ciks call"""
+        if self._pending_since is not None:
+            self.since = max(self.since, self._pending_since) if self.since is not None else self._pending_since
+            self._pending_since = None
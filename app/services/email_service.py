@@ -2,20 +2,49 @@
 
 import smtplib
 import os
+import time
+import threading
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from app.config import EMAIL_ADDRESS,PASSWORD
+from typing import List, Optional, Tuple
+from app import config
+from app.config import SMTP_SERVER,SMTP_PORT,SMTP_SESSIONS,SMTP_MAX_MESSAGES,SMTP_NOOP_AFTER,RENDER_CACHE_SIZE
 
 logger = logging.getLogger(__name__)
 
+
+class SMTPSession:
+    """An authenticated connection and how much it has been used"""
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
 class EmailService:
-    def __init__(self, smtp_server='smtp.gmail.com', smtp_port=587):
+    def __init__(self, smtp_server=SMTP_SERVER, smtp_port=SMTP_PORT, sessions: int = SMTP_SESSIONS,
+                 max_messages: int = SMTP_MAX_MESSAGES, noop_after: float = SMTP_NOOP_AFTER):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
-        self.email_address = EMAIL_ADDRESS
-        self.password = PASSWORD
+        #read when the service is built, so credentials loaded by load_env() are picked up
+        self.email_address = config.EMAIL_ADDRESS
+        self.password = config.PASSWORD
+        #logged in sessions are kept open between sends: at most `sessions` at once,
+        #each retired after `max_messages`, and checked with a NOOP before reuse
+        #once idle for `noop_after` seconds
+        self.max_messages = max_messages
+        self.noop_after = noop_after
+        self._slots = threading.BoundedSemaphore(max(1, sessions))
+        self._idle: List[SMTPSession] = []
+        self._idle_lock = threading.Lock()
+        #serialized messages without a To header, most recently used last; every
+        #subscriber of a filing gets the same one with only their To line added
+        self.render_cache_size = RENDER_CACHE_SIZE
+        self._rendered: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._rendered_lock = threading.Lock()
 
     def connect(self):
         server = smtplib.SMTP(self.smtp_server, self.smtp_port)
@@ -23,32 +52,102 @@ class EmailService:
         server.login(self.email_address, self.password)
         return server
 
-    def send_email(self, subscriber_email, subject, message, is_html=True) -> bool:
+    def send_email(self, subscriber_email, subject, message, is_html=True, html: Optional[str] = None) -> bool:
+        """Sends message as plain text, with html (or the message itself) as the HTML alternative if is_html"""
         try:
-            server = self.connect()
-
-            #email format
-            email_message = MIMEMultipart("alternative")
-            email_message['From'] = self.email_address
-            email_message['To'] = subscriber_email
-            email_message['Subject'] = subject
-
-            text_part = MIMEText(message, "plain")
-
-            if is_html:
-                html_part = MIMEText(message, "html")
-                email_message.attach(text_part)
-                email_message.attach(html_part)
-
-            server.sendmail(self.email_address, subscriber_email, email_message.as_string())
-            server.quit()
+            email_text = f"To: {subscriber_email}\n" + self.render(subject, message, html if is_html else None, is_html)
+            self._send(subscriber_email, email_text)
             logger.info(f"Email sent successfully to {subscriber_email} for {subject}")
             return True
         except Exception as e:
             logger.error(f"Error sending email: {str(e)}")
             return False
 
+    def render(self, subject: str, message: str, html: Optional[str] = None, is_html: bool = True) -> str:
+        """Returns the serialized message without its To header, built once per distinct content"""
+        key = (subject, message, html, is_html)
+        with self._rendered_lock:
+            email_text = self._rendered.get(key)
+            if email_text is not None:
+                self._rendered.move_to_end(key)
+                return email_text
+
+        #email format
+        email_message = MIMEMultipart("alternative")
+        email_message['From'] = self.email_address
+        email_message['Subject'] = subject
 
-emailer = EmailService()
+        email_message.attach(MIMEText(message, "plain"))
+        if is_html:
+            email_message.attach(MIMEText(html if html is not None else message, "html"))
+        email_text = email_message.as_string()
+
+        with self._rendered_lock:
+            self._rendered[key] = email_text
+            while len(self._rendered) > self.render_cache_size:
+                self._rendered.popitem(last=False)
+        return email_text
+
+    def close(self) -> None:
+        """Logs out of every idle session"""
+        with self._idle_lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._quit(session)
+
+    def _send(self, recipient: str, email_text: str) -> None:
+        with self._slots:
+            for attempt in range(2):
+                session = self._checkout()
+                try:
+                    session.server.sendmail(self.email_address, recipient, email_text)
+                except smtplib.SMTPServerDisconnected:
+                    #the server dropped a session that looked alive, log in again once
+                    self._quit(session)
+                    if attempt:
+                        raise
+                    logger.info(f"SMTP session to {self.smtp_server} was closed, reconnecting")
+                    continue
+                except smtplib.SMTPException:
+                    #refused recipients and the like leave the session usable
+                    self._checkin(session)
+                    raise
+                except Exception:
+                    self._quit(session)
+                    raise
+                session.messages_sent += 1
+                self._checkin(session)
+                return
+
+    def _checkout(self) -> SMTPSession:
+        """Returns an idle session that still answers, or a new one"""
+        while True:
+            with self._idle_lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return SMTPSession(self.connect())
+            if time.monotonic() - session.last_used < self.noop_after:
+                return session
+            try:
+                if session.server.noop()[0] == 250:
+                    return session
+            except (smtplib.SMTPException, OSError):
+                pass
+            logger.info(f"Dropping stale SMTP session to {self.smtp_server}")
+            self._quit(session)
+
+    def _checkin(self, session: SMTPSession) -> None:
+        if session.messages_sent >= self.max_messages:
+            self._quit(session)
+            return
+        session.last_used = time.monotonic()
+        with self._idle_lock:
+            self._idle.append(session)
+
+    @staticmethod
+    def _quit(session: SMTPSession) -> None:
+        try:
+            session.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
 
-emailer.send_email(subscriber_email=emailer.email_address,subject="Test Email",message="This is a test email")
@@ -0,0 +1,65 @@
+"""Token bucket rate limiter"""
+import threading
+import time
+from typing import Callable, Dict
+
+
+class RateLimiter:
+    """Token bucket shared by every caller of a rate limited service
+
+    Tokens refill at `rate` per second up to `burst`. acquire() takes one
+    token and sleeps until it is due, so callers are released in the order
+    they asked. The wait counters show how close to the limit we run.
+    """
+    def __init__(self, rate: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        if burst < 1:
+            raise ValueError('Burst must be at least 1')
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self.reset_stats()
+
+    def acquire(self) -> float:
+        """Takes one token, returns how many seconds the caller waited for it"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            #a negative balance reserves the next token for this caller
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the wait counters since the last reset"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'max_wait': self.max_wait,
+                'avg_wait': self.wait_time / self.requests if self.requests else 0.0
+            }
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
@@ -1,43 +1,309 @@
 """SEC API Integration"""
+import json
+import os
+import threading
+import zipfile
+import time
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
 import requests as r
-import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from app.config import (HEADERS,SEC_CIK_URL,SEC_FILINGS_URL,API_TIMEOUT,CIK_CACHE_TTL,CIK_CACHE_PATH,
+                        SEC_RATE_LIMIT,SEC_RATE_BURST,POLL_WORKERS)
+from app.services.rate_limiter import RateLimiter
+
+#pandas is only needed to build filings DataFrames, import it there rather than on every startup
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+#wait before retrying a failed background refresh of the ticker table (seconds)
+CIK_RETRY_DELAY = 5 * 60
+
+#insider transaction forms left out of the filings we notify on
+INSIDER_FORMS = frozenset({"3","3/A","4","4/A","5","5/A"})
+
+
+class SECClient:
+    """Keep-alive HTTP client for sec.gov
+
+    One pooled requests.Session carries the SEC headers and gzip encoding,
+    so connections to www.sec.gov and data.sec.gov are reused across polls.
+    Every request first takes a token from the shared rate limiter.
+    """
+    def __init__(self, limiter: RateLimiter, pool_size: int = POLL_WORKERS, timeout: float = API_TIMEOUT):
+        self.limiter = limiter
+        self.timeout = timeout
+        #url -> ETag / Last-Modified of the last copy we parsed
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._validators_lock = threading.Lock()
+        self.session = r.Session()
+        self.update_headers(HEADERS)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        #one pool per host, big enough for every polling worker to keep its connection
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def update_headers(self, headers: Dict[str, Optional[str]]) -> None:
+        """Sets headers on every later request, e.g. the User-Agent once the .env file is loaded"""
+        #requests drops None headers per call but not on a session
+        self.session.headers.update({k: v for k, v in headers.items() if v is not None})
+
+    def get(self, url: str, **kwargs) -> r.Response:
+        """GET against sec.gov, waiting for the rate limiter first"""
+        self.limiter.acquire()
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, url: str, **kwargs) -> Any:
+        return self.get(url, **kwargs).json()
+
+    def get_json_if_modified(self, url: str) -> Optional[Any]:
+        """Conditional GET, returns None without parsing anything if the SEC answers 304"""
+        with self._validators_lock:
+            validators = self._validators.get(url, {})
+        headers = {}
+        if "ETag" in validators:
+            headers['If-None-Match'] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers['If-Modified-Since'] = validators["Last-Modified"]
+
+        response = self.get(url, headers=headers)
+        if response.status_code == 304:
+            return None
+        data = response.json()
+
+        validators = {key: response.headers[key] for key in ("ETag", "Last-Modified") if key in response.headers}
+        with self._validators_lock:
+            if validators:
+                self._validators[url] = validators
+            else:
+                self._validators.pop(url, None)
+        return data
+
+    def clear_validators(self) -> None:
+        """Forgets every ETag / Last-Modified so the next requests fetch full copies"""
+        with self._validators_lock:
+            self._validators.clear()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+#every request to sec.gov goes through this one limiter and client
+sec_limiter = RateLimiter(rate=SEC_RATE_LIMIT, burst=SEC_RATE_BURST)
+sec_client = SECClient(sec_limiter)
+
+
+class CIKMap:
+    """Process-wide ticker -> CIK lookup table built from company_tickers.json
+
+    The table is downloaded once (or read back from cache_path), kept as a
+    plain dict and refreshed on a background thread once it is older than ttl.
+    Lookups keep being answered from the old table while it refreshes.
+    """
+    def __init__(self, ttl: float = CIK_CACHE_TTL, cache_path: Optional[str] = CIK_CACHE_PATH):
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self._ciks: Dict[str, int] = {}
+        self._next_refresh: float = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def get(self, ticker: str) -> Optional[int]:
+        """Returns the CIK for the ticker, or None if the SEC does not know it"""
+        if not self._ciks:
+            self._load()
+        elif self.is_stale():
+            self._refresh_in_background()
+        return self._ciks.get(ticker.upper())
+
+    def __contains__(self, ticker: str) -> bool:
+        """O(1) check that the SEC knows the ticker, the table is only downloaded on first use"""
+        return self.get(ticker) is not None
 
-from app.config import HEADERS,SEC_CIK_URL,SEC_FILINGS_URL
+    def is_stale(self) -> bool:
+        return time.time() >= self._next_refresh
+
+    def refresh(self) -> None:
+        """Downloads company_tickers.json and swaps in the new table"""
+        data = sec_client.get_json(SEC_CIK_URL)
+        ciks: Dict[str, int] = {}
+        for row in data.values():
+            #keep the first listing, the SEC orders them by relevance
+            ciks.setdefault(str(row["ticker"]).upper(), int(row["cik_str"]))
+        self._ciks = ciks
+        self._next_refresh = time.time() + self.ttl
+        self._save_to_disk()
+        logger.info(f"Loaded {len(ciks)} tickers from {SEC_CIK_URL}")
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._ciks:
+                return
+            self._load_from_disk()
+            if self._ciks and not self.is_stale():
+                return
+            try:
+                self.refresh()
+            except (r.RequestException, ValueError) as e:
+                if not self._ciks:
+                    raise
+                logger.warning(f"Using stale ticker table from {self.cache_path}: {str(e)}")
+                self._next_refresh = time.time() + min(self.ttl, CIK_RETRY_DELAY)
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._background_refresh,
+                                                    name="cik-map-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing ticker table: {str(e)}")
+            self._next_refresh = time.time() + min(self.ttl, CIK_RETRY_DELAY)
+
+    def _load_from_disk(self) -> None:
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                self._ciks = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ticker table {self.cache_path}: {str(e)}")
+            return
+        self._next_refresh = os.path.getmtime(self.cache_path) + self.ttl
+
+    def _save_to_disk(self) -> None:
+        if self.cache_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._ciks, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save ticker table to {self.cache_path}: {str(e)}")
+
+
+#shared by every lookup in the process
+cik_map = CIKMap()
 
 def get_cik(ticker: str,lead_zeros: bool = True) -> str:
     """Returns CIK for the input ticker"""
-    df_tickers = r.get(SEC_CIK_URL,headers=HEADERS).json()
-    df_tickers = pd.DataFrame.from_dict(df_tickers, orient='index')
-    df_filtered = df_tickers[df_tickers['ticker'] == ticker]
-    if df_filtered.empty:
+    cik = cik_map.get(ticker)
+    if cik is None:
         return ""
-    cik = str(df_filtered['cik_str'].iloc[0])
     if lead_zeros:
-        if len(cik) < 10:
-            leading_zeros = 10 - len(cik)
-            for i in range(leading_zeros):
-                cik = '0' + cik
-    return cik
-
-def get_filings(ticker: str,exclude_insider: bool = True) -> pd.DataFrame:
-    cik = get_cik(ticker)
-    # filings = r.get(SEC_FILINGS_URL.format(cik),headers=HEADERS).json()
-    filings = r.get(SEC_FILINGS_URL.format(cik=cik),headers=HEADERS).json()
-    filings = pd.DataFrame.from_dict(filings['filings']['recent'])
+        return str(cik).zfill(10)
+    return str(cik)
+
+def is_known_ticker(ticker: str) -> bool:
+    """Returns True if the ticker is listed in the shared ticker -> CIK table"""
+    return ticker in cik_map
+
+def get_filings(ticker: str,exclude_insider: bool = True) -> "pd.DataFrame":
+    return get_filings_by_cik(get_cik(ticker), exclude_insider)
+
+def get_filings_by_cik(cik: str,exclude_insider: bool = True) -> "pd.DataFrame":
+    """Returns recent filings for an already resolved (zero padded) CIK"""
+    return filings_frame(get_submissions(cik), exclude_insider)
+
+def get_submissions(cik: str, conditional: bool = False) -> Optional[dict]:
+    """Returns the raw submissions JSON for a CIK
+
+    With conditional=True the request carries the validators of the last copy
+    fetched for this CIK, and None is returned when it has not changed since.
+    """
+    url = SEC_FILINGS_URL.format(cik=cik)
+    if conditional:
+        return sec_client.get_json_if_modified(url)
+    return sec_client.get_json(url)
+
+def filings_frame(submissions: dict,exclude_insider: bool = True) -> "pd.DataFrame":
+    """Builds the recent filings DataFrame out of a submissions JSON"""
+    import pandas as pd
+
+    filings = pd.DataFrame.from_dict(submissions['filings']['recent'])
 
     #convert the two date fields into datetime objects
     filings['filingDate'] = pd.to_datetime(filings['filingDate'])
     filings['reportDate'] = pd.to_datetime(filings['reportDate'])
 
     if exclude_insider:
-        insider_forms: list = ["3","3/A","4","4/A","5","5/A"]
-        filings = filings[~filings["form"].isin(insider_forms)]
+        filings = filings[~filings["form"].isin(list(INSIDER_FORMS))]
 
     return filings
 
+def filings_since(submissions: dict,last_accession: str,last_date: str = "",
+                  exclude_insider: bool = True) -> List[Dict[str, Any]]:
+    """Returns every filing newer than last_accession, oldest first
+
+    Scans filings.recent from the newest entry and stops at last_accession,
+    or at the first filing dated before last_date if the stored one has
+    dropped out of the recent list, so the work is O(new filings). Without
+    a date to stop at, an accession that can't be found only yields the
+    newest filing rather than the whole history.
+    """
+    recent = submissions['filings']['recent']
+    accessions = recent.get('accessionNumber', [])
+    filings = []
+    found_boundary = False
+    for i, accession in enumerate(accessions):
+        if accession == last_accession or (last_date and recent['filingDate'][i] < last_date):
+            found_boundary = True
+            break
+        if exclude_insider and recent['form'][i] in INSIDER_FORMS:
+            continue
+        filings.append({column: values[i] for column, values in recent.items()})
+
+    if not found_boundary and not last_date:
+        filings = filings[:1]
+    filings.reverse()
+    return filings
+
+def latest_filing(submissions: dict,exclude_insider: bool = True) -> Optional[Dict[str, Any]]:
+    """Returns the newest filing of a submissions JSON as a dict, None if there is none
+
+    Scans the parallel arrays of filings.recent (newest first) and stops at
+    the first qualifying form, without building a DataFrame. Dates are left
+    as the ISO strings the SEC sends.
+    """
+    recent = submissions['filings']['recent']
+    for i, form in enumerate(recent.get('form', [])):
+        if exclude_insider and form in INSIDER_FORMS:
+            continue
+        return {column: values[i] for column, values in recent.items()}
+    return None
+
 def check_new_filings(cik: str ) -> bool:
     filings = get_filings(cik)
     if filings.empty:
         return False
     else:
-        return True
\ No newline at end of file
+        return True
+
+def read_bulk_submissions(zip_path: str, ciks: Iterable[str]) -> Iterator[Tuple[str, dict]]:
+    """Yields (cik, submissions JSON) for each CIK found in a local copy of submissions.zip
+
+    Only the central directory and the members for the given CIKs are read,
+    the rest of the archive is never extracted.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        names = set(archive.namelist())
+        for cik in ciks:
+            name = f"CIK{cik}.json"
+            if name not in names:
+                continue
+            with archive.open(name) as f:
+                yield cik, json.load(f)
@@ -0,0 +1,44 @@
+"""Text and HTML bodies of filing notifications"""
+from html import escape
+from typing import Any, Dict, List, Tuple
+from urllib.parse import quote
+
+FILING_LINK = "https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type={form}&owner=include&count=40"
+
+#metadata shown for each filing, in order, when the SEC sent it
+FILING_FIELDS = [
+    ("form", "Form"),
+    ("primaryDocDescription", "Description"),
+    ("filingDate", "Filed"),
+    ("reportDate", "Period"),
+    ("items", "Items"),
+    ("accessionNumber", "Accession number"),
+]
+
+TEXT_BLOCK = "New {ticker} filing\n{fields}\n{link}"
+HTML_BLOCK = ('<h3 style="margin:16px 0 4px">New {ticker} filing</h3>'
+              '<table style="border-collapse:collapse">{rows}</table>'
+              '<p style="margin:4px 0 16px"><a href="{link}">View on EDGAR</a></p>')
+HTML_ROW = '<tr><td style="padding:2px 12px 2px 0;color:#555">{label}</td><td style="padding:2px 0">{value}</td></tr>'
+HTML_PAGE = '<html><body style="font-family:Arial,sans-serif;font-size:14px">{blocks}</body></html>'
+
+
+def render_filing(ticker: str, filing: Dict[str, Any]) -> Tuple[str, str]:
+    """Returns the text and HTML block describing one filing"""
+    fields = [(label, str(filing[name])) for name, label in FILING_FIELDS
+              if name in filing and filing[name] not in ("", None)]
+    link = FILING_LINK.format(ticker=quote(ticker), form=quote(str(filing.get("form", ""))))
+    text = TEXT_BLOCK.format(ticker=ticker,
+                             fields="\n".join(f"{label}: {value}" for label, value in fields),
+                             link=link)
+    html = HTML_BLOCK.format(ticker=escape(ticker),
+                             rows="".join(HTML_ROW.format(label=escape(label), value=escape(value))
+                                          for label, value in fields),
+                             link=escape(link))
+    return text, html
+
+
+def render_page(blocks: List[Tuple[str, str]]) -> Tuple[str, str]:
+    """Joins rendered filing blocks into one email's text and HTML bodies"""
+    return ("\n\n".join(text for text, _ in blocks),
+            HTML_PAGE.format(blocks="".join(html for _, html in blocks)))
@@ -0,0 +1,21 @@
+"""Explicit startup for the entry points
+
+Importing the app has no side effects: no .env file is read, no SMTP login
+is made and pandas is only imported once a filings DataFrame is built.
+main.py and manage.py call init() before doing any work instead.
+"""
+import logging
+from typing import Optional
+
+from app import config
+from app.services import sec_service
+
+logger = logging.getLogger(__name__)
+
+
+def init(dotenv_path: Optional[str] = None) -> None:
+    """Loads the .env file and hands its settings to the already created SEC client"""
+    config.load_env(dotenv_path)
+    sec_service.sec_client.update_headers(config.HEADERS)
+    if not config.EMAIL_ADDRESS:
+        logger.warning("EMAIL_ADDRESS is not set, emails can't be sent and SEC requests have no User-Agent")
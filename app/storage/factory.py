@@ -0,0 +1,21 @@
+"""Builds the configured ticker and subscriber stores"""
+from typing import Optional, Tuple
+
+from app.services.edgar_feed import EdgarFeed
+from app.storage.sub_store import SubStore
+from app.storage.ticker_store import TickerStore
+from app.config import STORAGE_BACKEND, DB_PATH, SUB_PATH, TICK_PATH, WRITE_DELAY, JOURNAL_MAX_BYTES
+
+
+def open_stores(backend: str = STORAGE_BACKEND, feed: Optional[EdgarFeed] = None) -> Tuple[TickerStore, SubStore]:
+    if backend == "sqlite":
+        #imported here so the JSON backend never loads sqlite3
+        from app.storage.sqlite_store import SQLiteDatabase, SQLiteTickerStore, SQLiteSubStore
+        db = SQLiteDatabase(DB_PATH)
+        tick_list = SQLiteTickerStore(db, feed=feed)
+        return tick_list, SQLiteSubStore(db, ticker_store=tick_list)
+    if backend == "json":
+        tick_list = TickerStore(file_path=TICK_PATH, feed=feed, journal_max_bytes=JOURNAL_MAX_BYTES)
+        return tick_list, SubStore(file_path=SUB_PATH, ticker_store=tick_list, write_delay=WRITE_DELAY,
+                                   journal_max_bytes=JOURNAL_MAX_BYTES)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,48 @@
+"""Lock held across a store's read-modify-write, shared with other processes"""
+import os
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock on a lock file next to a store
+
+    Other processes (e.g. manage.py next to the scheduler) wait on it through
+    flock(); threads of this process wait on an RLock, so the thread holding it
+    can take it again. Where fcntl is missing only threads are kept out.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> 'FileLock':
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            #closing the descriptor releases the flock
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
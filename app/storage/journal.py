@@ -0,0 +1,88 @@
+"""Append-only mutation log kept next to a store's JSON snapshot"""
+import os
+import json
+import tempfile
+import logging
+from typing import Any, Dict, List
+
+from app.storage.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Newline-delimited JSON entries appended after the last snapshot of a store
+
+    Entries must be safe to apply twice: a crash after a snapshot is written but
+    before the journal is cleared replays them over a snapshot that has them.
+    """
+    def __init__(self, file_path: str, max_bytes: int):
+        self.file_path = file_path
+        #once the journal grows past this the store writes a new snapshot and clears it
+        self.max_bytes = max_bytes
+        #held by every append and clear, and by stores around a read-snapshot-then-clear,
+        #so an entry another process appends in between isn't cleared unread
+        self.lock = FileLock(file_path + ".lock")
+        self._repair()
+
+    def append(self, *entries: Dict[str, Any]) -> None:
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        with self.lock, open(self.file_path, 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.file_path):
+            return []
+        with open(self.file_path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.file_path)
+        except OSError:
+            return 0
+
+    def needs_compaction(self) -> bool:
+        return self.size() >= self.max_bytes
+
+    def clear(self) -> None:
+        with self.lock:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'w') as f:
+                    os.fsync(f.fileno())
+
+    def rewrite(self, entries: List[Dict[str, Any]]) -> None:
+        """Atomically replaces the journal with the given entries"""
+        with self.lock:
+            self._rewrite(entries)
+
+    def _rewrite(self, entries: List[Dict[str, Any]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.file_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _repair(self) -> None:
+        """Drops a last line torn by a crash mid-append, so the next append starts on a fresh line"""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, 'rb+') as f:
+            data = f.read()
+            if not data or data.endswith(b"\n"):
+                return
+            keep = data.rfind(b"\n") + 1
+            logger.warning(f"Dropping {len(data) - keep} bytes of a torn entry at the end of {self.file_path}")
+            f.truncate(keep)
+            os.fsync(f.fileno())
@@ -0,0 +1,34 @@
+"""Crash-safe JSON file writes shared by the stores"""
+import os
+import json
+import tempfile
+from typing import Any
+
+
+def write_json_atomic(file_path: str, data: Any) -> None:
+    """Replaces file_path with data so readers only ever see the old or the new file
+
+    The data is written and fsynced to a temp file in the same directory, which
+    is then renamed over the original; a crash part way leaves the old file intact.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    #the rename itself only survives a power loss once the directory is synced
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,208 @@
+"""Durable queue of emails waiting to be delivered"""
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Any, Callable, Dict, Iterable, List
+
+from app.config import OUTBOX_RETRY_DELAY, OUTBOX_MAX_RETRY_DELAY, OUTBOX_MAX_ATTEMPTS, OUTBOX_KEEP_DELIVERED
+from app.storage.json_file import write_json_atomic
+from app.storage.journal import Journal
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """Emails spooled to disk until they are delivered
+
+    Queued emails are appended to queue.log, one append and one fsync per
+    enqueue however many emails it holds, so a crash loses nothing that was
+    queued. A rendered body (subject, text and html) is stored once and the
+    emails sharing it only carry its id. Emails carry an idempotency "key"
+    (accession number and subscriber): a key that is already pending or was
+    delivered within keep_delivered seconds is not queued again. Failed sends
+    are retried with exponential backoff and moved to failed/ after
+    max_attempts.
+    """
+    def __init__(self, dir_path: str, retry_delay: float = OUTBOX_RETRY_DELAY,
+                 max_retry_delay: float = OUTBOX_MAX_RETRY_DELAY, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 keep_delivered: float = OUTBOX_KEEP_DELIVERED, clock: Callable[[], float] = time.time):
+        self.dir_path = dir_path
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.keep_delivered = keep_delivered
+        self._clock = clock
+        self._lock = threading.Lock()
+        #set whenever an email is queued, so a waiting sender wakes up
+        self.queued = threading.Event()
+
+        self._failed_dir = os.path.join(dir_path, "failed")
+        os.makedirs(self._failed_dir, exist_ok=True)
+        self._delivered_log = Journal(os.path.join(dir_path, "delivered.log"), max_bytes=1024 * 1024)
+        self._queue_log = Journal(os.path.join(dir_path, "queue.log"), max_bytes=1024 * 1024)
+        self._delivered: Dict[str, float] = {entry["key"]: entry["at"] for entry in self._delivered_log.entries()}
+
+        #pending emails by key without their body, and the bodies they share by id
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._bodies: Dict[str, Dict[str, Any]] = {}
+        for entry in self._queue_log.entries():
+            if entry["op"] == "body":
+                self._bodies[entry["id"]] = entry["body"]
+            elif entry["op"] == "queued":
+                if entry["email"]["key"] not in self._delivered:
+                    self._pending[entry["email"]["key"]] = entry["email"]
+            elif entry["op"] == "retry":
+                if entry["key"] in self._pending:
+                    self._pending[entry["key"]].update(attempts=entry["attempts"], next_attempt=entry["next_attempt"])
+            elif entry["op"] == "done":
+                self._pending.pop(entry["key"], None)
+        self._migrate_pending_dir(os.path.join(dir_path, "pending"))
+
+    def enqueue(self, emails: Iterable[Dict[str, str]]) -> int:
+        """Spools emails with "key", "to", "subject" and "message", returns how many were new"""
+        now = self._clock()
+        with self._lock:
+            queued = self._spool(self._queue_entries(emails, now))
+        if queued:
+            logger.info(f"Queued {queued} emails in {self.dir_path}")
+            self.queued.set()
+        return queued
+
+    def due(self) -> List[Dict[str, Any]]:
+        """Pending emails whose next attempt has come, oldest first"""
+        now = self._clock()
+        with self._lock:
+            due = [dict(email, **self._bodies[email["body"]])
+                   for email in self._pending.values() if email["next_attempt"] <= now]
+        return sorted(due, key=lambda email: email["created"])
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def mark_sent(self, email: Dict[str, Any]) -> None:
+        now = self._clock()
+        with self._lock:
+            #recorded before it leaves the queue, a crash in between can't send it twice
+            self._delivered_log.append({"key": email["key"], "at": now})
+            self._delivered[email["key"]] = now
+            self._pending.pop(email["key"], None)
+            if not self._pending:
+                #nothing left to replay, the queue starts over
+                self._queue_log.clear()
+                self._bodies = {}
+            elif self._queue_log.needs_compaction():
+                self._compact_queue()
+            if self._delivered_log.needs_compaction():
+                self._compact(now)
+
+    def mark_failed(self, email: Dict[str, Any]) -> None:
+        now = self._clock()
+        with self._lock:
+            attempts = email["attempts"] + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Giving up on email {email['key']} to {email['to']} after {attempts} attempts")
+                write_json_atomic(self._path(self._failed_dir, email["key"]), dict(email, attempts=attempts))
+                self._queue_log.append({"op": "done", "key": email["key"]})
+                self._pending.pop(email["key"], None)
+                return
+            next_attempt = now + min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+            self._queue_log.append({"op": "retry", "key": email["key"], "attempts": attempts,
+                                    "next_attempt": next_attempt})
+            if email["key"] in self._pending:
+                self._pending[email["key"]].update(attempts=attempts, next_attempt=next_attempt)
+
+    def _queue_entries(self, emails: Iterable[Dict[str, str]], now: float) -> List[Dict[str, Any]]:
+        """Journal entries for the emails not already pending or delivered, each new body once"""
+        entries: List[Dict[str, Any]] = []
+        #emails rendered once per filing share their strings, so this lookup is cheap
+        body_ids: Dict[tuple, str] = {}
+        keys = set()
+        for email in emails:
+            key = email["key"]
+            if key in self._pending or key in self._delivered or key in keys:
+                continue
+            keys.add(key)
+            content = (email["subject"], email["message"], email.get("html"))
+            body_id = body_ids.get(content)
+            if body_id is None:
+                body_id = body_ids[content] = hashlib.sha256(
+                    json.dumps(content).encode()).hexdigest()[:32]
+                if body_id not in self._bodies:
+                    body = {"subject": email["subject"], "message": email["message"]}
+                    if email.get("html") is not None:
+                        body["html"] = email["html"]
+                    entries.append({"op": "body", "id": body_id, "body": body})
+            entries.append({"op": "queued", "email": {"key": key, "to": email["to"], "body": body_id,
+                                                      "attempts": 0, "next_attempt": now, "created": now}})
+        return entries
+
+    def _spool(self, entries: List[Dict[str, Any]]) -> int:
+        """Appends queue entries in one go and applies them, returns how many emails they queued"""
+        if not entries:
+            return 0
+        self._queue_log.append(*entries)
+        queued = 0
+        for entry in entries:
+            if entry["op"] == "body":
+                self._bodies[entry["id"]] = entry["body"]
+            else:
+                self._pending[entry["email"]["key"]] = entry["email"]
+                queued += 1
+        return queued
+
+    def _migrate_pending_dir(self, pending_dir: str) -> None:
+        """Moves emails spooled one file each by older versions into the queue"""
+        if not os.path.isdir(pending_dir):
+            return
+        names = sorted(name for name in os.listdir(pending_dir) if name.endswith(".json"))
+        spooled = []
+        for name in names:
+            with open(os.path.join(pending_dir, name), 'r') as f:
+                spooled.append(json.load(f))
+        for email in sorted(spooled, key=lambda email: email["created"]):
+            entries = self._queue_entries([email], email["created"])
+            for entry in entries:
+                if entry["op"] == "queued":
+                    entry["email"].update(attempts=email["attempts"], next_attempt=email["next_attempt"])
+            self._spool(entries)
+        for name in names:
+            self._remove(os.path.join(pending_dir, name))
+        try:
+            os.rmdir(pending_dir)
+        except OSError:
+            pass
+
+    def _compact_queue(self) -> None:
+        """Rewrites the queue as the pending emails and the bodies they still use"""
+        used = {email["body"] for email in self._pending.values()}
+        self._bodies = {body_id: body for body_id, body in self._bodies.items() if body_id in used}
+        entries = [{"op": "body", "id": body_id, "body": body} for body_id, body in self._bodies.items()]
+        entries += [{"op": "queued", "email": email} for email in self._pending.values()]
+        self._queue_log.rewrite(entries)
+        #if most of it is still pending, wait for the queue to double before trying again
+        self._queue_log.max_bytes = max(self._queue_log.max_bytes, 2 * self._queue_log.size())
+
+    def _compact(self, now: float) -> None:
+        """Forgets delivered keys older than keep_delivered"""
+        #the queue may still list emails delivered long ago, they must go before their keys do
+        self._compact_queue()
+        self._delivered = {key: at for key, at in self._delivered.items() if now - at < self.keep_delivered}
+        self._delivered_log.rewrite([{"key": key, "at": at} for key, at in self._delivered.items()])
+        #if most keys are still recent, wait for the log to double before trying again
+        self._delivered_log.max_bytes = max(self._delivered_log.max_bytes, 2 * self._delivered_log.size())
+
+    @staticmethod
+    def _path(directory: str, key: str) -> str:
+        #keys hold emails and colons, hash them into a safe file name
+        return os.path.join(directory, hashlib.sha256(key.encode()).hexdigest()[:32] + ".json")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
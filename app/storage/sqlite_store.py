@@ -0,0 +1,292 @@
+"""Stores subscribers and tickers in an SQLite database"""
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from app.config import JOURNAL_MAX_BYTES
+from app.models.subscriber import Subscriber
+from app.services.edgar_feed import EdgarFeed
+from app.services.sec_service import get_cik
+from app.storage.sub_store import SubStore, normalize_email
+from app.storage.ticker_store import TickerStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    id INTEGER PRIMARY KEY,
+    email_key TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscriber_tickers (
+    subscriber_id INTEGER NOT NULL REFERENCES subscribers(id) ON DELETE CASCADE,
+    ticker TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (subscriber_id, ticker)
+);
+CREATE INDEX IF NOT EXISTS subscriber_tickers_by_ticker ON subscriber_tickers(ticker);
+CREATE TABLE IF NOT EXISTS ticker_state (
+    ticker TEXT NOT NULL PRIMARY KEY,
+    cik TEXT NOT NULL DEFAULT '',
+    last_filing TEXT NOT NULL DEFAULT '',
+    last_filing_date TEXT NOT NULL DEFAULT ''
+);
+"""
+
+
+class SQLiteDatabase:
+    """One WAL-mode connection to the database file, shared by the stores that use it
+
+    Writes go through transaction(), which takes the database write lock up
+    front so read-modify-write sequences from other processes can't interleave.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class SQLiteTickerStore(TickerStore):
+    """TickerStore kept in the ticker_state table, polling is inherited unchanged"""
+    def __init__(self, db: SQLiteDatabase, feed: Optional[EdgarFeed] = None):
+        self.db = db
+        super().__init__(file_path=db.db_path, feed=feed)
+
+    def _ensure_file_exists(self):
+        #the schema is created when the database is opened
+        pass
+
+    def save_tickers(self, tickers: List[Dict[str, Any]]) -> None:
+        rows = [(tick["ticker"], tick.get("cik", ""), tick.get("last_filing", ""), tick.get("last_filing_date", ""))
+                for tick in tickers]
+        wanted = {row[0] for row in rows}
+        with self.db.transaction() as conn:
+            existing = {ticker for (ticker,) in conn.execute("SELECT ticker FROM ticker_state")}
+            conn.executemany("DELETE FROM ticker_state WHERE ticker = ?", [(ticker,) for ticker in existing - wanted])
+            conn.executemany(
+                "INSERT INTO ticker_state (ticker, cik, last_filing, last_filing_date) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(ticker) DO UPDATE SET cik = excluded.cik, last_filing = excluded.last_filing, "
+                "last_filing_date = excluded.last_filing_date",
+                rows
+            )
+
+    def save_polled(self, tickers: List[Dict[str, Any]]) -> None:
+        """Updates only rows that still exist, so tickers added or removed during a poll stay that way"""
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "UPDATE ticker_state SET cik = ?, last_filing = ?, last_filing_date = ? WHERE ticker = ?",
+                [(tick.get("cik", ""), tick.get("last_filing", ""), tick.get("last_filing_date", ""), tick["ticker"])
+                 for tick in tickers])
+
+    def get_all_tickers(self) -> List[Dict[str, Any]]:
+        rows = self.db.query("SELECT ticker, cik, last_filing, last_filing_date FROM ticker_state ORDER BY rowid")
+        return [{"ticker": ticker, "cik": cik, "last_filing": last_filing, "last_filing_date": last_filing_date}
+                for ticker, cik, last_filing, last_filing_date in rows]
+
+    def refresh_tickers(self, tickers: List[str]) -> None:
+        """Updates ticker list after every subscriber list change"""
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        wanted = set(tickers)
+        existing = {ticker for (ticker,) in self.db.query("SELECT ticker FROM ticker_state")}
+        #resolved before the transaction, the first lookup may download the CIK table
+        added = [(ticker, get_cik(ticker)) for ticker in tickers if ticker not in existing]
+        with self.db.transaction() as conn:
+            conn.executemany("DELETE FROM ticker_state WHERE ticker = ?", [(ticker,) for ticker in existing - wanted])
+            conn.executemany("INSERT OR IGNORE INTO ticker_state (ticker, cik) VALUES (?, ?)", added)
+        logger.info(f"Tickers {tickers} synced to {self.db.db_path} successfully.")
+
+    def update_tickers(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        added, removed = list(added), list(removed)
+        if not added and not removed:
+            return
+        existing = {ticker for (ticker,) in self.db.query(
+            f"SELECT ticker FROM ticker_state WHERE ticker IN ({','.join('?' * len(added))})", tuple(added))}
+        new_rows = [(ticker, get_cik(ticker)) for ticker in added if ticker not in existing]
+        with self.db.transaction() as conn:
+            conn.executemany("DELETE FROM ticker_state WHERE ticker = ?", [(ticker,) for ticker in removed])
+            conn.executemany("INSERT OR IGNORE INTO ticker_state (ticker, cik) VALUES (?, ?)", new_rows)
+        logger.info(f"Tickers +{added} -{removed} synced to {self.db.db_path} successfully.")
+
+
+class SQLiteSubStore(SubStore):
+    """SubStore kept in the subscribers and subscriber_tickers tables
+
+    Every mutation touches only the rows of the subscriber it changes.
+    """
+    def __init__(self, db: SQLiteDatabase, ticker_store: TickerStore):
+        self.db = db
+        super().__init__(file_path=db.db_path, ticker_store=ticker_store)
+
+    def _ensure_file_exists(self):
+        #the schema is created when the database is opened
+        pass
+
+    def get_all_subscribers(self) -> List[Dict[str, Any]]:
+        subscribers: Dict[int, Dict[str, Any]] = {}
+        for subscriber_id, email, name in self.db.query("SELECT id, email, name FROM subscribers ORDER BY id"):
+            subscribers[subscriber_id] = {"name": name, "email": email, "tickers": []}
+        for subscriber_id, ticker in self.db.query(
+                "SELECT subscriber_id, ticker FROM subscriber_tickers ORDER BY subscriber_id, position"):
+            subscribers[subscriber_id]["tickers"].append(ticker)
+        return list(subscribers.values())
+
+    def save_subscribers(self, subscribers: List[Dict[str, Any]]):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM subscribers")
+            for subscriber in subscribers:
+                self._insert(conn, subscriber["name"], subscriber["email"], subscriber["tickers"])
+        self.ticker_store.refresh_tickers(self.get_all_tickers())
+
+    def add_subscriber(self, name: str, email: str, tickers: List[str]) -> bool:
+        try:
+            new_subscriber = Subscriber(email=email, name=name, tickers=tickers)
+            key = normalize_email(new_subscriber.email)
+
+            new_tickers = list(dict.fromkeys(new_subscriber.tickers))
+
+            with self.db.transaction() as conn:
+                row = conn.execute("SELECT id FROM subscribers WHERE email_key = ?", (key,)).fetchone()
+                current = []
+                #check if subscriber already exists
+                if row is not None:
+                    current = [ticker for (ticker,) in conn.execute(
+                        "SELECT ticker FROM subscriber_tickers WHERE subscriber_id = ? ORDER BY position", row)]
+                    #checks if tickers are different
+                    if current == new_tickers:
+                        raise ValueError("Subscriber already exists")
+                #only tickers nobody watched before and ones nobody watches anymore go to the ticker store
+                added = self._unwatched(conn, [ticker for ticker in new_tickers if ticker not in current])
+                if row is not None:
+                    conn.execute("DELETE FROM subscriber_tickers WHERE subscriber_id = ?", row)
+                    self._insert_tickers(conn, row[0], new_tickers)
+                else: # If new Subscriber
+                    self._insert(conn, new_subscriber.name, new_subscriber.email, new_tickers)
+                removed = self._unwatched(conn, [ticker for ticker in current if ticker not in new_tickers])
+
+            self.ticker_store.update_tickers(added=added, removed=removed)
+            logger.info(f"Subscriber {email} added successfully")
+            return True
+
+        except ValueError as e:
+            logger.error(f"Validation error: {str(e)}")
+            return False
+
+    def bulk_upsert(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Adds or updates many subscribers in one transaction, see SubStore.bulk_upsert"""
+        latest, report = self._validate_rows(rows)
+        with self.db.transaction() as conn:
+            watched = {ticker for (ticker,) in conn.execute("SELECT DISTINCT ticker FROM subscriber_tickers")}
+            for key, new_subscriber in latest.items():
+                new_tickers = list(dict.fromkeys(new_subscriber.tickers))
+                row = conn.execute("SELECT id, name FROM subscribers WHERE email_key = ?", (key,)).fetchone()
+                if row is None:
+                    report["added"] += 1
+                else:
+                    current = [ticker for (ticker,) in conn.execute(
+                        "SELECT ticker FROM subscriber_tickers WHERE subscriber_id = ? ORDER BY position", (row[0],))]
+                    if row[1] == new_subscriber.name and current == new_tickers:
+                        report["unchanged"] += 1
+                        continue
+                    report["updated"] += 1
+                self._insert(conn, new_subscriber.name, new_subscriber.email, new_tickers)
+            now_watched = {ticker for (ticker,) in conn.execute("SELECT DISTINCT ticker FROM subscriber_tickers")}
+        self.ticker_store.update_tickers(added=sorted(now_watched - watched), removed=sorted(watched - now_watched))
+        logger.info(f"Bulk upsert to {self.db.db_path}: {report['added']} added, {report['updated']} updated, "
+                    f"{report['unchanged']} unchanged, {len(report['errors'])} invalid")
+        return report
+
+    def remove_subscriber(self, email: str) -> bool:
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT id FROM subscribers WHERE email_key = ?", (normalize_email(email),)).fetchone()
+            if row is None:
+                return False
+            tickers = [ticker for (ticker,) in conn.execute(
+                "SELECT ticker FROM subscriber_tickers WHERE subscriber_id = ?", row)]
+            conn.execute("DELETE FROM subscribers WHERE id = ?", row)
+            removed = self._unwatched(conn, tickers)
+        self.ticker_store.update_tickers(removed=removed)
+        logger.info(f"Subscriber {email} removed successfully")
+        return True
+
+    def get_all_tickers(self) -> List[str]:
+        return [ticker for (ticker,) in self.db.query("SELECT DISTINCT ticker FROM subscriber_tickers")]
+
+    def reconcile_tickers(self) -> None:
+        self.ticker_store.refresh_tickers(self.get_all_tickers())
+
+    def get_subscribers_by_ticker(self, ticker: str) -> List[Dict[str, Any]]:
+        rows = self.db.query(
+            "SELECT s.id, s.email, s.name FROM subscriber_tickers t JOIN subscribers s ON s.id = t.subscriber_id "
+            "WHERE t.ticker = ? ORDER BY s.id", (ticker.upper(),))
+        subscribers = []
+        for subscriber_id, email, name in rows:
+            tickers = [tick for (tick,) in self.db.query(
+                "SELECT ticker FROM subscriber_tickers WHERE subscriber_id = ? ORDER BY position", (subscriber_id,))]
+            subscribers.append({"name": name, "email": email, "tickers": tickers})
+        return subscribers
+
+    def _insert(self, conn: sqlite3.Connection, name: str, email: str, tickers: List[str]) -> None:
+        #an existing subscriber keeps the email as first stored, the same as SubStore
+        subscriber_id = conn.execute(
+            "INSERT INTO subscribers (email_key, email, name) VALUES (?, ?, ?) "
+            "ON CONFLICT(email_key) DO UPDATE SET name = excluded.name RETURNING id",
+            (normalize_email(email), email, name)).fetchone()[0]
+        conn.execute("DELETE FROM subscriber_tickers WHERE subscriber_id = ?", (subscriber_id,))
+        self._insert_tickers(conn, subscriber_id, tickers)
+
+    @staticmethod
+    def _unwatched(conn: sqlite3.Connection, tickers: List[str]) -> List[str]:
+        """Returns the tickers no subscriber watches, one indexed lookup each"""
+        return [ticker for ticker in tickers if conn.execute(
+            "SELECT 1 FROM subscriber_tickers WHERE ticker = ? LIMIT 1", (ticker.upper(),)).fetchone() is None]
+
+    @staticmethod
+    def _insert_tickers(conn: sqlite3.Connection, subscriber_id: int, tickers: List[str]) -> None:
+        #a ticker listed twice is only stored once
+        conn.executemany(
+            "INSERT INTO subscriber_tickers (subscriber_id, ticker, position) VALUES (?, ?, ?)",
+            [(subscriber_id, ticker.upper(), position) for position, ticker in enumerate(dict.fromkeys(tickers))])
+
+
+def migrate_json(sub_path: str, tick_path: str, db: SQLiteDatabase) -> None:
+    """Imports the JSON subscriber and ticker files into the database in one go"""
+    #opened with their journals, so changes not yet folded into the JSON files are imported too
+    json_tickers = TickerStore(file_path=tick_path, journal_max_bytes=JOURNAL_MAX_BYTES)
+    json_subscribers = SubStore(file_path=sub_path, ticker_store=json_tickers, journal_max_bytes=JOURNAL_MAX_BYTES)
+
+    ticker_store = SQLiteTickerStore(db)
+    #ticker state first, so syncing the subscribers' tickers finds every CIK already there
+    tickers = json_tickers.get_all_tickers()
+    ticker_store.save_tickers(tickers)
+    subscribers = json_subscribers.get_all_subscribers()
+    SQLiteSubStore(db, ticker_store=ticker_store).save_subscribers(subscribers)
+    logger.info(f"Migrated {len(subscribers)} subscribers and {len(tickers)} tickers into {db.db_path}")
@@ -1,20 +1,58 @@
 """Stores subscriber data into JSON file"""
 import json
 import os
-from typing import List, Dict, Any
+import re
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 import logging
 
 from app.models.subscriber import Subscriber
 from app.storage.ticker_store import TickerStore
+from app.storage.json_file import write_json_atomic
+from app.storage.journal import Journal
+from app.storage.file_lock import FileLock
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_email(email: str) -> str:
+    """Key subscribers are stored under, so case and stray spaces don't make duplicates"""
+    return email.strip().lower()
+
+
 class SubStore:
-    def __init__(self, file_path, ticker_store: TickerStore):
+    def __init__(self, file_path, ticker_store: TickerStore, write_delay: float = 0,
+                 journal_max_bytes: Optional[int] = None):
         self.file_path = file_path
         self._ensure_file_exists()
         self.ticker_store = ticker_store
+        #with a journal, each change is one appended line and the file is only
+        #rewritten once the journal grows past journal_max_bytes
+        self.journal = Journal(file_path + ".log", journal_max_bytes) if journal_max_bytes else None
+        #held across every read-modify-write of the file and journal, other processes included
+        self._file_lock = self.journal.lock if self.journal is not None else FileLock(file_path + ".lock")
+        #changes made here that are only in memory, not yet in the journal or the file;
+        #a new snapshot replays them over what is on disk instead of overwriting it
+        self._pending: List[Dict[str, Any]] = []
+        #with a write delay, mutations made within that many seconds of the first
+        #are written (and the tickers synced) together; flush() writes them early
+        self.write_delay = write_delay
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        #subscribers keyed by normalized email in file order, plus an inverted
+        #ticker -> emails index; both are reloaded whenever the file's
+        #(mtime, size) stamp no longer matches the one they were built from.
+        #Records are kept as slotted Subscribers, dicts are only built for callers
+        self._subscribers: Optional[Dict[str, Subscriber]] = None
+        self._ticker_index: Dict[str, Set[str]] = {}
+        self._stamp: Optional[Tuple[int, ...]] = None
+        #the index doubles as a reference count per ticker: tickers whose count
+        #went from or to zero since the last sync are sent to the ticker store
+        #as a delta, after a reload the whole ticker set is sent once instead
+        self._tickers_added: Set[str] = set()
+        self._tickers_removed: Set[str] = set()
+        self._tickers_synced = False
 
     def _ensure_file_exists(self):
         if not os.path.exists(self.file_path):
@@ -23,37 +61,51 @@ class SubStore:
                 json.dump([], f)
 
     def get_all_subscribers(self) -> List[Dict[str, Any]]:
-        with open(self.file_path, 'r') as f:
-            if os.path.getsize(self.file_path) == 0:
-                return []
-            else:
-                return json.load(f)
+        with self._lock:
+            if self._dirty:
+                #the file is behind the buffered mutations
+                return [subscriber.to_dict() for subscriber in self._subscribers.values()]
+        return self._read_file()
 
     def save_subscribers(self, subscribers: List[Dict[str, Any]]):
-        with open(self.file_path, 'w') as f:
-            json.dump(subscribers, f, indent=2)
-        self.ticker_store.refresh_tickers(self.get_all_tickers())
+        """Replaces every subscriber, changes still held by the write delay are dropped"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._dirty = False
+            self._subscribers = None
+            with self._file_lock:
+                self._write_snapshot(subscribers)
+            self._pending = []
+            #indexed from the list just written instead of reading the file back
+            self._build(subscribers)
+            self._stamp = self._file_stamp()
+            self.ticker_store.refresh_tickers(list(self._ticker_index))
+            self._tickers_synced = True
 
     def add_subscriber(self, name: str, email: str, tickers: List[str]) -> bool:
         try:
             new_subscriber = Subscriber(email=email, name=name, tickers=tickers)
 
-            #get existing subscribers and add a new one
-            subscribers = self.get_all_subscribers()
-            for subscriber in subscribers:
+            with self._lock:
+                subscribers = self._load()
+                key = normalize_email(new_subscriber.email)
+                subscriber = subscribers.get(key)
                 #check if subscriber already exists
-                if subscriber["email"] == new_subscriber.email:
-
+                if subscriber is not None:
                     #checks if tickers are different
-                    if subscriber["tickers"] != new_subscriber.tickers:
-                        subscriber["tickers"] = new_subscriber.tickers
-                        self.save_subscribers(subscribers)
-                        return True
-                    else: # If exact same Subscriber
+                    if subscriber.tickers == new_subscriber.tickers:
                         raise ValueError("Subscriber already exists")
-            # If new Subscriber
-            subscribers.append(new_subscriber.to_dict())
-            self.save_subscribers(subscribers)
+                    #updated in place so it keeps its position in the file
+                    self._unindex(key, subscriber)
+                    subscriber.tickers = new_subscriber.tickers
+                    self._index(key, subscriber)
+                else: # If new Subscriber
+                    subscriber = new_subscriber
+                    subscribers[key] = subscriber
+                    self._index(key, subscriber)
+                self._save({"op": "upsert", "subscriber": subscriber.to_dict()})
             logger.info(f"Subscriber {email} added successfully")
             return True
 
@@ -61,29 +113,298 @@ class SubStore:
             logger.error(f"Validation error: {str(e)}")
             return False
 
-    def remove_subscriber(self, email: str) -> bool:
-        try:
-            subscribers = self.get_all_subscribers()
-            for subscriber in subscribers:
-                if subscriber["email"] == email:
-                    subscribers.remove(subscriber)
-                    self.save_subscribers(subscribers)
-                    logger.info(f"Subscriber {email} removed successfully")
-                    return True
+    def bulk_upsert(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Adds or updates many subscribers in one write and one ticker sync
 
-            return False
-        except ValueError as e:
-            logger.error(f"Validation error: {str(e)}")
+        rows is read once, so a csv.DictReader can be streamed straight in. Each
+        row has name, email and tickers (a list, or one string separated by commas
+        or spaces). Invalid rows are skipped and listed in the report's errors
+        with their 1-based row number; when an email appears more than once the
+        last row wins. Returns counts of added, updated, unchanged and duplicate
+        rows next to the errors.
+        """
+        latest, report = self._validate_rows(rows)
+        #held through the write, so signups another process journals meanwhile wait instead of being overwritten
+        with self._lock, self._file_lock:
+            self._load()
+            #counted against what is on disk now, not memory held for the write delay
+            self._refresh()
+            subscribers = self._subscribers
+            changed = False
+            for key, new_subscriber in latest.items():
+                subscriber = subscribers.get(key)
+                if subscriber is None:
+                    subscriber = subscribers[key] = new_subscriber
+                    self._index(key, subscriber)
+                    report["added"] += 1
+                elif subscriber.name == new_subscriber.name and subscriber.tickers == new_subscriber.tickers:
+                    report["unchanged"] += 1
+                    continue
+                else:
+                    #updated in place so it keeps its position in the file
+                    self._unindex(key, subscriber)
+                    subscriber.name = new_subscriber.name
+                    subscriber.tickers = new_subscriber.tickers
+                    self._index(key, subscriber)
+                    report["updated"] += 1
+                #not journaled, the snapshot below replays them over the file
+                self._pending.append({"op": "upsert", "subscriber": subscriber.to_dict()})
+                changed = True
+            if changed:
+                self._write_all()
+        logger.info(f"Bulk upsert to {self.file_path}: {report['added']} added, {report['updated']} updated, "
+                    f"{report['unchanged']} unchanged, {len(report['errors'])} invalid")
+        return report
 
-            return False
+    def remove_subscriber(self, email: str) -> bool:
+        with self._lock:
+            subscribers = self._load()
+            key = normalize_email(email)
+            subscriber = subscribers.pop(key, None)
+            if subscriber is None:
+                return False
+            self._unindex(key, subscriber)
+            self._save({"op": "remove", "email": key})
+        logger.info(f"Subscriber {email} removed successfully")
+        return True
 
     def get_all_tickers(self) -> List[str]:
-        subscribers = self.get_all_subscribers()
-        tickers = []
-        for sub in subscribers:
-            tickers.extend(sub["tickers"])
-        return list(set(tickers))
+        with self._lock:
+            self._load()
+            return list(self._ticker_index)
 
     def get_subscribers_by_ticker(self, ticker: str) -> List[Dict[str, Any]]:
-        subscribers = self.get_all_subscribers()
-        return [sub for sub in subscribers if ticker.upper() in [t.upper() for t in sub["tickers"]]]
\ No newline at end of file
+        with self._lock:
+            subscribers = self._load()
+            return [subscribers[key].to_dict() for key in self._ticker_index.get(ticker.upper(), ())]
+
+    def reconcile_tickers(self) -> None:
+        """Sends the ticker store the whole ticker set, called once per polling cycle
+
+        Between these only deltas are sent, so a ticker write lost along the
+        way (a crash, another process) is repaired here instead of lasting
+        for the life of the process.
+        """
+        with self._lock:
+            self._load()
+            self.ticker_store.refresh_tickers(list(self._ticker_index))
+            self._tickers_added.clear()
+            self._tickers_removed.clear()
+            self._tickers_synced = True
+
+    def flush(self) -> None:
+        """Writes out mutations still waiting for the write delay, call before shutting down"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._dirty:
+                self._write()
+                self._dirty = False
+
+    def _file_stamp(self) -> Optional[Tuple[int, ...]]:
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self.journal is not None and os.path.exists(self.journal.file_path):
+            stat = os.stat(self.journal.file_path)
+            stamp += (stat.st_mtime_ns, stat.st_size)
+        return stamp
+
+    def _read_file(self) -> List[Dict[str, Any]]:
+        """Reads the snapshot and replays the journal over it, both under the lock"""
+        with self._file_lock:
+            with open(self.file_path, 'r') as f:
+                if os.path.getsize(self.file_path) == 0:
+                    subscribers = []
+                else:
+                    subscribers = json.load(f)
+            if self.journal is not None:
+                subscribers = self._replay(subscribers, self.journal.entries())
+        return subscribers
+
+    def _load(self) -> Dict[str, Subscriber]:
+        """Returns the email-keyed subscribers, reloading them if the file changed underneath"""
+        if self._dirty:
+            #buffered mutations win over whatever is on disk until they are flushed
+            return self._subscribers
+        stamp = self._file_stamp()
+        if self._subscribers is None or stamp is None or stamp != self._stamp:
+            self._build(self.get_all_subscribers())
+            self._stamp = stamp
+            self._tickers_synced = False
+        return self._subscribers
+
+    def _build(self, records: List[Dict[str, Any]]) -> None:
+        """Rebuilds the email-keyed subscribers and the ticker index from stored records"""
+        self._subscribers = {}
+        self._ticker_index = {}
+        for record in records:
+            #stored records were validated when they were added
+            subscriber = Subscriber.from_dict(record)
+            key = normalize_email(subscriber.email)
+            if key in self._subscribers:
+                self._unindex(key, self._subscribers[key])
+            self._subscribers[key] = subscriber
+            self._index(key, subscriber)
+        self._tickers_added.clear()
+        self._tickers_removed.clear()
+
+    def _save(self, entry: Dict[str, Any]) -> None:
+        """Records a change to the in-memory subscribers now, or once the write delay has passed"""
+        if self.journal is not None:
+            try:
+                with self._file_lock:
+                    #if another process wrote since we read, don't let our own stamp hide it
+                    fresh = self._file_stamp() == self._stamp
+                    self.journal.append(entry)
+                    self._stamp = self._file_stamp() if fresh else None
+            except Exception:
+                if not self._dirty:
+                    self._subscribers = None
+                raise
+        else:
+            self._pending.append(entry)
+        if self.write_delay <= 0:
+            self._write()
+            return
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.write_delay, self._flush_in_background)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            #still dirty, the next mutation or flush() tries again
+            logger.error(f"Failed to write subscribers to {self.file_path}: {str(e)}")
+
+    def _write(self) -> None:
+        """Writes the in-memory subscribers back in their stable order"""
+        try:
+            #with a journal that isn't full yet it already holds the change
+            if self.journal is None or self.journal.needs_compaction():
+                self._compact()
+            self._sync_tickers()
+        except Exception:
+            if not self._dirty:
+                #the file may or may not hold our change, read it back next time
+                self._subscribers = None
+                self._pending = []
+            raise
+
+    def _write_all(self) -> None:
+        """Writes every in-memory subscriber as a new snapshot right away, held changes included"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._dirty = False
+        try:
+            #a bulk change is cheaper as one snapshot than as one journal line per subscriber
+            self._compact()
+            self._sync_tickers()
+        except Exception:
+            self._subscribers = None
+            self._pending = []
+            raise
+
+    def _compact(self) -> None:
+        """Writes a new snapshot of the file and journal with this process's pending changes on top"""
+        with self._file_lock:
+            self._refresh()
+            self._write_snapshot([subscriber.to_dict() for subscriber in self._subscribers.values()])
+            self._pending = []
+            self._stamp = self._file_stamp()
+
+    def _refresh(self) -> None:
+        """Brings the in-memory subscribers up to date with the disk, pending changes kept, under the lock
+
+        Memory may be behind the file when another process wrote to it, most of
+        all while the write delay holds changes and _load() doesn't look at disk.
+        """
+        if self._file_stamp() == self._stamp:
+            #nobody wrote since we last read, memory is the file plus our pending changes
+            return
+        records = self._replay(self._read_file(), self._pending)
+        if records != [subscriber.to_dict() for subscriber in self._subscribers.values()]:
+            self._build(records)
+            #the ticker store gets the whole set, the deltas were worked out against stale memory
+            self._tickers_synced = False
+        self._stamp = self._file_stamp()
+
+    @staticmethod
+    def _validate_rows(rows: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Subscriber], Dict[str, Any]]:
+        """Validates bulk rows, returning the last valid subscriber per email and a report of the rest"""
+        latest: Dict[str, Subscriber] = {}
+        report: Dict[str, Any] = {"added": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "errors": []}
+        for row_number, row in enumerate(rows, start=1):
+            tickers = row.get("tickers") or []
+            if isinstance(tickers, str):
+                tickers = [ticker for ticker in re.split(r"[\s,;]+", tickers) if ticker]
+            try:
+                #every row is checked against the same in-memory ticker table
+                subscriber = Subscriber(email=(row.get("email") or "").strip(), name=(row.get("name") or "").strip(),
+                                        tickers=tickers)
+            except ValueError as e:
+                report["errors"].append({"row": row_number, "email": row.get("email"), "error": str(e)})
+                continue
+            key = normalize_email(subscriber.email)
+            if key in latest:
+                report["duplicates"] += 1
+            latest[key] = subscriber
+        return latest, report
+
+    def _write_snapshot(self, subscribers: List[Dict[str, Any]]) -> None:
+        write_json_atomic(self.file_path, subscribers)
+        if self.journal is not None:
+            #the new snapshot holds everything the journal did
+            self.journal.clear()
+
+    def _sync_tickers(self) -> None:
+        """Sends the ticker store the tickers that gained their first or lost their last subscriber"""
+        if not self._tickers_synced:
+            self.ticker_store.refresh_tickers(list(self._ticker_index))
+        elif self._tickers_added or self._tickers_removed:
+            self.ticker_store.update_tickers(added=sorted(self._tickers_added), removed=sorted(self._tickers_removed))
+        self._tickers_added.clear()
+        self._tickers_removed.clear()
+        self._tickers_synced = True
+
+    @staticmethod
+    def _replay(subscribers: List[Dict[str, Any]], entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Applies journal entries over the snapshot, updates keep their place like they do in memory"""
+        by_key = {normalize_email(subscriber["email"]): subscriber for subscriber in subscribers}
+        for entry in entries:
+            if entry["op"] == "upsert":
+                by_key[normalize_email(entry["subscriber"]["email"])] = entry["subscriber"]
+            elif entry["op"] == "remove":
+                by_key.pop(entry["email"], None)
+        return list(by_key.values())
+
+    def _index(self, key: str, subscriber: Subscriber) -> None:
+        #Subscriber tickers are already upper case and interned, the index shares them
+        for ticker in subscriber.tickers:
+            keys = self._ticker_index.get(ticker)
+            if keys is None:
+                keys = self._ticker_index[ticker] = set()
+                if ticker in self._tickers_removed:
+                    self._tickers_removed.discard(ticker)
+                else:
+                    self._tickers_added.add(ticker)
+            keys.add(key)
+
+    def _unindex(self, key: str, subscriber: Subscriber) -> None:
+        for ticker in subscriber.tickers:
+            keys = self._ticker_index.get(ticker)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._ticker_index[ticker]
+                    if ticker in self._tickers_added:
+                        self._tickers_added.discard(ticker)
+                    else:
+                        self._tickers_removed.add(ticker)
@@ -1,16 +1,32 @@
 """Stores ticker and last filing into a json file"""
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from app.services.sec_service import get_filings
+from app.config import POLL_WORKERS
+from app.services import sec_service
+from app.services.sec_service import get_cik, get_submissions, latest_filing, filings_since, read_bulk_submissions
+from app.services.edgar_feed import EdgarFeed
+from app.storage.json_file import write_json_atomic
+from app.storage.journal import Journal
+from app.storage.file_lock import FileLock
 
 logger = logging.getLogger(__name__)
 
 class TickerStore:
-    def __init__(self, file_path):
+    def __init__(self, file_path, feed: Optional[EdgarFeed] = None, journal_max_bytes: Optional[int] = None):
         self.file_path = file_path
+        #with a feed, only the CIKs it lists as having filed are polled
+        self.feed = feed
+        #with a journal, added and removed tickers are appended to it instead of
+        #rewriting the file, which happens anyway after every polling cycle
+        self.journal = Journal(file_path + ".log", journal_max_bytes) if journal_max_bytes else None
+        #held across every read-modify-write of the file and journal, other processes included
+        self._file_lock = self.journal.lock if self.journal is not None else FileLock(file_path + ".lock")
+        #ticker state of the last check_filings(commit=False), saved by commit_filings()
+        self._polled: Optional[List[Dict[str, Any]]] = None
         self._ensure_file_exists()
 
     def _ensure_file_exists(self):
@@ -20,53 +36,205 @@ class TickerStore:
                 json.dump([], f)
 
     def save_tickers(self, tickers: List[Dict[str, Any]]) -> None:
-        with open(self.file_path, 'w') as f:
-            json.dump(tickers, f, indent=2)
+        with self._file_lock:
+            write_json_atomic(self.file_path, tickers)
+            if self.journal is not None:
+                self.journal.clear()
+
+    def save_polled(self, tickers: List[Dict[str, Any]]) -> None:
+        """Stores the CIK and last filing of polled tickers, leaving which tickers exist to refresh/update_tickers
+
+        The tickers are read again under the lock and only records still there
+        are updated, so tickers added or removed while the poll ran (by this
+        or another process) are neither lost nor brought back.
+        """
+        polled = {tick["ticker"]: tick for tick in tickers}
+        with self._file_lock:
+            current = self.get_all_tickers()
+            for tick in current:
+                if tick["ticker"] in polled:
+                    for field in ("cik", "last_filing", "last_filing_date"):
+                        if field in polled[tick["ticker"]]:
+                            tick[field] = polled[tick["ticker"]][field]
+            self.save_tickers(current)
 
     def get_all_tickers(self) -> List[Dict[str, Any]]:
-        with open(self.file_path, 'r') as f:
-            if os.path.getsize(self.file_path) == 0:
-                return []
-            else:
-                return json.load(f)
-
-    def refresh_tickers(self,tickers: list == []) -> None:
+        with self._file_lock:
+            with open(self.file_path, 'r') as f:
+                if os.path.getsize(self.file_path) == 0:
+                    tickers = []
+                else:
+                    tickers = json.load(f)
+            if self.journal is not None:
+                tickers = self._replay(tickers, self.journal.entries())
+        return tickers
+
+    def refresh_tickers(self, tickers: List[str]) -> None:
         """Updates ticker list after every subscriber list change"""
-        ticker_data = self.get_all_tickers()
-        current_tick_list = [tick["ticker"] for tick in ticker_data]
-        #if new ticker in list
-        if tickers not in current_tick_list:
-            ticker_data.append({"ticker":tickers,"last_filing":""})
-        #for old tickers to be removed
-        for tick in ticker_data:
-            if tick["ticker"] not in tickers:
-                ticker_data.remove(tick)
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        #the delta is worked out and applied under one lock, against the current file
+        with self._file_lock:
+            ticker_data = self.get_all_tickers()
+            current = {tick["ticker"] for tick in ticker_data}
+            wanted = set(tickers)
+            added = [ticker for ticker in dict.fromkeys(tickers) if ticker not in current]
+            removed = [ticker for ticker in current if ticker not in wanted]
+            self._apply_delta(added, removed, ticker_data)
         logger.info(f"Tickers {tickers} synced to {self.file_path} successfully.")
-        self.save_tickers(ticker_data)
 
-    def check_filings(self) -> dict[str,Any]:
-        """returns a list of tickers with new filings"""
+    def update_tickers(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        """Adds and removes only the given tickers, for callers that track which tickers changed"""
+        added, removed = list(added), list(removed)
+        self._apply_delta(added, removed)
+        logger.info(f"Tickers +{added} -{removed} synced to {self.file_path} successfully.")
+
+    def _apply_delta(self, added: List[str], removed: List[str],
+                     ticker_data: Optional[List[Dict[str, Any]]] = None) -> None:
+        if not added and not removed:
+            return
+        if self.journal is not None and not self.journal.needs_compaction():
+            #replaying an add keeps a record that is already there, so the file isn't read
+            entries = [{"op": "remove", "ticker": ticker} for ticker in removed]
+            entries += [{"op": "add", "ticker": self._new_record(ticker)} for ticker in added]
+            if entries:
+                self.journal.append(*entries)
+            return
+        with self._file_lock:
+            if ticker_data is None:
+                ticker_data = self.get_all_tickers()
+            removed_set = set(removed)
+            ticker_data = [tick for tick in ticker_data if tick["ticker"] not in removed_set]
+            present = {tick["ticker"] for tick in ticker_data}
+            ticker_data += [self._new_record(ticker) for ticker in added if ticker not in present]
+            self.save_tickers(ticker_data)
+
+    @staticmethod
+    def _new_record(ticker: str) -> Dict[str, Any]:
+        #the CIK is resolved once here so polling never has to
+        return {"ticker": ticker, "cik": get_cik(ticker), "last_filing": "", "last_filing_date": ""}
+
+    @staticmethod
+    def _replay(tickers: List[Dict[str, Any]], entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Applies journal entries over the snapshot"""
+        by_ticker = {tick["ticker"]: tick for tick in tickers}
+        for entry in entries:
+            if entry["op"] == "add":
+                by_ticker.setdefault(entry["ticker"]["ticker"], entry["ticker"])
+            elif entry["op"] == "remove":
+                by_ticker.pop(entry["ticker"], None)
+        return list(by_ticker.values())
+
+    def bootstrap(self, zip_path: str, force: bool = False) -> int:
+        """Sets the baseline filing of every ticker from a local copy of SEC's submissions.zip
+
+        Only tickers without a baseline are filled in unless force is set.
+        Returns the number of tickers updated.
+        """
         ticker_list = self.get_all_tickers()
-        new_filings = {}
+        tickers_by_cik: Dict[str, List[Dict[str, Any]]] = {}
         for ticker in ticker_list:
-            latest_filing = get_filings(ticker["ticker"]).iloc[0]
-            if ticker["last_filing"] == "":
-                ticker["last_filing"] = latest_filing["accessionNumber"]
-            elif ticker["last_filing"] != latest_filing["accessionNumber"]:
-                new_filings[ticker["ticker"]] = latest_filing
-                ticker["last_filing"] = latest_filing["accessionNumber"]
-            else:
+            if not ticker.get("cik"):
+                ticker["cik"] = get_cik(ticker["ticker"])
+            if ticker["cik"] and (force or ticker["last_filing"] == ""):
+                tickers_by_cik.setdefault(ticker["cik"], []).append(ticker)
+
+        updated = 0
+        for cik, submissions in read_bulk_submissions(zip_path, tickers_by_cik):
+            newest = latest_filing(submissions)
+            if newest is None:
                 continue
+            for ticker in tickers_by_cik[cik]:
+                ticker["last_filing"] = newest["accessionNumber"]
+                ticker["last_filing_date"] = newest.get("filingDate", "")
+                updated += 1
+
+        logger.info(f"Bootstrapped {updated} of {len(ticker_list)} tickers from {zip_path}")
+        self.save_polled(ticker_list)
+        return updated
+
+    def check_filings(self, workers: int = POLL_WORKERS, commit: bool = True) -> dict[str,List[Dict[str, Any]]]:
+        """returns every filing made since the last check, per ticker and oldest first
+
+        Each CIK is polled once by up to `workers` threads at once, the shared
+        sec_limiter keeps them under the SEC fair access limit. With a feed,
+        CIKs that did not file since the last cycle are skipped. With
+        commit=False the new last filings are only saved by commit_filings(),
+        so a caller that fails before handing the filings on sees them again.
+        """
+        ticker_list = self.get_all_tickers()
 
-        self.save_tickers(ticker_list)
+        #records saved before CIKs were stored get resolved once here
+        tickers_by_cik: Dict[str, List[Dict[str, Any]]] = {}
+        for ticker in ticker_list:
+            if not ticker.get("cik"):
+                ticker["cik"] = get_cik(ticker["ticker"])
+                if ticker["cik"] == "":
+                    logger.warning(f"No CIK found for {ticker['ticker']}, skipping")
+                    continue
+            tickers_by_cik.setdefault(ticker["cik"], []).append(ticker)
+
+        if self.feed is not None:
+            changed = self.feed.changed_ciks()
+            if changed is not None:
+                #tickers still waiting for a baseline are polled whatever the feed says
+                tickers_by_cik = {cik: tickers for cik, tickers in tickers_by_cik.items()
+                                  if cik in changed or not all(tick["last_filing"] for tick in tickers)}
+
+        waited_before = sec_service.sec_limiter.stats()['wait_time']
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                found = {}
+                for cik_filings in pool.map(self._poll_cik, tickers_by_cik.values()):
+                    found.update(cik_filings)
+        except Exception:
+            #validators of copies we never got to compare would hide their filings next cycle
+            sec_service.sec_client.clear_validators()
+            raise
+        waited = sec_service.sec_limiter.stats()['wait_time'] - waited_before
+        logger.info(f"Polled {len(tickers_by_cik)} CIKs, {waited:.2f}s spent waiting on the SEC rate limit")
+
+        new_filings = {ticker["ticker"]: found[ticker["ticker"]]
+                       for ticker in ticker_list if ticker["ticker"] in found}
+        self._polled = ticker_list
+        if commit:
+            self.commit_filings()
         return new_filings
 
+    def commit_filings(self) -> None:
+        """Saves the ticker state of the last check_filings(commit=False), once its filings are safe"""
+        if self._polled is None:
+            return
+        self.save_polled(self._polled)
+        self._polled = None
+        if self.feed is not None:
+            #only now is it safe for the next cycle to skip what the feed listed
+            self.feed.commit()
+
+    @staticmethod
+    def _poll_cik(tickers: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetches one CIK and moves the records listed under it to its newest filing
+
+        Returns the new filings of each ticker that had a baseline to compare against.
+        """
+        #a 304 is only trusted once every ticker of the CIK has a baseline to compare against
+        conditional = all(tick["last_filing"] for tick in tickers)
+        submissions = get_submissions(tickers[0]["cik"], conditional=conditional)
+        if submissions is None:
+            return {}
 
-
-
-
-
-
-
-
-
+        new_filings = {}
+        for ticker in tickers:
+            if ticker["last_filing"] == "":
+                filings = []
+                newest = latest_filing(submissions)
+            else:
+                filings = filings_since(submissions, ticker["last_filing"], ticker.get("last_filing_date", ""))
+                newest = filings[-1] if filings else None
+            if newest is None:
+                continue
+            ticker["last_filing"] = newest["accessionNumber"]
+            ticker["last_filing_date"] = newest.get("filingDate", "")
+            if filings:
+                new_filings[ticker["ticker"]] = filings
+        return new_filings
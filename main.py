@@ -1,13 +1,17 @@
+import atexit
 import schedule
 import time
 from datetime import datetime
 import sys
 import logging
 
-from app.storage.sub_store import SubStore
-from app.storage.ticker_store import TickerStore
+from app.startup import init
+from app.storage.factory import open_stores
+from app.services.edgar_feed import EdgarFeed
+from app.services.dispatcher import OutboxSender
+from app.storage.outbox import Outbox
 from scheduler import scheduled_task
-from app.config import TICK_PATH, SUB_PATH, TASK_FREQ
+from app.config import TASK_FREQ, POLL_BACKEND, OUTBOX_PATH
 
 def main():
 
@@ -22,14 +26,25 @@ def main():
     )
     logger = logging.getLogger(__name__)
 
+    #read the .env file, nothing is loaded or connected on import
+    init()
+
     #create the two store objects
-    tick_list = TickerStore(file_path=TICK_PATH)
-    sub_list = SubStore(file_path=SUB_PATH, ticker_store=tick_list)
+    feed = EdgarFeed() if POLL_BACKEND == "feed" else None
+    tick_list, sub_list = open_stores(feed=feed)
+    #write out subscriber changes still held by the write delay
+    atexit.register(sub_list.flush)
+
+    #polling only queues emails, the sender delivers them in the background
+    outbox = Outbox(OUTBOX_PATH)
+    sender = OutboxSender(outbox)
+    sender.start()
+    atexit.register(sender.stop, 30)
 
     logger.info("Scheduler started")
 
     #run the scheduled tasks at a routine interval
-    schedule.every(TASK_FREQ).minutes.do(lambda: scheduled_task(tick_list, sub_list))
+    schedule.every(TASK_FREQ).minutes.do(lambda: scheduled_task(tick_list, sub_list, outbox=outbox))
 
 if __name__ == "__main__":
     main()
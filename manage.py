@@ -0,0 +1,92 @@
+"""Maintenance commands"""
+import argparse
+import csv
+import logging
+import sys
+
+from app import config
+from app.startup import init
+from app.storage.factory import open_stores
+from app.config import SUB_PATH, TICK_PATH, DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def bootstrap(args: argparse.Namespace) -> None:
+    tick_list, _ = open_stores()
+    tick_list.bootstrap(args.zip_path, force=args.force)
+
+
+def import_subscribers(args: argparse.Namespace) -> None:
+    _, sub_list = open_stores()
+    with open(args.csv_path, newline='') as f:
+        report = sub_list.bulk_upsert(csv.DictReader(f))
+    sub_list.flush()
+    for error in report["errors"]:
+        logger.warning(f"Row {error['row']} ({error['email']}): {error['error']}")
+    logger.info(f"{report['added']} added, {report['updated']} updated, {report['unchanged']} unchanged, "
+                 f"{report['duplicates']} duplicate rows, {len(report['errors'])} invalid rows")
+
+
+def migrate(args: argparse.Namespace) -> None:
+    from app.storage.sqlite_store import SQLiteDatabase, migrate_json
+    db = SQLiteDatabase(args.db_path)
+    try:
+        migrate_json(args.sub_path, args.tick_path, db)
+    finally:
+        db.close()
+
+
+def test_email(args: argparse.Namespace) -> None:
+    from app.services.email_service import EmailService
+    emailer = EmailService(sessions=1)
+    try:
+        to = args.to or config.EMAIL_ADDRESS
+        if not emailer.send_email(subscriber_email=to, subject="Test Email", message="This is a test email"):
+            sys.exit(1)
+    finally:
+        emailer.close()
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+        datefmt='%Y-%m-%d %I:%M:%S %p',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+    parser = argparse.ArgumentParser(description="SEC Watcher maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bootstrap_parser = commands.add_parser(
+        "bootstrap", help="set baseline filings for watched tickers from SEC's bulk submissions.zip")
+    bootstrap_parser.add_argument("zip_path", help="local copy of https://www.sec.gov/Archives/edgar/daily-index/bulkdata/submissions.zip")
+    bootstrap_parser.add_argument("--force", action="store_true", help="overwrite baselines that are already set")
+    bootstrap_parser.set_defaults(func=bootstrap)
+
+    import_parser = commands.add_parser(
+        "import", help="add or update subscribers from a CSV file with name, email and tickers columns")
+    import_parser.add_argument("csv_path", help="CSV file, tickers separated by spaces or commas within their column")
+    import_parser.set_defaults(func=import_subscribers)
+
+    migrate_parser = commands.add_parser(
+        "migrate", help="import the JSON subscriber and ticker files into the SQLite database")
+    migrate_parser.add_argument("--sub-path", default=SUB_PATH, help="subscriber JSON file to import")
+    migrate_parser.add_argument("--tick-path", default=TICK_PATH, help="ticker JSON file to import")
+    migrate_parser.add_argument("--db-path", default=DB_PATH, help="database to import into")
+    migrate_parser.set_defaults(func=migrate)
+
+    test_email_parser = commands.add_parser(
+        "test-email", help="send a test email to check the SMTP credentials")
+    test_email_parser.add_argument("--to", help="recipient (defaults to EMAIL_ADDRESS)")
+    test_email_parser.set_defaults(func=test_email)
+
+    args = parser.parse_args(argv)
+    init()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,102 @@
 """Scheduled Task Runner"""
 from app.storage.ticker_store import TickerStore
-from app.storage.sub_store import SubStore
+from app.storage.sub_store import SubStore, normalize_email
 from app.services.email_service import EmailService
+from app.services import dispatcher
+from app.services.dispatcher import Dispatcher
+from app.storage.outbox import Outbox
+from app.services.templates import render_filing, render_page
+from app.config import EMAIL_WORKERS, SMTP_SERVER, EMAIL_DIGEST
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
-def scheduled_task(tick_list: TickerStore, sub_list: SubStore) -> bool:
-    new_filings = tick_list.check_filings()
+def scheduled_task(tick_list: TickerStore, sub_list: SubStore, digest: bool = EMAIL_DIGEST,
+                   outbox: Optional[Outbox] = None) -> bool:
+    """Polls for new filings and notifies their subscribers
+
+    With an outbox the emails are only queued there for its sender, otherwise
+    they are sent before returning.
+    """
+    #ticker changes only travel as deltas, the full set is sent once per cycle to repair any that got lost
+    sub_list.reconcile_tickers()
+    #the new last filings are only saved once the emails are safe, see below
+    new_filings = tick_list.check_filings(commit=False)
 
     #if no new filings, stop check
     if new_filings == {}:
+        tick_list.commit_filings()
         logger.info("No new filings found")
         return False
 
-    emailer = EmailService()
-    for ticker, filing in new_filings.items():
-        logger.info(f"New filings for {ticker}")
+    if digest:
+        emails = digest_emails(new_filings, sub_list)
+    else:
+        emails = filing_emails(new_filings, sub_list)
+
+    if outbox is not None:
+        #queued before the ticker state is saved: a crash in between finds the same
+        #filings next cycle, and their (accession, subscriber) keys drop the repeats
+        outbox.enqueue(emails)
+        tick_list.commit_filings()
+        return True
+
+    #without an outbox nothing would drop a repeat, so the state is saved before sending
+    tick_list.commit_filings()
+
+    #each worker keeps its own SMTP login for the whole cycle
+    emailer = EmailService(sessions=EMAIL_WORKERS)
+    try:
+        Dispatcher(emailer, limiter=dispatcher.provider_limiter(SMTP_SERVER),
+                   workers=EMAIL_WORKERS).send_all(emails)
+    finally:
+        emailer.close()
+
+    return True
+
+
+def filing_emails(new_filings: Dict[str, List[Dict[str, Any]]], sub_list: SubStore) -> List[Dict[str, str]]:
+    """One email per filing per subscriber of its ticker"""
+    emails = []
+    for ticker, filings in new_filings.items():
+        logger.info(f"{len(filings)} new filings for {ticker}")
         subscribers = sub_list.get_subscribers_by_ticker(ticker)
-        for subscriber in subscribers:
-            emailer.send_email(subscriber_email=subscriber["email"],
-                               subject=f"New {ticker} filing",
-                               message=f"New {ticker} filing: {filing}"
-                               )
+        for filing in filings:
+            #rendered once, every subscriber's email shares the same strings
+            subject = f"New {ticker} {filing['form']} filing" if "form" in filing else f"New {ticker} filing"
+            message, html = render_page([render_filing(ticker, filing)])
+            for subscriber in subscribers:
+                emails.append({"key": f"{filing.get('accessionNumber', '')}:{normalize_email(subscriber['email'])}",
+                               "to": subscriber["email"],
+                               "subject": subject,
+                               "message": message,
+                               "html": html})
+    return emails
+
+
+def digest_emails(new_filings: Dict[str, List[Dict[str, Any]]], sub_list: SubStore) -> List[Dict[str, str]]:
+    """One email per subscriber listing every new filing of the tickers they watch"""
+    #subscribers keyed by normalized email so each gets one email whichever tickers filed
+    digests: Dict[str, Dict[str, Any]] = {}
+    for ticker, filings in new_filings.items():
+        logger.info(f"{len(filings)} new filings for {ticker}")
+        blocks = [render_filing(ticker, filing) for filing in filings]
+        for subscriber in sub_list.get_subscribers_by_ticker(ticker):
+            digest = digests.setdefault(normalize_email(subscriber["email"]),
+                                        {"to": subscriber["email"], "tickers": [], "blocks": [], "accessions": []})
+            digest["tickers"].append(ticker)
+            digest["accessions"].extend(filing.get("accessionNumber", "") for filing in filings)
+            digest["blocks"].extend(blocks)
 
-    return True
\ No newline at end of file
+    emails = []
+    for digest in digests.values():
+        count = len(digest["blocks"])
+        message, html = render_page(digest["blocks"])
+        emails.append({"key": f"{','.join(digest['accessions'])}:{normalize_email(digest['to'])}",
+                       "to": digest["to"],
+                       "subject": f"{count} new filing{'s' if count != 1 else ''} for {', '.join(digest['tickers'])}",
+                       "message": message,
+                       "html": html})
+    return emails
@@ -6,6 +6,40 @@ from unittest.mock import MagicMock
 
 from app.storage.ticker_store import TickerStore
 from app.storage.sub_store import SubStore
+from app.services import sec_service
+from app.services import dispatcher
+from app.services.rate_limiter import RateLimiter
+
+@pytest.fixture(autouse=True)
+def fresh_cik_map(monkeypatch):
+    """Give every test its own empty, memory-only ticker -> CIK table"""
+    cik_map = sec_service.CIKMap(cache_path=None)
+    monkeypatch.setattr(sec_service, "cik_map", cik_map)
+    return cik_map
+
+@pytest.fixture(autouse=True)
+def fresh_sec_limiter(monkeypatch):
+    """Give every test its own SEC rate limiter that never sleeps"""
+    limiter = RateLimiter(rate=sec_service.SEC_RATE_LIMIT, sleep=lambda seconds: None)
+    monkeypatch.setattr(sec_service, "sec_limiter", limiter)
+    return limiter
+
+@pytest.fixture(autouse=True)
+def fresh_sec_client(monkeypatch, fresh_sec_limiter):
+    """Give every test its own SEC client, patch its session to fake responses"""
+    client = sec_service.SECClient(fresh_sec_limiter)
+    monkeypatch.setattr(sec_service, "sec_client", client)
+    yield client
+    client.close()
+
+@pytest.fixture(autouse=True)
+def fresh_provider_limiters(monkeypatch):
+    """Give every test its own SMTP provider rate limiters that never sleep"""
+    limiters = {}
+    def provider_limiter(smtp_server):
+        return limiters.setdefault(smtp_server, RateLimiter(rate=dispatcher.SMTP_RATE_LIMIT, sleep=lambda seconds: None))
+    monkeypatch.setattr(dispatcher, "provider_limiter", provider_limiter)
+    return limiters
 
 @pytest.fixture
 def temp_dir():
@@ -27,8 +61,8 @@ def temp_subscriber_file(temp_dir):
 def sample_tickers():
     """Sample ticker data for tests"""
     return [
-        {"ticker": "AAPL", "last_filing": "0000320193-23-000001"},
-        {"ticker": "MSFT", "last_filing": "0000789019-23-000001"}
+        {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+        {"ticker": "MSFT", "cik": "0000789019", "last_filing": "0000789019-23-000001"}
     ]
 
 @pytest.fixture
@@ -0,0 +1,150 @@
+import pytest
+import os
+import time
+import threading
+from unittest.mock import MagicMock
+
+from app.services import dispatcher
+#imported before the autouse fixture swaps it for one that never sleeps
+from app.services.dispatcher import Dispatcher, OutboxSender, provider_limiter
+from app.services.email_service import EmailService
+from app.services.rate_limiter import RateLimiter
+from app.storage.outbox import Outbox
+
+
+def emails(count):
+    return [{"to": f"user{i}@example.com", "subject": "New AAPL filing", "message": "New AAPL filing"}
+            for i in range(count)]
+
+
+class TestDispatcher:
+    """Test cases for the email fan-out dispatcher"""
+
+    def test_send_all(self):
+        """Test that every email is handed to the email service once"""
+        mock_emailer = MagicMock(spec=EmailService)
+        mock_emailer.send_email.return_value = True
+
+        report = Dispatcher(mock_emailer, workers=3).send_all(emails(5))
+
+        # Assert that each recipient got their email
+        sent_to = sorted(call.kwargs["subscriber_email"] for call in mock_emailer.send_email.call_args_list)
+        assert sent_to == [f"user{i}@example.com" for i in range(5)]
+        assert report["sent"] == 5
+        assert report["failed"] == 0
+
+    def test_concurrency_limit(self):
+        """Test that sends run concurrently but never more than the worker count at once"""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def send_email(**kwargs):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+                if running == 3:
+                    release.set()
+            release.wait(timeout=5)
+            with lock:
+                running -= 1
+            return True
+
+        mock_emailer = MagicMock(spec=EmailService)
+        mock_emailer.send_email.side_effect = send_email
+
+        Dispatcher(mock_emailer, workers=3).send_all(emails(9))
+
+        # Assert that three workers sent at once and no more
+        assert peak == 3
+
+    def test_rate_limit(self):
+        """Test that every send takes a token from the provider limiter"""
+        limiter = RateLimiter(rate=2, sleep=lambda seconds: None)
+        mock_emailer = MagicMock(spec=EmailService)
+
+        Dispatcher(mock_emailer, limiter=limiter, workers=4).send_all(emails(6))
+
+        # Assert that one token was taken per email
+        assert limiter.stats()["requests"] == 6
+
+    def test_latency_report(self):
+        """Test the per-cycle delivery report"""
+        ticks = iter([0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+        mock_emailer = MagicMock(spec=EmailService)
+        mock_emailer.send_email.side_effect = [True, False, True, True]
+
+        report = Dispatcher(mock_emailer, workers=1, clock=lambda: next(ticks)).send_all(emails(4))
+
+        # Assert that latencies are measured from the start of the cycle
+        assert report == {
+            'sent': 3,
+            'failed': 1,
+            'elapsed': 5.0,
+            'avg_latency': 2.5,
+            'p95_latency': 4.0,
+            'max_latency': 4.0,
+        }
+
+    def test_provider_limiter_shared(self, monkeypatch):
+        """Test that each SMTP provider gets one limiter at its own rate"""
+        monkeypatch.setattr(dispatcher, "provider_limiters", {})
+        monkeypatch.setattr(dispatcher, "SMTP_RATE_LIMITS", {"smtp.gmail.com": 2})
+        monkeypatch.setattr(dispatcher, "SMTP_RATE_LIMIT", 5)
+
+        # Assert that the same provider always gets the same limiter
+        assert provider_limiter("smtp.gmail.com") is provider_limiter("smtp.gmail.com")
+
+        # Assert that listed providers get their own rate and the rest the default
+        assert provider_limiter("smtp.gmail.com").rate == 2
+        assert provider_limiter("smtp.example.com").rate == 5
+
+
+class TestOutboxSender:
+    """Test cases for the background outbox sender"""
+
+    @pytest.fixture
+    def outbox(self, temp_dir):
+        """Fixture for an outbox with three queued emails"""
+        outbox = Outbox(os.path.join(temp_dir, "outbox"), retry_delay=60)
+        outbox.enqueue([dict(email, key=f"0000320193-23-000001:{email['to']}") for email in emails(3)])
+        return outbox
+
+    def test_send_due(self, outbox):
+        """Test that sent emails leave the outbox and failed ones wait for a retry"""
+        mock_emailer = MagicMock(spec=EmailService)
+        mock_emailer.send_email.side_effect = lambda subscriber_email, **kwargs: subscriber_email != "user1@example.com"
+        sender = OutboxSender(outbox, workers=2, emailer_factory=lambda: mock_emailer)
+
+        report = sender.send_due()
+
+        # Assert that two were delivered and the failed one is still pending but not yet due
+        assert report["sent"] == 2
+        assert report["failed"] == 1
+        assert outbox.pending_count() == 1
+        assert outbox.due() == []
+        mock_emailer.close.assert_called_once()
+
+        # Assert that nothing is sent when nothing is due
+        assert sender.send_due() is None
+
+    def test_background_delivery(self, outbox):
+        """Test that the sender thread delivers queued emails without being asked"""
+        mock_emailer = MagicMock(spec=EmailService)
+        mock_emailer.send_email.return_value = True
+        sender = OutboxSender(outbox, interval=0.01, emailer_factory=lambda: mock_emailer)
+
+        sender.start()
+        try:
+            for _ in range(500):
+                if outbox.pending_count() == 0:
+                    break
+                time.sleep(0.01)
+        finally:
+            sender.stop(timeout=5)
+
+        # Assert that every email was delivered once
+        assert outbox.pending_count() == 0
+        assert mock_emailer.send_email.call_count == 3
@@ -0,0 +1,110 @@
+import pytest
+import os
+import re
+from datetime import datetime
+from unittest.mock import patch
+
+from app.services.edgar_feed import EdgarFeed, parse_feed, fetch_page
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "edgar_current_feed.xml")
+
+def feed_time(clock: str) -> datetime:
+    """Timestamp on the day the fixture feed was recorded"""
+    return datetime.fromisoformat(f"2023-05-02T{clock}-04:00")
+
+class TestEdgarFeed:
+    """Test cases for the EDGAR latest filings feed"""
+    
+    @pytest.fixture
+    def feed_xml(self):
+        """Fixture for a recorded feed page"""
+        with open(FIXTURE) as f:
+            return f.read()
+    
+    def test_parse_feed(self, feed_xml):
+        """Test reading the filer CIK, form and accession number of every entry"""
+        entries = parse_feed(feed_xml)
+        
+        assert len(entries) == 5
+        assert entries[0] == {
+            "cik": "0000320193",
+            "form": "8-K",
+            "accessionNumber": "0000320193-23-000063",
+            "updated": "2023-05-02T16:40:11-04:00"
+        }
+        
+        # Assert that an insider filing is listed for both the owner and the issuer
+        assert [entry["cik"] for entry in entries[1:3]] == ["0001494730", "0001318605"]
+        assert entries[1]["accessionNumber"] == entries[2]["accessionNumber"]
+    
+    def test_parse_empty_feed(self):
+        """Test that an empty page has no entries"""
+        assert parse_feed("") == []
+    
+    def test_changed_ciks_since_last_cycle(self):
+        """Test finding the CIKs that filed since the last cycle"""
+        feed = EdgarFeed.from_file(FIXTURE, overlap=0, since=feed_time("15:30:00"))
+        
+        # Assert that only entries after the last cycle were counted
+        assert feed.changed_ciks() == {"0000320193", "0001494730", "0001318605"}
+        
+        # Assert that the next cycle starts from the newest entry once the cycle is committed
+        assert feed.since == feed_time("15:30:00")
+        feed.commit()
+        assert feed.since == feed_time("16:40:11")
+    
+    def test_changed_ciks_failed_cycle_read_again(self):
+        """Test that a cycle that is never committed is read again by the next one"""
+        feed = EdgarFeed.from_file(FIXTURE, overlap=0, since=feed_time("15:30:00"))
+        feed.changed_ciks()
+        
+        # Assert that the CIKs of the failed cycle are listed again
+        assert feed.changed_ciks() == {"0000320193", "0001494730", "0001318605"}
+    
+    def test_changed_ciks_overlap(self):
+        """Test that entries just before the last cycle are looked at again"""
+        feed = EdgarFeed.from_file(FIXTURE, overlap=60 * 60, since=feed_time("15:30:00"))
+        
+        assert "0000789019" in feed.changed_ciks()
+    
+    def test_changed_ciks_first_cycle(self):
+        """Test that the first cycle can't tell what changed and asks for a full poll"""
+        feed = EdgarFeed.from_file(FIXTURE)
+        
+        assert feed.changed_ciks() is None
+        feed.commit()
+        assert feed.since == feed_time("16:40:11")
+    
+    def test_changed_ciks_window_not_covered(self):
+        """Test that a feed which does not reach back to the last cycle asks for a full poll"""
+        feed = EdgarFeed.from_file(FIXTURE, overlap=0, since=feed_time("12:00:00"))
+        
+        assert feed.changed_ciks() is None
+    
+    def test_changed_ciks_reads_pages(self, feed_xml):
+        """Test reading further pages until the last cycle is reached"""
+        entries = re.findall(r"<entry>.*?</entry>", feed_xml, re.DOTALL)
+        wrap = '<feed xmlns="http://www.w3.org/2005/Atom">{}</feed>'.format
+        pages = {0: wrap("".join(entries[:2])), 2: wrap("".join(entries[2:4])), 4: wrap(entries[4])}
+        requested = []
+        def fetch(start, count):
+            requested.append((start, count))
+            return pages.get(start, "")
+        feed = EdgarFeed(fetch=fetch, page_size=2, overlap=0, since=feed_time("14:00:00"))
+        
+        ciks = feed.changed_ciks()
+        
+        # Assert that pages were read until the entry older than the last cycle
+        assert requested == [(0, 2), (2, 2), (4, 2)]
+        assert ciks == {"0000320193", "0001494730", "0001318605", "0000789019"}
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_fetch_page(self, mock_get, fresh_sec_limiter):
+        """Test that feed pages are fetched through the shared SEC client"""
+        mock_get.return_value.text = "<feed/>"
+        
+        assert fetch_page(100, 100) == "<feed/>"
+        
+        # Assert that the page was requested and rate limited
+        assert "start=100&count=100" in mock_get.call_args.args[0]
+        assert fresh_sec_limiter.stats()['requests'] == 1
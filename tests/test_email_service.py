@@ -1,4 +1,5 @@
 import pytest
+import smtplib
 from unittest.mock import patch, MagicMock
 
 from app.services.email_service import EmailService
@@ -52,7 +53,9 @@ class TestEmailService:
         # Assert that the email was sent
         mock_server.sendmail.assert_called_once()
         
-        # Assert that the server was closed
+        # Assert that the session was kept open until the service is closed
+        mock_server.quit.assert_not_called()
+        email_service.close()
         mock_server.quit.assert_called_once()
         
         # Assert that the method returned True
@@ -109,4 +112,108 @@ class TestEmailService:
         assert "From: sender@example.com" in email_text
         assert "To: recipient@example.com" in email_text
         assert "Subject: Test Subject" in email_text
-        assert "Test Message" in email_text
\ No newline at end of file
+        assert "Test Message" in email_text
+    
+    @patch('app.services.email_service.EmailService.connect')
+    def test_session_reused_across_sends(self, mock_connect):
+        """Test that one login is shared by many emails up to the per-session cap"""
+        servers = [MagicMock(), MagicMock(), MagicMock()]
+        mock_connect.side_effect = servers
+        email_service = EmailService(max_messages=3)
+        
+        for i in range(7):
+            assert email_service.send_email(subscriber_email=f'user{i}@example.com', subject='Subject', message='Message')
+        
+        # Assert that a new session was only opened every 3 emails
+        assert mock_connect.call_count == 3
+        assert [server.sendmail.call_count for server in servers] == [3, 3, 1]
+        
+        # Assert that full sessions were logged out and the last one kept open
+        servers[0].quit.assert_called_once()
+        servers[1].quit.assert_called_once()
+        servers[2].quit.assert_not_called()
+    
+    @patch('app.services.email_service.EmailService.connect')
+    def test_reconnect_after_disconnect(self, mock_connect):
+        """Test that a session closed by the server is replaced and the email still sent"""
+        dead_server = MagicMock()
+        dead_server.sendmail.side_effect = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        live_server = MagicMock()
+        mock_connect.side_effect = [dead_server, live_server]
+        email_service = EmailService()
+        
+        result = email_service.send_email(subscriber_email='test@example.com', subject='Subject', message='Message')
+        
+        # Assert that the email went out on a new session
+        assert result is True
+        live_server.sendmail.assert_called_once()
+        assert [session.server for session in email_service._idle] == [live_server]
+    
+    @patch('app.services.email_service.time.monotonic')
+    @patch('app.services.email_service.EmailService.connect')
+    def test_noop_check_after_idle(self, mock_connect, mock_monotonic):
+        """Test that an idle session is checked with NOOP and replaced if it doesn't answer"""
+        stale_server = MagicMock()
+        stale_server.noop.side_effect = smtplib.SMTPServerDisconnected("gone")
+        fresh_server = MagicMock()
+        fresh_server.noop.return_value = (250, b'OK')
+        mock_connect.side_effect = [stale_server, fresh_server]
+        email_service = EmailService(noop_after=30)
+        
+        # Send once, then again within the idle window
+        mock_monotonic.return_value = 0
+        email_service.send_email(subscriber_email='a@example.com', subject='Subject', message='Message')
+        mock_monotonic.return_value = 10
+        email_service.send_email(subscriber_email='b@example.com', subject='Subject', message='Message')
+        
+        # Assert that a recently used session is reused without a NOOP
+        stale_server.noop.assert_not_called()
+        assert stale_server.sendmail.call_count == 2
+        
+        # Assert that after sitting idle the dead session is dropped for a new one
+        mock_monotonic.return_value = 100
+        email_service.send_email(subscriber_email='c@example.com', subject='Subject', message='Message')
+        stale_server.noop.assert_called_once()
+        fresh_server.sendmail.assert_called_once()
+    
+    @patch('app.services.email_service.MIMEMultipart')
+    @patch('app.services.email_service.EmailService.connect')
+    def test_message_rendered_once_per_content(self, mock_connect, mock_multipart):
+        """Test that one message sent to many recipients is only built once"""
+        mock_multipart.return_value.as_string.return_value = "Subject: New AAPL filing\n\nbody"
+        email_service = EmailService()
+        
+        for recipient in ['a@example.com', 'b@example.com', 'c@example.com']:
+            email_service.send_email(subscriber_email=recipient, subject='New AAPL filing', message='body', html='<p>body</p>')
+        
+        # Assert that the MIME message was built once and only the To line differs
+        mock_multipart.assert_called_once()
+        sent = [call.args[2] for call in mock_connect.return_value.sendmail.call_args_list]
+        assert sent == [f"To: {recipient}\nSubject: New AAPL filing\n\nbody" for recipient in ['a@example.com', 'b@example.com', 'c@example.com']]
+    
+    @patch('app.services.email_service.EmailService.connect')
+    def test_html_alternative(self, mock_connect):
+        """Test that a separate HTML body is sent as the HTML alternative"""
+        email_service = EmailService()
+        
+        email_service.send_email(subscriber_email='a@example.com', subject='Subject', message='plain body', html='<p>html body</p>')
+        
+        # Assert that both parts are in the message
+        email_text = mock_connect.return_value.sendmail.call_args.args[2]
+        assert "Content-Type: text/plain" in email_text
+        assert "plain body" in email_text
+        assert "Content-Type: text/html" in email_text
+        assert "<p>html body</p>" in email_text
+    
+    def test_render_cache_bounded(self):
+        """Test that the render cache drops the least recently used message"""
+        email_service = EmailService()
+        email_service.render_cache_size = 2
+        
+        first = email_service.render('One', 'one')
+        email_service.render('Two', 'two')
+        assert email_service.render('One', 'one') is first
+        email_service.render('Three', 'three')
+        
+        # Assert that the least recently used message was evicted
+        assert [key[0] for key in email_service._rendered] == ['One', 'Three']
@@ -0,0 +1,72 @@
+import pytest
+import os
+import json
+
+from app.storage.journal import Journal
+from app.storage.file_lock import fcntl
+
+
+class TestJournal:
+    """Test cases for the append-only store journal"""
+
+    @pytest.fixture
+    def journal_path(self, temp_dir):
+        """Fixture for a journal file path"""
+        return os.path.join(temp_dir, "subscribers.json.log")
+
+    def test_append_and_read_entries(self, journal_path):
+        """Test that entries read back in the order they were appended"""
+        journal = Journal(journal_path, max_bytes=1024)
+        journal.append({"op": "remove", "email": "a@example.com"})
+        journal.append({"op": "remove", "email": "b@example.com"}, {"op": "remove", "email": "c@example.com"})
+
+        # Assert that each entry is one line
+        with open(journal_path, 'r') as f:
+            assert len(f.readlines()) == 3
+        assert [entry["email"] for entry in journal.entries()] == ["a@example.com", "b@example.com", "c@example.com"]
+
+        # Assert that compaction is asked for once past the threshold
+        assert journal.needs_compaction() is False
+        journal.max_bytes = journal.size()
+        assert journal.needs_compaction() is True
+
+        # Assert that clearing empties it
+        journal.clear()
+        assert journal.entries() == []
+        assert journal.size() == 0
+
+    def test_torn_entry_dropped(self, journal_path):
+        """Test that an entry cut short by a crash is dropped before appending again"""
+        with open(journal_path, 'w') as f:
+            f.write(json.dumps({"op": "remove", "email": "a@example.com"}) + "\n")
+            f.write('{"op": "remove", "em')
+
+        journal = Journal(journal_path, max_bytes=1024)
+        journal.append({"op": "remove", "email": "b@example.com"})
+
+        # Assert that only the complete entries are left
+        assert [entry["email"] for entry in journal.entries()] == ["a@example.com", "b@example.com"]
+
+    @pytest.mark.skipif(fcntl is None, reason="flock is not available")
+    def test_lock_shuts_out_other_processes(self, journal_path):
+        """Test that the journal lock is re-entrant in its holder and excludes other open descriptions"""
+        journal = Journal(journal_path, max_bytes=1024)
+
+        with journal.lock:
+            # Assert that the holder can append while holding the lock
+            journal.append({"op": "remove", "email": "a@example.com"})
+
+            # Assert that another process (another open file) can't take it meanwhile
+            fd = os.open(journal.lock.file_path, os.O_RDWR)
+            try:
+                with pytest.raises(BlockingIOError):
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            finally:
+                os.close(fd)
+
+        # Assert that the lock is released afterwards
+        fd = os.open(journal.lock.file_path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
@@ -0,0 +1,159 @@
+import pytest
+import os
+import json
+from unittest.mock import patch
+
+from app.storage.outbox import Outbox
+from app.storage.journal import Journal
+
+
+class FakeClock:
+    """Wall clock that only moves when told to"""
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def email(key="0000320193-23-000001:john@example.com", to="john@example.com"):
+    return {"key": key, "to": to, "subject": "New AAPL filing", "message": "New AAPL filing"}
+
+
+class TestOutbox:
+    """Test cases for the durable email outbox"""
+
+    @pytest.fixture
+    def clock(self):
+        """Fixture for a controllable clock"""
+        return FakeClock()
+
+    @pytest.fixture
+    def outbox_path(self, temp_dir):
+        """Fixture for the outbox directory"""
+        return os.path.join(temp_dir, "outbox")
+
+    def test_enqueue_survives_restart(self, outbox_path, clock):
+        """Test that queued emails are spooled to disk and found again by a new outbox"""
+        outbox = Outbox(outbox_path, clock=clock)
+        assert outbox.enqueue([email(), email(key="0000320193-23-000001:jane@example.com", to="jane@example.com")]) == 2
+
+        # Assert that a new outbox sees the same emails with their body, oldest first
+        reopened = Outbox(outbox_path, clock=clock)
+        assert [(queued["to"], queued["subject"], queued["message"]) for queued in reopened.due()] == [
+            ("john@example.com", "New AAPL filing", "New AAPL filing"),
+            ("jane@example.com", "New AAPL filing", "New AAPL filing")]
+
+    def test_enqueue_one_append_body_stored_once(self, outbox_path, clock):
+        """Test that a cycle's emails are spooled with one append and a body they share is stored once"""
+        outbox = Outbox(outbox_path, clock=clock)
+        emails = [email(key=f"0000320193-23-000001:{name}@example.com", to=f"{name}@example.com")
+                  for name in ["ann", "bob", "cal"]]
+        emails.append(dict(email(key="0000320193-23-000002:ann@example.com", to="ann@example.com"),
+                           subject="New AAPL 8-K filing"))
+
+        with patch.object(Journal, 'append', autospec=True, side_effect=Journal.append) as mock_append:
+            assert outbox.enqueue(emails) == 4
+
+        # Assert that everything went to disk in one append, each distinct body once
+        mock_append.assert_called_once()
+        entries = outbox._queue_log.entries()
+        assert [entry["op"] for entry in entries].count("body") == 2
+        assert [entry["op"] for entry in entries].count("queued") == 4
+        assert "message" not in entries[-1]["email"]
+
+    def test_enqueue_idempotent(self, outbox_path, clock):
+        """Test that an email with a key already pending or delivered is not queued again"""
+        outbox = Outbox(outbox_path, clock=clock)
+        outbox.enqueue([email()])
+
+        # Assert that a pending key is skipped
+        assert outbox.enqueue([email()]) == 0
+        assert outbox.pending_count() == 1
+
+        # Assert that a delivered key is skipped, also after a restart
+        outbox.mark_sent(outbox.due()[0])
+        assert outbox.pending_count() == 0
+        assert outbox.enqueue([email()]) == 0
+        assert Outbox(outbox_path, clock=clock).enqueue([email()]) == 0
+
+    def test_retry_backoff(self, outbox_path, clock):
+        """Test that failed emails are retried with an exponentially growing delay up to the max"""
+        outbox = Outbox(outbox_path, retry_delay=60, max_retry_delay=200, max_attempts=10, clock=clock)
+        outbox.enqueue([email()])
+
+        delays = []
+        for _ in range(4):
+            queued = outbox.due()[0]
+            outbox.mark_failed(queued)
+            next_attempt = Outbox(outbox_path, clock=clock)._pending[queued["key"]]["next_attempt"]
+            delays.append(next_attempt - clock.now)
+
+            # Assert that the email isn't due again until its delay has passed
+            assert outbox.due() == []
+            clock.now = next_attempt
+
+        assert delays == [60, 120, 200, 200]
+
+    def test_gives_up_after_max_attempts(self, outbox_path, clock):
+        """Test that an email failing too often is moved out of the way"""
+        outbox = Outbox(outbox_path, retry_delay=1, max_attempts=2, clock=clock)
+        outbox.enqueue([email()])
+
+        outbox.mark_failed(outbox.due()[0])
+        clock.now += 1
+        outbox.mark_failed(outbox.due()[0])
+
+        # Assert that it was moved to failed/ with its attempt count
+        assert outbox.pending_count() == 0
+        failed = os.listdir(os.path.join(outbox_path, "failed"))
+        assert len(failed) == 1
+        with open(os.path.join(outbox_path, "failed", failed[0]), 'r') as f:
+            assert json.load(f)["attempts"] == 2
+
+    def test_delivered_keys_expire(self, outbox_path, clock):
+        """Test that compacting the delivered log forgets keys older than keep_delivered"""
+        outbox = Outbox(outbox_path, keep_delivered=100, clock=clock)
+        outbox.enqueue([email()])
+        outbox.mark_sent(outbox.due()[0])
+
+        clock.now += 101
+        outbox._delivered_log.max_bytes = 1
+        outbox.enqueue([email(key="0000320193-23-000002:john@example.com")])
+        outbox.mark_sent(outbox.due()[0])
+
+        # Assert that only the recent key is remembered, and the forgotten one isn't queued again
+        reopened = Outbox(outbox_path, clock=clock)
+        assert list(reopened._delivered) == ["0000320193-23-000002:john@example.com"]
+        assert reopened.pending_count() == 0
+
+    def test_queue_compacted(self, outbox_path, clock):
+        """Test that the queue is rewritten as the emails still pending once it grows past its threshold"""
+        outbox = Outbox(outbox_path, clock=clock)
+        outbox.enqueue([email(), dict(email(key="0000320193-23-000002:jane@example.com", to="jane@example.com"),
+                                      subject="New AAPL 8-K filing")])
+        outbox._queue_log.max_bytes = 1
+
+        outbox.mark_sent(outbox.due()[0])
+
+        # Assert that only Jane's email and its body are left, and a new outbox still sends it
+        assert [entry["op"] for entry in outbox._queue_log.entries()] == ["body", "queued"]
+        assert [(queued["to"], queued["subject"]) for queued in Outbox(outbox_path, clock=clock).due()] == [
+            ("jane@example.com", "New AAPL 8-K filing")]
+
+    def test_pending_files_migrated(self, outbox_path, clock):
+        """Test that emails spooled one file each by an older outbox are moved into the queue"""
+        pending_dir = os.path.join(outbox_path, "pending")
+        os.makedirs(pending_dir)
+        with open(os.path.join(pending_dir, "0001.json"), 'w') as f:
+            json.dump(dict(email(), attempts=2, next_attempt=clock.now + 60, created=clock.now - 10), f)
+
+        outbox = Outbox(outbox_path, clock=clock)
+
+        # Assert that the email kept its retry schedule and the old spool directory is gone
+        assert outbox.pending_count() == 1
+        assert outbox.due() == []
+        clock.now += 60
+        assert [(queued["to"], queued["attempts"]) for queued in Outbox(outbox_path, clock=clock).due()] == [
+            ("john@example.com", 2)]
+        assert not os.path.exists(pending_dir)
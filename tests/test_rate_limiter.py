@@ -0,0 +1,94 @@
+import pytest
+import threading
+
+from app.services.rate_limiter import RateLimiter
+
+class FakeClock:
+    """Clock that only moves when the limiter sleeps"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestRateLimiter:
+    """Test cases for the token bucket rate limiter"""
+    
+    @pytest.fixture
+    def clock(self):
+        """Fixture for a fake clock"""
+        return FakeClock()
+    
+    def test_invalid_settings(self):
+        """Test that the limiter rejects a rate or burst it cannot honour"""
+        with pytest.raises(ValueError, match="Rate must be positive"):
+            RateLimiter(rate=0)
+        with pytest.raises(ValueError, match="Burst must be at least 1"):
+            RateLimiter(rate=10, burst=0)
+    
+    def test_requests_spaced_to_rate(self, clock):
+        """Test that back to back requests are spaced out to the rate"""
+        limiter = RateLimiter(rate=10, clock=clock, sleep=clock.sleep)
+        
+        for _ in range(5):
+            limiter.acquire()
+        
+        # Assert that the first request went straight out and the rest waited 0.1s each
+        assert clock.sleeps == pytest.approx([0.1] * 4)
+        assert clock.now == pytest.approx(0.4)
+    
+    def test_burst_allowed_after_idle(self, clock):
+        """Test that an idle limiter lets a burst through without waiting"""
+        limiter = RateLimiter(rate=10, burst=3, clock=clock, sleep=clock.sleep)
+        
+        # Let the bucket fill up
+        clock.now = 60.0
+        for _ in range(3):
+            assert limiter.acquire() == 0.0
+        
+        # Assert that the fourth request waits for a token
+        assert limiter.acquire() == pytest.approx(0.1)
+    
+    def test_wait_counters(self, clock):
+        """Test the counters for how long callers waited"""
+        limiter = RateLimiter(rate=4, clock=clock, sleep=clock.sleep)
+        
+        for _ in range(3):
+            limiter.acquire()
+        stats = limiter.stats()
+        
+        # Assert that two of the three requests waited 0.25s each
+        assert stats['requests'] == 3
+        assert stats['waits'] == 2
+        assert stats['wait_time'] == pytest.approx(0.5)
+        assert stats['max_wait'] == pytest.approx(0.25)
+        assert stats['avg_wait'] == pytest.approx(0.5 / 3)
+        
+        # Assert that the counters can be reset
+        limiter.reset_stats()
+        assert limiter.stats()['requests'] == 0
+    
+    def test_shared_between_threads(self, clock):
+        """Test that concurrent callers each get their own slot"""
+        limiter = RateLimiter(rate=10, clock=clock, sleep=lambda seconds: None)
+        waits = []
+        lock = threading.Lock()
+        
+        def worker():
+            wait = limiter.acquire()
+            with lock:
+                waits.append(wait)
+        
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Assert that the ten callers were given ten distinct slots 0.1s apart
+        assert sorted(waits) == pytest.approx([i / 10 for i in range(10)])
@@ -5,6 +5,7 @@ from scheduler import scheduled_task
 from app.storage.ticker_store import TickerStore
 from app.storage.sub_store import SubStore
 from app.services.email_service import EmailService
+from app.storage.outbox import Outbox
 
 class TestScheduler:
     """Test cases for the scheduler functionality"""
@@ -28,6 +29,9 @@ class TestScheduler:
         # Call the scheduled_task function
         result = scheduled_task(mock_ticker_store, mock_sub_store)
         
+        # Assert that the ticker set was reconciled before polling
+        mock_sub_store.reconcile_tickers.assert_called_once()
+        
         # Assert that check_filings was called
         mock_ticker_store.check_filings.assert_called_once()
         
@@ -42,7 +46,7 @@ class TestScheduler:
         """Test scheduled task when there are new filings"""
         # Mock check_filings to return a dictionary with new filings
         mock_filing = MagicMock()
-        mock_ticker_store.check_filings.return_value = {"AAPL": mock_filing}
+        mock_ticker_store.check_filings.return_value = {"AAPL": [mock_filing]}
         
         # Mock get_subscribers_by_ticker to return a list of subscribers
         mock_subscribers = [
@@ -80,8 +84,8 @@ class TestScheduler:
         mock_filing_aapl = MagicMock()
         mock_filing_msft = MagicMock()
         mock_ticker_store.check_filings.return_value = {
-            "AAPL": mock_filing_aapl,
-            "MSFT": mock_filing_msft
+            "AAPL": [mock_filing_aapl],
+            "MSFT": [mock_filing_msft]
         }
         
         # Mock get_subscribers_by_ticker to return different subscribers for each ticker
@@ -118,12 +122,37 @@ class TestScheduler:
         # Assert that the function returned True
         assert result is True
     
+    @patch('scheduler.EmailService')
+    def test_scheduled_task_with_several_filings(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
+        """Test scheduled task when a ticker made several filings since the last check"""
+        # Mock check_filings to return two filings for one ticker
+        mock_ticker_store.check_filings.return_value = {"AAPL": [MagicMock(), MagicMock()]}
+        
+        # Mock get_subscribers_by_ticker to return two subscribers
+        mock_sub_store.get_subscribers_by_ticker.return_value = [
+            {"email": "john@example.com", "name": "John", "tickers": ["AAPL"]},
+            {"email": "jane@example.com", "name": "Jane", "tickers": ["AAPL"]}
+        ]
+        
+        # Mock EmailService
+        mock_email_service = MagicMock(spec=EmailService)
+        mock_email_service_class.return_value = mock_email_service
+        
+        result = scheduled_task(mock_ticker_store, mock_sub_store)
+        
+        # Assert that the subscribers were looked up once
+        mock_sub_store.get_subscribers_by_ticker.assert_called_once_with("AAPL")
+        
+        # Assert that every subscriber was notified of every filing
+        assert mock_email_service.send_email.call_count == 4
+        assert result is True
+    
     @patch('scheduler.EmailService')
     def test_scheduled_task_with_no_subscribers(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
         """Test scheduled task when there are new filings but no subscribers"""
         # Mock check_filings to return a dictionary with new filings
         mock_filing = MagicMock()
-        mock_ticker_store.check_filings.return_value = {"AAPL": mock_filing}
+        mock_ticker_store.check_filings.return_value = {"AAPL": [mock_filing]}
         
         # Mock get_subscribers_by_ticker to return an empty list
         mock_sub_store.get_subscribers_by_ticker.return_value = []
@@ -148,4 +177,83 @@ class TestScheduler:
         mock_email_service.send_email.assert_not_called()
         
         # Assert that the function returned True
-        assert result is True
\ No newline at end of file
+        assert result is True
+    
+    @patch('scheduler.EmailService')
+    def test_scheduled_task_digest(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
+        """Test that digest mode sends each subscriber one email with all their new filings"""
+        mock_ticker_store.check_filings.return_value = {
+            "AAPL": [{"form": "8-K"}, {"form": "10-Q"}],
+            "MSFT": [{"form": "10-K"}]
+        }
+        john = {"email": "john@example.com", "name": "John", "tickers": ["AAPL", "MSFT"]}
+        jane = {"email": "jane@example.com", "name": "Jane", "tickers": ["MSFT"]}
+        mock_sub_store.get_subscribers_by_ticker.side_effect = lambda ticker: {"AAPL": [john], "MSFT": [john, jane]}[ticker]
+        
+        mock_email_service = MagicMock(spec=EmailService)
+        mock_email_service_class.return_value = mock_email_service
+        
+        result = scheduled_task(mock_ticker_store, mock_sub_store, digest=True)
+        
+        # Assert that one email went to each distinct subscriber
+        sent = {call.kwargs["subscriber_email"]: call.kwargs for call in mock_email_service.send_email.call_args_list}
+        assert mock_email_service.send_email.call_count == 2
+        assert sent["john@example.com"]["subject"] == "3 new filings for AAPL, MSFT"
+        assert sent["jane@example.com"]["subject"] == "1 new filing for MSFT"
+        
+        # Assert that John's email lists every filing
+        assert "8-K" in sent["john@example.com"]["message"]
+        assert "10-Q" in sent["john@example.com"]["message"]
+        assert "10-K" in sent["john@example.com"]["message"]
+        assert result is True
+    
+    @patch('scheduler.EmailService')
+    def test_scheduled_task_with_outbox(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
+        """Test that with an outbox the emails are only queued, keyed by accession and subscriber"""
+        mock_ticker_store.check_filings.return_value = {"AAPL": [{"accessionNumber": "0000320193-23-000001"}]}
+        mock_sub_store.get_subscribers_by_ticker.return_value = [
+            {"email": "John@Example.com", "name": "John", "tickers": ["AAPL"]}
+        ]
+        mock_outbox = MagicMock(spec=Outbox)
+        
+        result = scheduled_task(mock_ticker_store, mock_sub_store, outbox=mock_outbox)
+        
+        # Assert that nothing was sent during polling
+        mock_email_service_class.assert_not_called()
+        
+        # Assert that the email was queued under its idempotency key
+        (queued,), _ = mock_outbox.enqueue.call_args
+        assert [email["key"] for email in queued] == ["0000320193-23-000001:john@example.com"]
+        assert result is True
+    
+    @patch('scheduler.EmailService')
+    def test_scheduled_task_queues_before_saving_state(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
+        """Test that the ticker state is only saved once the emails are in the outbox"""
+        mock_ticker_store.check_filings.return_value = {"AAPL": [{"accessionNumber": "0000320193-23-000001"}]}
+        mock_sub_store.get_subscribers_by_ticker.return_value = [
+            {"email": "john@example.com", "name": "John", "tickers": ["AAPL"]}
+        ]
+        mock_outbox = MagicMock(spec=Outbox)
+        calls = MagicMock()
+        calls.attach_mock(mock_outbox.enqueue, "enqueue")
+        calls.attach_mock(mock_ticker_store.commit_filings, "commit_filings")
+        
+        scheduled_task(mock_ticker_store, mock_sub_store, outbox=mock_outbox)
+        
+        # Assert that polling didn't save and the state was saved after queueing
+        mock_ticker_store.check_filings.assert_called_once_with(commit=False)
+        assert [call[0] for call in calls.mock_calls] == ["enqueue", "commit_filings"]
+    
+    @patch('scheduler.EmailService')
+    def test_scheduled_task_failure_keeps_state(self, mock_email_service_class, mock_ticker_store, mock_sub_store):
+        """Test that a failure before the emails are queued leaves the filings to be found again"""
+        mock_ticker_store.check_filings.return_value = {"AAPL": [{"accessionNumber": "0000320193-23-000001"}]}
+        mock_sub_store.get_subscribers_by_ticker.side_effect = OSError("subscribers unreadable")
+        mock_outbox = MagicMock(spec=Outbox)
+        
+        with pytest.raises(OSError):
+            scheduled_task(mock_ticker_store, mock_sub_store, outbox=mock_outbox)
+        
+        # Assert that nothing was queued and the ticker state wasn't saved
+        mock_outbox.enqueue.assert_not_called()
+        mock_ticker_store.commit_filings.assert_not_called()
@@ -1,13 +1,18 @@
 import pytest
+import os
+import json
+import threading
+import zipfile
 import pandas as pd
 from unittest.mock import patch, MagicMock
 
-from app.services.sec_service import get_cik, get_filings, check_new_filings
+from app.services import sec_service
+from app.services.sec_service import get_cik, get_filings, check_new_filings, CIKMap
 
 class TestSECService:
     """Test cases for the SEC service"""
     
-    @patch('app.services.sec_service.r.get')
+    @patch('app.services.sec_service.sec_client.session.get')
     def test_get_cik_valid_ticker(self, mock_get):
         """Test getting CIK for a valid ticker"""
         # Mock the response from the SEC API
@@ -26,7 +31,7 @@ class TestSECService:
         # Assert that the API was called with the correct URL and headers
         mock_get.assert_called_once()
     
-    @patch('app.services.sec_service.r.get')
+    @patch('app.services.sec_service.sec_client.session.get')
     def test_get_cik_invalid_ticker(self, mock_get):
         """Test getting CIK for an invalid ticker"""
         # Mock the response from the SEC API
@@ -45,7 +50,7 @@ class TestSECService:
         # Assert that the API was called
         mock_get.assert_called_once()
     
-    @patch('app.services.sec_service.r.get')
+    @patch('app.services.sec_service.sec_client.session.get')
     def test_get_cik_no_leading_zeros(self, mock_get):
         """Test getting CIK without leading zeros"""
         # Mock the response from the SEC API
@@ -65,7 +70,7 @@ class TestSECService:
         mock_get.assert_called_once()
     
     @patch('app.services.sec_service.get_cik')
-    @patch('app.services.sec_service.r.get')
+    @patch('app.services.sec_service.sec_client.session.get')
     def test_get_filings(self, mock_get, mock_get_cik):
         """Test getting filings for a ticker"""
         # Mock the get_cik function to return a valid CIK
@@ -100,6 +105,167 @@ class TestSECService:
         # Assert that the API was called with the correct URL
         mock_get.assert_called_once()
     
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_requests_go_through_limiter(self, mock_get, fresh_sec_limiter):
+        """Test that every SEC request takes a token from the shared limiter"""
+        mock_get.return_value.json.return_value = {
+            "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}
+        }
+        
+        get_cik("AAPL")
+        sec_service.sec_client.get("https://www.sec.gov/example")
+        
+        # Assert that both requests were counted by the limiter
+        assert fresh_sec_limiter.stats()['requests'] == 2
+    
+    def test_client_session_headers(self, fresh_sec_client):
+        """Test that the SEC headers and gzip encoding are set once on the session"""
+        headers = fresh_sec_client.session.headers
+        
+        assert headers['Accept-Encoding'] == 'gzip, deflate'
+        for key, value in sec_service.HEADERS.items():
+            if value is not None:
+                assert headers[key] == value
+    
+    def test_client_reuses_connections(self, fresh_sec_client):
+        """Test that polling workers share one keep-alive connection pool"""
+        adapter = fresh_sec_client.session.get_adapter("https://data.sec.gov/submissions/CIK0000320193.json")
+        
+        # Assert that the same adapter serves both SEC hosts
+        assert adapter is fresh_sec_client.session.get_adapter("https://www.sec.gov/files/company_tickers.json")
+        assert adapter._pool_maxsize == sec_service.POLL_WORKERS
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_client_raises_http_errors(self, mock_get, fresh_sec_client):
+        """Test that an error status from the SEC is raised, not parsed"""
+        mock_get.return_value.raise_for_status.side_effect = sec_service.r.HTTPError("403 Forbidden")
+        
+        with pytest.raises(sec_service.r.HTTPError):
+            fresh_sec_client.get_json("https://data.sec.gov/submissions/CIK0000320193.json")
+        
+        # Assert that the response body was never parsed
+        mock_get.return_value.json.assert_not_called()
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_conditional_submissions_request(self, mock_get):
+        """Test that a repeated submissions request sends the validators and skips parsing on 304"""
+        first = MagicMock(status_code=200, headers={"ETag": '"v1"', "Last-Modified": "Mon, 02 Jan 2023 10:00:00 GMT"})
+        first.json.return_value = {"filings": {"recent": {}}}
+        second = MagicMock(status_code=304, headers={})
+        mock_get.side_effect = [first, second]
+        
+        # First poll downloads the document
+        assert sec_service.get_submissions("0000320193", conditional=True) == {"filings": {"recent": {}}}
+        assert mock_get.call_args.kwargs["headers"] == {}
+        
+        # Second poll sends the validators and gets a 304
+        assert sec_service.get_submissions("0000320193", conditional=True) is None
+        assert mock_get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 02 Jan 2023 10:00:00 GMT"
+        }
+        
+        # Assert that the 304 body was never parsed
+        second.json.assert_not_called()
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_unconditional_submissions_request(self, mock_get, fresh_sec_client):
+        """Test that a plain submissions request never sends validators"""
+        fresh_sec_client._validators[sec_service.SEC_FILINGS_URL.format(cik="0000320193")] = {"ETag": '"v1"'}
+        mock_get.return_value.json.return_value = {"filings": {"recent": {}}}
+        
+        sec_service.get_submissions("0000320193")
+        
+        # Assert that no conditional headers were sent
+        assert "headers" not in mock_get.call_args.kwargs
+    
+    def test_latest_filing_skips_insider_forms(self):
+        """Test that the fast path returns the newest non-insider filing as a dict"""
+        submissions = {
+            "filings": {
+                "recent": {
+                    "accessionNumber": ["0000320193-23-000003", "0000320193-23-000002", "0000320193-23-000001"],
+                    "filingDate": ["2023-01-03", "2023-01-02", "2023-01-01"],
+                    "reportDate": ["", "2022-12-31", "2022-12-31"],
+                    "form": ["4", "8-K", "10-K"]
+                }
+            }
+        }
+        
+        filing = sec_service.latest_filing(submissions)
+        
+        # Assert that the insider form was skipped and the whole row returned
+        assert filing == {
+            "accessionNumber": "0000320193-23-000002",
+            "filingDate": "2023-01-02",
+            "reportDate": "2022-12-31",
+            "form": "8-K"
+        }
+        
+        # Assert that it agrees with the DataFrame path
+        assert filing["accessionNumber"] == sec_service.filings_frame(submissions).iloc[0]["accessionNumber"]
+        
+        # Assert that insider forms are returned when asked for
+        assert sec_service.latest_filing(submissions, exclude_insider=False)["form"] == "4"
+    
+    def test_latest_filing_none(self):
+        """Test that the fast path returns None when only insider forms were filed"""
+        submissions = {"filings": {"recent": {"accessionNumber": ["0000320193-23-000001"], "form": ["4"]}}}
+        
+        assert sec_service.latest_filing(submissions) is None
+        assert sec_service.latest_filing({"filings": {"recent": {}}}) is None
+    
+    def test_filings_since(self):
+        """Test finding every filing since the stored one"""
+        submissions = {
+            "filings": {
+                "recent": {
+                    "accessionNumber": ["0000320193-23-000004", "0000320193-23-000003", "0000320193-23-000002", "0000320193-23-000001"],
+                    "filingDate": ["2023-01-04", "2023-01-03", "2023-01-02", "2023-01-01"],
+                    "form": ["8-K", "4", "10-Q", "10-K"]
+                }
+            }
+        }
+        
+        # Assert that the scan stops at the stored accession number
+        filings = sec_service.filings_since(submissions, "0000320193-23-000002", "2023-01-02")
+        assert [filing["accessionNumber"] for filing in filings] == ["0000320193-23-000004"]
+        
+        # Assert that the scan stops at the stored date if the accession number is gone
+        filings = sec_service.filings_since(submissions, "0000320193-22-000009", "2023-01-02")
+        assert [filing["accessionNumber"] for filing in filings] == ["0000320193-23-000002", "0000320193-23-000004"]
+        
+        # Assert that nothing is new when the stored filing is the newest
+        assert sec_service.filings_since(submissions, "0000320193-23-000004", "2023-01-04") == []
+        
+        # Assert that only the newest filing is returned when there is nothing to stop at
+        filings = sec_service.filings_since(submissions, "0000320193-22-000009")
+        assert [filing["accessionNumber"] for filing in filings] == ["0000320193-23-000004"]
+    
+    def test_read_bulk_submissions(self, temp_dir):
+        """Test reading only the requested CIKs out of submissions.zip"""
+        zip_path = os.path.join(temp_dir, "submissions.zip")
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            archive.writestr("CIK0000320193.json", json.dumps({"cik": "320193"}))
+            archive.writestr("CIK0000320193-submissions-001.json", json.dumps({"accessionNumber": []}))
+            archive.writestr("CIK0000789019.json", json.dumps({"cik": "789019"}))
+        
+        # Record which members get opened
+        opened = []
+        original_open = zipfile.ZipFile.open
+        def recording_open(archive, name, *args, **kwargs):
+            opened.append(name)
+            return original_open(archive, name, *args, **kwargs)
+        
+        with patch.object(zipfile.ZipFile, 'open', recording_open):
+            found = dict(sec_service.read_bulk_submissions(zip_path, ["0000320193", "0001318605"]))
+        
+        # Assert that only the watched member was opened
+        assert opened == ["CIK0000320193.json"]
+        
+        # Assert that missing CIKs are skipped
+        assert found == {"0000320193": {"cik": "320193"}}
+    
     @patch('app.services.sec_service.get_filings')
     def test_check_new_filings_true(self, mock_get_filings):
         """Test checking for new filings when there are filings"""
@@ -134,4 +300,68 @@ class TestSECService:
         assert result is False
         
         # Assert that get_filings was called with the correct ticker
-        mock_get_filings.assert_called_once_with("AAPL")
\ No newline at end of file
+        mock_get_filings.assert_called_once_with("AAPL")
+
+
+class TestCIKMap:
+    """Test cases for the shared ticker -> CIK lookup table"""
+
+    @pytest.fixture
+    def company_tickers(self):
+        """Fixture for a company_tickers.json payload"""
+        return {
+            "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+            "1": {"cik_str": 789019, "ticker": "MSFT", "title": "Microsoft Corp"}
+        }
+
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_lookups_share_one_download(self, mock_get, company_tickers):
+        """Test that repeated lookups only download the table once"""
+        mock_get.return_value.json.return_value = company_tickers
+
+        assert get_cik("AAPL") == "0000320193"
+        assert get_cik("MSFT") == "0000789019"
+        assert get_cik("msft", lead_zeros=False) == "789019"
+        assert get_cik("INVALID") == ""
+
+        # Assert that the SEC was only called once
+        mock_get.assert_called_once()
+
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_table_persisted_to_disk(self, mock_get, company_tickers, temp_dir):
+        """Test that a restart reads the table back instead of downloading it"""
+        mock_get.return_value.json.return_value = company_tickers
+        cache_path = os.path.join(temp_dir, "company_tickers.json")
+
+        # First process downloads and saves the table
+        assert CIKMap(cache_path=cache_path).get("AAPL") == 320193
+        with open(cache_path) as f:
+            assert json.load(f) == {"AAPL": 320193, "MSFT": 789019}
+
+        # Second process reads it from disk
+        mock_get.reset_mock()
+        assert CIKMap(cache_path=cache_path).get("MSFT") == 789019
+        mock_get.assert_not_called()
+
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_stale_table_refreshed_in_background(self, mock_get, company_tickers):
+        """Test that a stale table keeps answering while it refreshes"""
+        mock_get.return_value.json.return_value = company_tickers
+        cik_map = CIKMap(ttl=0, cache_path=None)
+        cik_map.refresh()
+
+        # The table changes at the SEC, and the download is held open until released
+        released = threading.Event()
+        def slow_download():
+            released.wait(timeout=5)
+            return {"0": {"cik_str": 1318605, "ticker": "TSLA", "title": "Tesla, Inc."}}
+        mock_get.return_value.json.side_effect = slow_download
+
+        # The old table still answers while the refresh runs
+        assert cik_map.get("AAPL") == 320193
+        released.set()
+        cik_map._refresh_thread.join(timeout=5)
+
+        # The new table is swapped in afterwards
+        assert cik_map.get("TSLA") == 1318605
+        assert mock_get.call_count >= 2
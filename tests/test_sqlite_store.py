@@ -0,0 +1,252 @@
+import pytest
+import os
+import sqlite3
+import json
+from unittest.mock import patch
+
+from app.storage.sqlite_store import SQLiteDatabase, SQLiteTickerStore, SQLiteSubStore, migrate_json
+from app.storage.sub_store import SubStore
+from app.storage.ticker_store import TickerStore
+
+CIKS = {"AAPL": "0000320193", "MSFT": "0000789019", "GOOGL": "0001652044", "AMZN": "0001018724"}
+
+
+def fake_get_cik(ticker, lead_zeros=True):
+    return CIKS.get(ticker.upper(), "")
+
+
+def fake_is_known_ticker(ticker):
+    return ticker.upper() in CIKS
+
+
+def submissions(accession_number):
+    return {"filings": {"recent": {"accessionNumber": [accession_number], "filingDate": ["2023-01-02"],
+                                   "reportDate": ["2022-12-31"], "form": ["8-K"]}}}
+
+
+class TestSQLiteStore:
+    """Test cases for the SQLite storage backend"""
+
+    @pytest.fixture
+    def db(self, temp_dir):
+        """Fixture for a fresh database"""
+        db = SQLiteDatabase(os.path.join(temp_dir, "sec_watcher.db"))
+        yield db
+        db.close()
+
+    @pytest.fixture
+    def stores(self, db):
+        """Fixture for a ticker and subscriber store sharing one database"""
+        tick_store = SQLiteTickerStore(db)
+        return tick_store, SQLiteSubStore(db, ticker_store=tick_store)
+
+    def test_wal_mode_and_indexes(self, db):
+        """Test that the database is opened in WAL mode with the ticker index"""
+        # Assert that WAL journaling is on
+        assert db.query("PRAGMA journal_mode")[0][0] == "wal"
+
+        # Assert that subscribers can be looked up by ticker through an index
+        plan = " ".join(row[-1] for row in db.query(
+            "EXPLAIN QUERY PLAN SELECT subscriber_id FROM subscriber_tickers WHERE ticker = ?", ("AAPL",)))
+        assert "subscriber_tickers_by_ticker" in plan
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_add_and_remove_subscriber(self, mock_store_cik, mock_model_cik, stores):
+        """Test that adding and removing subscribers keeps the ticker state in sync"""
+        tick_store, sub_store = stores
+
+        assert sub_store.add_subscriber("John", "john@example.com", ["aapl", "MSFT"]) is True
+        assert sub_store.add_subscriber("Jane", "jane@example.com", ["AAPL", "GOOGL"]) is True
+
+        # Assert that the subscribers read back as they were added
+        assert sub_store.get_all_subscribers() == [
+            {"name": "John", "email": "john@example.com", "tickers": ["AAPL", "MSFT"]},
+            {"name": "Jane", "email": "jane@example.com", "tickers": ["AAPL", "GOOGL"]},
+        ]
+        assert [sub["email"] for sub in sub_store.get_subscribers_by_ticker("aapl")] == ["john@example.com", "jane@example.com"]
+        assert {tick["ticker"]: tick["cik"] for tick in tick_store.get_all_tickers()} == {
+            "AAPL": "0000320193", "MSFT": "0000789019", "GOOGL": "0001652044"}
+
+        # Assert that removing John drops the ticker only he watched
+        assert sub_store.remove_subscriber("JOHN@example.com") is True
+        assert sub_store.remove_subscriber("john@example.com") is False
+        assert sorted(tick["ticker"] for tick in tick_store.get_all_tickers()) == ["AAPL", "GOOGL"]
+        assert sub_store.get_subscribers_by_ticker("MSFT") == []
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_add_existing_subscriber(self, mock_store_cik, mock_model_cik, stores):
+        """Test that re-adding a subscriber updates their tickers or is rejected if unchanged"""
+        _, sub_store = stores
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL"])
+
+        # Assert that the same tickers are rejected as a duplicate
+        assert sub_store.add_subscriber("John", "John@Example.com", ["AAPL"]) is False
+
+        # Assert that new tickers replace the old ones without adding a row
+        assert sub_store.add_subscriber("John", "john@example.com", ["MSFT", "AMZN"]) is True
+        assert sub_store.get_all_subscribers() == [
+            {"name": "John", "email": "john@example.com", "tickers": ["MSFT", "AMZN"]}]
+
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_save_tickers_keeps_state(self, mock_get_cik, stores):
+        """Test that polling state written by save_tickers survives a ticker refresh"""
+        tick_store, _ = stores
+        tick_store.refresh_tickers(["AAPL", "MSFT"])
+        tickers = tick_store.get_all_tickers()
+        tickers[0]["last_filing"] = "0000320193-23-000001"
+        tickers[0]["last_filing_date"] = "2023-01-02"
+        tick_store.save_tickers(tickers)
+
+        tick_store.refresh_tickers(["AAPL", "GOOGL"])
+
+        # Assert that AAPL kept its baseline, MSFT was dropped and GOOGL was added
+        assert tick_store.get_all_tickers() == [
+            {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001", "last_filing_date": "2023-01-02"},
+            {"ticker": "GOOGL", "cik": "0001652044", "last_filing": "", "last_filing_date": ""},
+        ]
+
+        # Assert that only the added ticker's CIK was looked up
+        assert [call.args[0] for call in mock_get_cik.call_args_list] == ["AAPL", "MSFT", "GOOGL"]
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    @patch('app.storage.ticker_store.get_submissions')
+    def test_poll_keeps_tickers_added_meanwhile(self, mock_get_submissions, mock_store_cik, mock_model_cik, db, stores):
+        """Test that saving a poll doesn't drop a ticker another writer added while it ran"""
+        tick_store, sub_store = stores
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL"])
+        other_writer = SQLiteSubStore(db, ticker_store=SQLiteTickerStore(db))
+
+        def poll(cik, conditional=False):
+            #another process signs up for MSFT in the middle of the poll
+            other_writer.add_subscriber("Jane", "jane@example.com", ["MSFT"])
+            return submissions("0000320193-23-000001")
+        mock_get_submissions.side_effect = poll
+
+        tick_store.check_filings()
+
+        # Assert that AAPL got its baseline and MSFT is still watched
+        assert tick_store.get_all_tickers() == [
+            {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001", "last_filing_date": "2023-01-02"},
+            {"ticker": "MSFT", "cik": "0000789019", "last_filing": "", "last_filing_date": ""},
+        ]
+
+    def test_failed_transaction_rolls_back(self, db, stores):
+        """Test that a write that fails part way leaves the database unchanged"""
+        tick_store, _ = stores
+        tick_store.save_tickers([{"ticker": "AAPL", "cik": "0000320193"}])
+
+        # Assert that a record without a ticker fails the whole save, including the delete of AAPL
+        with pytest.raises(sqlite3.IntegrityError):
+            tick_store.save_tickers([{"ticker": "MSFT", "cik": "0000789019"}, {"ticker": None, "cik": "0001652044"}])
+        assert [tick["ticker"] for tick in tick_store.get_all_tickers()] == ["AAPL"]
+
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_migrate_json(self, mock_get_cik, db, temp_dir, sample_subscribers, sample_tickers):
+        """Test importing the JSON files into the database"""
+        sub_path = os.path.join(temp_dir, "subscribers.json")
+        tick_path = os.path.join(temp_dir, "tickers.json")
+        with open(sub_path, 'w') as f:
+            json.dump(sample_subscribers, f)
+        with open(tick_path, 'w') as f:
+            json.dump(sample_tickers, f)
+
+        migrate_json(sub_path, tick_path, db)
+
+        # Assert that subscribers and ticker state match the JSON stores
+        tick_store = SQLiteTickerStore(db)
+        sub_store = SQLiteSubStore(db, ticker_store=tick_store)
+        json_subs = SubStore(file_path=sub_path, ticker_store=TickerStore(file_path=tick_path))
+        assert sub_store.get_all_subscribers() == json_subs.get_all_subscribers()
+        assert sorted(sub_store.get_all_tickers()) == sorted(json_subs.get_all_tickers())
+        migrated = {tick["ticker"]: tick for tick in tick_store.get_all_tickers()}
+        for tick in sample_tickers:
+            assert migrated[tick["ticker"]]["last_filing"] == tick["last_filing"]
+
+        # Assert that the CIKs carried over from the JSON file were not looked up again
+        looked_up = {call.args[0] for call in mock_get_cik.call_args_list}
+        assert looked_up.isdisjoint(tick["ticker"] for tick in sample_tickers)
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.ticker_store.get_cik', side_effect=fake_get_cik)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_migrate_json_replays_journals(self, mock_store_cik, mock_json_cik, mock_model_cik, db, temp_dir):
+        """Test that changes still only in the JSON stores' journals are imported"""
+        sub_path = os.path.join(temp_dir, "subscribers.json")
+        tick_path = os.path.join(temp_dir, "tickers.json")
+        json_tickers = TickerStore(file_path=tick_path, journal_max_bytes=1024 * 1024)
+        json_subs = SubStore(file_path=sub_path, ticker_store=json_tickers, journal_max_bytes=1024 * 1024)
+        json_subs.add_subscriber("John", "john@example.com", ["AAPL", "MSFT"])
+
+        # The change is only in the journals, the JSON files are still empty
+        with open(sub_path, 'r') as f:
+            assert json.load(f) == []
+        assert os.path.getsize(tick_path + ".log") > 0
+
+        with patch('app.storage.sqlite_store.JOURNAL_MAX_BYTES', 1024 * 1024):
+            migrate_json(sub_path, tick_path, db)
+
+        # Assert that the journaled subscriber and tickers were migrated
+        tick_store = SQLiteTickerStore(db)
+        assert SQLiteSubStore(db, ticker_store=tick_store).get_all_subscribers() == [
+            {"name": "John", "email": "john@example.com", "tickers": ["AAPL", "MSFT"]}]
+        assert {tick["ticker"]: tick["cik"] for tick in tick_store.get_all_tickers()} == {
+            "AAPL": "0000320193", "MSFT": "0000789019"}
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_ticker_delta_sent_to_ticker_store(self, mock_store_cik, mock_model_cik, db, mock_ticker_store):
+        """Test that subscriber changes only send tickers gaining their first or losing their last subscriber"""
+        sub_store = SQLiteSubStore(db, ticker_store=mock_ticker_store)
+
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL", "MSFT"])
+        sub_store.add_subscriber("Jane", "jane@example.com", ["AAPL", "GOOGL"])
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL", "AMZN"])
+        sub_store.remove_subscriber("jane@example.com")
+
+        # Assert that each change sent only its delta
+        assert [call.kwargs for call in mock_ticker_store.update_tickers.call_args_list] == [
+            {"added": ["AAPL", "MSFT"], "removed": []},
+            {"added": ["GOOGL"], "removed": []},
+            {"added": ["AMZN"], "removed": ["MSFT"]},
+            {"removed": ["GOOGL"]},
+        ]
+        mock_ticker_store.refresh_tickers.assert_not_called()
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_bulk_upsert(self, mock_store_cik, mock_model_cik, db, mock_ticker_store):
+        """Test that a bulk upsert commits every valid row in one transaction and one ticker delta"""
+        sub_store = SQLiteSubStore(db, ticker_store=mock_ticker_store)
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL", "MSFT"])
+        mock_ticker_store.update_tickers.reset_mock()
+
+        report = sub_store.bulk_upsert(iter([
+            {"name": "John", "email": "JOHN@example.com", "tickers": "AAPL GOOGL"},
+            {"name": "Jane", "email": "jane@example.com", "tickers": ["AMZN"]},
+            {"name": "Bob", "email": "bob@example.com", "tickers": "FAKE"},
+        ]))
+
+        # Assert that the valid rows were stored and the invalid one reported
+        assert (report["added"], report["updated"], report["unchanged"]) == (1, 1, 0)
+        assert report["errors"] == [{"row": 3, "email": "bob@example.com", "error": "Invalid ticker: FAKE"}]
+        assert [(sub["email"], sub["tickers"]) for sub in sub_store.get_all_subscribers()] == [
+            ("john@example.com", ["AAPL", "GOOGL"]), ("jane@example.com", ["AMZN"])]
+
+        # Assert that the ticker store got one delta for the whole batch
+        mock_ticker_store.update_tickers.assert_called_once_with(added=["AMZN", "GOOGL"], removed=["MSFT"])
+
+    @patch('app.models.subscriber.is_known_ticker', side_effect=fake_is_known_ticker)
+    @patch('app.storage.sqlite_store.get_cik', side_effect=fake_get_cik)
+    def test_reconcile_tickers(self, mock_store_cik, mock_model_cik, db, stores):
+        """Test that the per-cycle reconcile restores a ticker_state row that was lost"""
+        tick_store, sub_store = stores
+        sub_store.add_subscriber("John", "john@example.com", ["AAPL", "MSFT"])
+        tick_store.update_tickers(removed=["MSFT"])
+
+        sub_store.reconcile_tickers()
+
+        assert sorted(tick["ticker"] for tick in tick_store.get_all_tickers()) == ["AAPL", "MSFT"]
+
@@ -0,0 +1,96 @@
+import pytest
+import os
+import sys
+import json
+import subprocess
+from unittest.mock import patch
+
+from app import config
+from app import startup
+
+#cold import of main.py (and with it every app module) must stay within this many seconds
+IMPORT_TIME_BUDGET = 0.35
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#run in a fresh interpreter: counts and fails any network access, times the import and lists what got loaded.
+#the count is what's asserted on, code under test may catch the error itself
+IMPORT_PROBE = """
+import json, socket, sys, time
+connections = []
+def no_network(*args, **kwargs):
+    connections.append(repr(args))
+    raise OSError("network access during import")
+socket.socket.connect = no_network
+socket.create_connection = no_network
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules), "connections": connections}}))
+"""
+
+def probe_import(module):
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+                            cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+
+class TestImportSideEffects:
+    @pytest.mark.parametrize("module", ["main", "manage", "scheduler"])
+    def test_import_is_side_effect_free(self, module):
+        """Test that importing an entry point reads no .env, loads no pandas and opens no connection"""
+        probe = probe_import(module)
+
+        # Assert that heavy or stateful dependencies were left for init() and first use
+        assert "pandas" not in probe["modules"]
+        assert "dotenv" not in probe["modules"]
+        assert probe["connections"] == []
+
+    def test_import_time_budget(self):
+        """Test that a cold import of main.py stays within the startup budget"""
+        #best of three, so a busy machine doesn't fail the budget
+        elapsed = min(probe_import("main")["elapsed"] for _ in range(3))
+
+        assert elapsed < IMPORT_TIME_BUDGET, f"importing main took {elapsed:.3f}s"
+
+    def test_email_service_import_sends_nothing(self):
+        """Test that the email service module no longer logs in or sends on import"""
+        probe = probe_import("app.services.email_service")
+
+        # Assert that no SMTP connection was even attempted, a failed one would be caught and logged
+        assert "app.services.email_service" in probe["modules"]
+        assert probe["connections"] == []
+
+
+class TestInit:
+    @patch('dotenv.load_dotenv')
+    def test_init_loads_env(self, mock_load_dotenv, monkeypatch, fresh_sec_client):
+        """Test that init() reads the .env file and passes the new User-Agent to the SEC client"""
+        monkeypatch.setattr(config, "HEADERS", {'User-Agent': None})
+        monkeypatch.setattr(config, "EMAIL_ADDRESS", None)
+        monkeypatch.setattr(config, "PASSWORD", None)
+        monkeypatch.setenv("EMAIL_ADDRESS", "watcher@example.com")
+        monkeypatch.setenv("PASSWORD", "secret")
+
+        startup.init("custom.env")
+
+        # Assert that the .env file was loaded and the settings re-read
+        mock_load_dotenv.assert_called_once_with("custom.env")
+        assert config.EMAIL_ADDRESS == "watcher@example.com"
+        assert config.PASSWORD == "secret"
+        assert config.HEADERS['User-Agent'] == "watcher@example.com"
+
+        # Assert that the SEC client sends it
+        assert fresh_sec_client.session.headers['User-Agent'] == "watcher@example.com"
+
+    @patch('app.services.email_service.smtplib.SMTP')
+    def test_email_service_uses_loaded_credentials(self, mock_smtp, monkeypatch):
+        """Test that an EmailService built after init() logs in with the loaded credentials"""
+        from app.services.email_service import EmailService
+        monkeypatch.setattr(config, "EMAIL_ADDRESS", "watcher@example.com")
+        monkeypatch.setattr(config, "PASSWORD", "secret")
+
+        EmailService().connect()
+
+        mock_smtp.return_value.login.assert_called_once_with("watcher@example.com", "secret")
@@ -1,6 +1,8 @@
 import pytest
 import os
 import json
+import csv
+import io
 from unittest.mock import patch, MagicMock, mock_open
 
 from app.storage.sub_store import SubStore
@@ -122,8 +124,8 @@ class TestSubStore:
             assert subscribers == sample_subscribers
     
     @patch('app.storage.sub_store.open', new_callable=mock_open)
-    @patch('app.storage.sub_store.json.dump')
-    def test_save_subscribers(self, mock_json_dump, mock_file_open, mock_file_path, mock_ticker_store, sample_subscribers):
+    @patch('app.storage.sub_store.write_json_atomic')
+    def test_save_subscribers(self, mock_write_json, mock_file_open, mock_file_path, mock_ticker_store, sample_subscribers):
         """Test saving subscribers to the file"""
         # Create a SubStore
         with patch('app.storage.sub_store.os.path.exists', return_value=True):
@@ -132,19 +134,16 @@ class TestSubStore:
             # Call save_subscribers
             sub_store.save_subscribers(sample_subscribers)
             
-            # Assert that the file was opened for writing
-            mock_file_open.assert_called_with(mock_file_path, 'w')
-            
-            # Assert that the subscribers were written to the file
-            mock_json_dump.assert_called_with(sample_subscribers, mock_file_open(), indent=2)
+            # Assert that the subscribers were written to the file atomically
+            mock_write_json.assert_called_once_with(mock_file_path, sample_subscribers)
             
-            # Assert that refresh_tickers was called on the ticker_store
-            mock_ticker_store.refresh_tickers.assert_called_once_with(sub_store.get_all_tickers())
+            # Assert that the ticker store was synced with every subscribed ticker
+            mock_ticker_store.refresh_tickers.assert_called_once_with(["AAPL", "MSFT", "GOOGL", "AMZN"])
     
     @patch('app.storage.sub_store.Subscriber')
     @patch('app.storage.sub_store.SubStore.get_all_subscribers')
-    @patch('app.storage.sub_store.SubStore.save_subscribers')
-    def test_add_subscriber_new(self, mock_save_subscribers, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
+    @patch('app.storage.sub_store.SubStore._write_snapshot')
+    def test_add_subscriber_new(self, mock_write_snapshot, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
         """Test adding a new subscriber"""
         # Mock get_all_subscribers to return an empty list
         mock_get_all_subscribers.return_value = []
@@ -178,16 +177,19 @@ class TestSubStore:
                 tickers=["AAPL", "MSFT"]
             )
             
-            # Assert that save_subscribers was called with the new subscriber
-            mock_save_subscribers.assert_called_once_with([mock_subscriber_instance.to_dict()])
+            # Assert that a snapshot holding the new subscriber was written
+            mock_write_snapshot.assert_called_once_with([mock_subscriber_instance.to_dict()])
+            
+            # Assert that the ticker store was synced with the subscribed tickers
+            mock_ticker_store.refresh_tickers.assert_called_once_with(["AAPL", "MSFT"])
             
             # Assert that the method returned True
             assert result is True
     
     @patch('app.storage.sub_store.Subscriber')
     @patch('app.storage.sub_store.SubStore.get_all_subscribers')
-    @patch('app.storage.sub_store.SubStore.save_subscribers')
-    def test_add_subscriber_existing_same_tickers(self, mock_save_subscribers, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
+    @patch('app.storage.sub_store.SubStore._write_snapshot')
+    def test_add_subscriber_existing_same_tickers(self, mock_write_snapshot, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
         """Test adding a subscriber that already exists with the same tickers"""
         # Mock get_all_subscribers to return a list with the subscriber
         mock_get_all_subscribers.return_value = [{
@@ -201,26 +203,28 @@ class TestSubStore:
         mock_subscriber_instance.email = "john@example.com"
         mock_subscriber_instance.tickers = ["AAPL", "MSFT"]
         mock_subscriber.return_value = mock_subscriber_instance
+        # Stored records are still loaded as real subscribers
+        mock_subscriber.from_dict.side_effect = Subscriber.from_dict
         
         # Create a SubStore
         with patch('app.storage.sub_store.os.path.exists', return_value=True):
             sub_store = SubStore(file_path=mock_file_path, ticker_store=mock_ticker_store)
             
             # Call add_subscriber
-            with pytest.raises(ValueError, match="Subscriber already exists"):
-                sub_store.add_subscriber(
-                    name="John",
-                    email="john@example.com",
-                    tickers=["AAPL", "MSFT"]
-                )
-            
-            # Assert that save_subscribers was not called
-            mock_save_subscribers.assert_not_called()
+            result = sub_store.add_subscriber(
+                name="John",
+                email="john@example.com",
+                tickers=["AAPL", "MSFT"]
+            )
+            
+            # Assert that the duplicate was rejected without writing a snapshot
+            assert result is False
+            mock_write_snapshot.assert_not_called()
     
     @patch('app.storage.sub_store.Subscriber')
     @patch('app.storage.sub_store.SubStore.get_all_subscribers')
-    @patch('app.storage.sub_store.SubStore.save_subscribers')
-    def test_add_subscriber_existing_different_tickers(self, mock_save_subscribers, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
+    @patch('app.storage.sub_store.SubStore._write_snapshot')
+    def test_add_subscriber_existing_different_tickers(self, mock_write_snapshot, mock_get_all_subscribers, mock_subscriber, mock_file_path, mock_ticker_store):
         """Test adding a subscriber that already exists but with different tickers"""
         # Mock get_all_subscribers to return a list with the subscriber
         mock_get_all_subscribers.return_value = [{
@@ -234,6 +238,8 @@ class TestSubStore:
         mock_subscriber_instance.email = "john@example.com"
         mock_subscriber_instance.tickers = ["GOOGL", "AMZN"]
         mock_subscriber.return_value = mock_subscriber_instance
+        # Stored records are still loaded as real subscribers
+        mock_subscriber.from_dict.side_effect = Subscriber.from_dict
         
         # Create a SubStore
         with patch('app.storage.sub_store.os.path.exists', return_value=True):
@@ -246,8 +252,8 @@ class TestSubStore:
                 tickers=["GOOGL", "AMZN"]
             )
             
-            # Assert that save_subscribers was called with the updated subscriber
-            mock_save_subscribers.assert_called_once_with([{
+            # Assert that a snapshot holding the updated subscriber was written
+            mock_write_snapshot.assert_called_once_with([{
                 "name": "John",
                 "email": "john@example.com",
                 "tickers": ["GOOGL", "AMZN"]
@@ -257,8 +263,8 @@ class TestSubStore:
             assert result is True
     
     @patch('app.storage.sub_store.SubStore.get_all_subscribers')
-    @patch('app.storage.sub_store.SubStore.save_subscribers')
-    def test_remove_subscriber_existing(self, mock_save_subscribers, mock_get_all_subscribers, mock_file_path, mock_ticker_store, sample_subscribers):
+    @patch('app.storage.sub_store.SubStore._write_snapshot')
+    def test_remove_subscriber_existing(self, mock_write_snapshot, mock_get_all_subscribers, mock_file_path, mock_ticker_store, sample_subscribers):
         """Test removing an existing subscriber"""
         # Mock get_all_subscribers to return sample subscribers
         mock_get_all_subscribers.return_value = sample_subscribers
@@ -270,15 +276,18 @@ class TestSubStore:
             # Call remove_subscriber
             result = sub_store.remove_subscriber("john@example.com")
             
-            # Assert that save_subscribers was called with the remaining subscriber
-            mock_save_subscribers.assert_called_once_with([sample_subscribers[1]])
+            # Assert that a snapshot holding only the remaining subscriber was written
+            mock_write_snapshot.assert_called_once_with([sample_subscribers[1]])
+            
+            # Assert that the ticker store was synced with the remaining tickers
+            mock_ticker_store.refresh_tickers.assert_called_once_with(["GOOGL", "AMZN"])
             
             # Assert that the method returned True
             assert result is True
     
     @patch('app.storage.sub_store.SubStore.get_all_subscribers')
-    @patch('app.storage.sub_store.SubStore.save_subscribers')
-    def test_remove_subscriber_non_existing(self, mock_save_subscribers, mock_get_all_subscribers, mock_file_path, mock_ticker_store, sample_subscribers):
+    @patch('app.storage.sub_store.SubStore._write_snapshot')
+    def test_remove_subscriber_non_existing(self, mock_write_snapshot, mock_get_all_subscribers, mock_file_path, mock_ticker_store, sample_subscribers):
         """Test removing a non-existing subscriber"""
         # Mock get_all_subscribers to return sample subscribers
         mock_get_all_subscribers.return_value = sample_subscribers
@@ -290,8 +299,8 @@ class TestSubStore:
             # Call remove_subscriber
             result = sub_store.remove_subscriber("nonexistent@example.com")
             
-            # Assert that save_subscribers was not called
-            mock_save_subscribers.assert_not_called()
+            # Assert that no snapshot was written
+            mock_write_snapshot.assert_not_called()
             
             # Assert that the method returned False
             assert result is False
@@ -332,4 +341,312 @@ class TestSubStore:
             # Test case insensitivity
             subscribers = sub_store.get_subscribers_by_ticker("aapl")
             assert len(subscribers) == 1
-            assert subscribers[0]["email"] == "john@example.com"
\ No newline at end of file
+            assert subscribers[0]["email"] == "john@example.com"
+    
+    def test_ticker_index_built_once(self, sub_store_with_data):
+        """Test that lookups share one load of the subscriber file"""
+        with patch.object(sub_store_with_data, 'get_all_subscribers', wraps=sub_store_with_data.get_all_subscribers) as mock_load:
+            assert [sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("AAPL")] == ["john@example.com"]
+            assert [sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("amzn")] == ["jane@example.com"]
+            assert sub_store_with_data.get_subscribers_by_ticker("TSLA") == []
+            
+            # Assert that the file was only read once
+            assert mock_load.call_count == 1
+    
+    def test_ticker_index_rebuilt_when_file_changes(self, sub_store_with_data, temp_subscriber_file):
+        """Test that a change made to the file by someone else is picked up"""
+        assert len(sub_store_with_data.get_subscribers_by_ticker("TSLA")) == 0
+        
+        # Another process rewrites the file
+        with open(temp_subscriber_file, 'w') as f:
+            json.dump([{"name": "Ann", "email": "ann@example.com", "tickers": ["TSLA"]}], f)
+        stat = os.stat(temp_subscriber_file)
+        os.utime(temp_subscriber_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        
+        # Assert that the index reflects the new file
+        assert [sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("TSLA")] == ["ann@example.com"]
+        assert sub_store_with_data.get_subscribers_by_ticker("AAPL") == []
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_ticker_index_updated_in_place(self, mock_is_known, mock_ticker_cik, sub_store_with_data):
+        """Test that our own adds and removes update the index without reloading the file"""
+        sub_store_with_data.get_subscribers_by_ticker("AAPL")
+        
+        with patch.object(SubStore, '_index', wraps=sub_store_with_data._index) as mock_index:
+            # Add a new subscriber and change an existing one
+            assert sub_store_with_data.add_subscriber(name="Ann", email="ann@example.com", tickers=["AAPL", "TSLA"])
+            assert sub_store_with_data.add_subscriber(name="John", email="john@example.com", tickers=["TSLA"])
+            
+            # Assert that only the two changed subscribers were indexed
+            assert mock_index.call_count == 2
+        
+        assert [sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("AAPL")] == ["ann@example.com"]
+        assert sorted(sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("TSLA")) == ["ann@example.com", "john@example.com"]
+        
+        # Remove a subscriber
+        assert sub_store_with_data.remove_subscriber("ann@example.com")
+        assert sub_store_with_data.get_subscribers_by_ticker("AAPL") == []
+        assert [sub["email"] for sub in sub_store_with_data.get_subscribers_by_ticker("TSLA")] == ["john@example.com"]
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_subscribers_keyed_by_normalized_email(self, mock_is_known, mock_ticker_cik, sub_store_with_data):
+        """Test that emails differing only in case or spaces update the same subscriber"""
+        # Update John using a differently written email
+        assert sub_store_with_data.add_subscriber(name="John", email="John@Example.com", tickers=["TSLA"])
+        
+        # Assert that John was updated in place rather than added again
+        subscribers = sub_store_with_data.get_all_subscribers()
+        assert [sub["email"] for sub in subscribers] == ["john@example.com", "jane@example.com"]
+        assert subscribers[0]["tickers"] == ["TSLA"]
+        
+        # Assert that removal is also case insensitive
+        assert sub_store_with_data.remove_subscriber("JANE@example.com")
+        assert [sub["email"] for sub in sub_store_with_data.get_all_subscribers()] == ["john@example.com"]
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_subscriber_order_stable(self, mock_is_known, mock_ticker_cik, sub_store_with_data):
+        """Test that the file keeps its order across adds, updates and removes"""
+        sub_store_with_data.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+        sub_store_with_data.add_subscriber(name="Jane", email="jane@example.com", tickers=["NVDA"])
+        sub_store_with_data.remove_subscriber("john@example.com")
+        sub_store_with_data.add_subscriber(name="John", email="john@example.com", tickers=["AAPL"])
+        
+        # Assert that updated subscribers kept their place and new ones went to the end
+        assert [sub["email"] for sub in sub_store_with_data.get_all_subscribers()] == [
+            "jane@example.com", "ann@example.com", "john@example.com"
+        ]
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_write_delay_coalesces_burst(self, mock_is_known, mock_ticker_cik, temp_subscriber_file, ticker_store_with_data):
+        """Test that a burst of signups within the write delay is written and synced once"""
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store_with_data, write_delay=60)
+        
+        with patch.object(SubStore, '_write_snapshot', wraps=sub_store._write_snapshot) as mock_save:
+            for name in ["Ann", "Bob", "Cal"]:
+                assert sub_store.add_subscriber(name=name, email=f"{name.lower()}@example.com", tickers=["TSLA"])
+            
+            # Assert that nothing was written yet but reads see the new subscribers
+            mock_save.assert_not_called()
+            with open(temp_subscriber_file, 'r') as f:
+                assert json.load(f) == []
+            assert len(sub_store.get_subscribers_by_ticker("TSLA")) == 3
+            assert len(sub_store.get_all_subscribers()) == 3
+            
+            # Assert that flush writes the whole burst in one go and cancels the timer
+            sub_store.flush()
+            mock_save.assert_called_once()
+            assert sub_store._flush_timer is None
+            sub_store.flush()
+            mock_save.assert_called_once()
+        
+        with open(temp_subscriber_file, 'r') as f:
+            assert [sub["email"] for sub in json.load(f)] == ["ann@example.com", "bob@example.com", "cal@example.com"]
+        assert [tick["ticker"] for tick in ticker_store_with_data.get_all_tickers()] == ["TSLA"]
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_write_delay_flushes_in_background(self, mock_is_known, mock_ticker_cik, temp_subscriber_file, ticker_store_with_data):
+        """Test that buffered changes are written once the write delay has passed"""
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store_with_data, write_delay=0.01)
+        sub_store.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+        
+        sub_store._flush_timer.join(timeout=5)
+        
+        # Assert that the timer wrote the subscriber out
+        with open(temp_subscriber_file, 'r') as f:
+            assert [sub["email"] for sub in json.load(f)] == ["ann@example.com"]
+        assert sub_store._dirty is False
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_journal_replayed_over_snapshot(self, mock_is_known, mock_ticker_cik, temp_subscriber_file, temp_ticker_file, sample_subscribers):
+        """Test that changes are appended to the journal and replayed by a new store"""
+        with open(temp_subscriber_file, 'w') as f:
+            json.dump(sample_subscribers, f)
+        ticker_store = TickerStore(file_path=temp_ticker_file, journal_max_bytes=1024 * 1024)
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store, journal_max_bytes=1024 * 1024)
+        
+        with patch('app.storage.sub_store.write_json_atomic') as mock_write_json:
+            assert sub_store.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+            assert sub_store.add_subscriber(name="John", email="john@example.com", tickers=["NVDA"])
+            assert sub_store.remove_subscriber("jane@example.com")
+            
+            # Assert that the snapshot was never rewritten
+            mock_write_json.assert_not_called()
+        with open(sub_store.journal.file_path, 'r') as f:
+            assert len(f.readlines()) == 3
+        
+        # Assert that a new store sees the snapshot with the journal applied, in order
+        reopened = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store, journal_max_bytes=1024 * 1024)
+        assert reopened.get_all_subscribers() == [
+            {"name": "John", "email": "john@example.com", "tickers": ["NVDA"]},
+            {"name": "Ann", "email": "ann@example.com", "tickers": ["TSLA"]},
+        ]
+        assert sorted(tick["ticker"] for tick in ticker_store.get_all_tickers()) == ["NVDA", "TSLA"]
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_journal_compacted_past_threshold(self, mock_is_known, mock_ticker_cik, temp_subscriber_file, ticker_store_with_data):
+        """Test that the snapshot is rewritten and the journal cleared once it grows too large"""
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store_with_data, journal_max_bytes=200)
+        sub_store.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+        assert sub_store.journal.size() > 0
+        
+        sub_store.add_subscriber(name="Bob", email="bob@example.com", tickers=["TSLA"])
+        sub_store.add_subscriber(name="Cal", email="cal@example.com", tickers=["TSLA"])
+        
+        # Assert that the third entry pushed the journal past 200 bytes and it was folded into the snapshot
+        assert sub_store.journal.size() == 0
+        with open(temp_subscriber_file, 'r') as f:
+            assert [sub["email"] for sub in json.load(f)] == ["ann@example.com", "bob@example.com", "cal@example.com"]
+    
+    @pytest.mark.parametrize("journal_max_bytes", [None, 200])
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_write_delay_keeps_other_process_changes(self, mock_is_known, journal_max_bytes, temp_subscriber_file, mock_ticker_store):
+        """Test that a store holding changes for the write delay doesn't drop what another store wrote meanwhile"""
+        store_a = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store, write_delay=60,
+                           journal_max_bytes=journal_max_bytes)
+        store_b = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store,
+                           journal_max_bytes=journal_max_bytes)
+        store_a.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+        
+        # Another process signs Bob up while Ann is still held, then Cal pushes the journal past its threshold
+        store_b.add_subscriber(name="Bob", email="bob@example.com", tickers=["MSFT"])
+        store_a.add_subscriber(name="Cal", email="cal@example.com", tickers=["TSLA"])
+        store_a.flush()
+        
+        # Assert that the snapshot written by the first store still has Bob
+        reopened = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store,
+                            journal_max_bytes=journal_max_bytes)
+        assert sorted(sub["email"] for sub in reopened.get_all_subscribers()) == [
+            "ann@example.com", "bob@example.com", "cal@example.com"]
+        # Assert that the first store picked Bob up too and sent the ticker store the whole set
+        assert sorted(store_a.get_all_tickers()) == ["MSFT", "TSLA"]
+        assert sorted(mock_ticker_store.refresh_tickers.call_args.args[0]) == ["MSFT", "TSLA"]
+    
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_ticker_delta_sent_to_ticker_store(self, mock_is_known, temp_subscriber_file, sample_subscribers, mock_ticker_store):
+        """Test that after the first sync only tickers gaining their first or losing their last subscriber are sent"""
+        with open(temp_subscriber_file, 'w') as f:
+            json.dump(sample_subscribers, f)
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store)
+        
+        # The first write sends the whole ticker set once
+        sub_store.add_subscriber(name="Ann", email="ann@example.com", tickers=["AAPL"])
+        mock_ticker_store.refresh_tickers.assert_called_once_with(["AAPL", "MSFT", "GOOGL", "AMZN"])
+        
+        # Assert that a subscriber sharing every ticker sends nothing
+        with patch.object(SubStore, 'get_all_subscribers') as mock_get_all_subscribers:
+            sub_store.add_subscriber(name="Bob", email="bob@example.com", tickers=["AAPL", "MSFT"])
+            mock_ticker_store.update_tickers.assert_not_called()
+            
+            # Assert that John leaving drops only MSFT once Bob moves to TSLA
+            sub_store.remove_subscriber("john@example.com")
+            mock_ticker_store.update_tickers.assert_not_called()
+            sub_store.add_subscriber(name="Bob", email="bob@example.com", tickers=["TSLA"])
+            mock_ticker_store.update_tickers.assert_called_once_with(added=["TSLA"], removed=["MSFT"])
+            
+            # Assert that the file was never read back after our own writes
+            mock_get_all_subscribers.assert_not_called()
+        mock_ticker_store.refresh_tickers.assert_called_once()
+        assert sorted(sub_store.get_all_tickers()) == ["AAPL", "AMZN", "GOOGL", "TSLA"]
+    
+    @patch('app.models.subscriber.is_known_ticker', side_effect=lambda ticker: ticker.upper() != "FAKE")
+    def test_bulk_upsert_one_write(self, mock_is_known, temp_subscriber_file, sample_subscribers, mock_ticker_store):
+        """Test that a bulk upsert streams a CSV and commits it with one write and one ticker sync"""
+        with open(temp_subscriber_file, 'w') as f:
+            json.dump(sample_subscribers, f)
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store,
+                             write_delay=60, journal_max_bytes=1024 * 1024)
+        rows = csv.DictReader(io.StringIO(
+            "name,email,tickers\n"
+            "Ann,ann@example.com,\"TSLA, NVDA\"\n"
+            "John,John@Example.com,AAPL MSFT\n"
+            "Jane,jane@example.com,GOOGL\n"
+            "Bad,bad@example.com,FAKE\n"
+            "Bob,not-an-email,AAPL\n"
+            "Ann,ANN@example.com,TSLA\n"
+        ))
+        
+        with patch('app.storage.sub_store.write_json_atomic') as mock_write:
+            report = sub_store.bulk_upsert(rows)
+        
+        # Assert that every row was counted or reported once
+        assert (report["added"], report["updated"], report["unchanged"], report["duplicates"]) == (1, 1, 1, 1)
+        assert [(error["row"], error["error"]) for error in report["errors"]] == [
+            (4, "Invalid ticker: FAKE"), (5, "Invalid email format")]
+        
+        # Assert that the batch was written once, without journaling each row or waiting for the write delay
+        mock_write.assert_called_once()
+        assert [sub["email"] for sub in mock_write.call_args.args[1]] == [
+            "john@example.com", "jane@example.com", "ANN@example.com"]
+        assert sub_store.journal.entries() == []
+        mock_ticker_store.refresh_tickers.assert_called_once()
+        assert sorted(mock_ticker_store.refresh_tickers.call_args.args[0]) == ["AAPL", "GOOGL", "MSFT", "TSLA"]
+        mock_ticker_store.update_tickers.assert_not_called()
+        
+        # Assert that the last row of a duplicated email won
+        assert sub_store.get_subscribers_by_ticker("TSLA")[0]["tickers"] == ["TSLA"]
+        assert sub_store.get_subscribers_by_ticker("AMZN") == []
+    
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_bulk_upsert_nothing_changed(self, mock_is_known, temp_subscriber_file, sample_subscribers, mock_ticker_store):
+        """Test that a bulk upsert of rows already stored writes nothing"""
+        with open(temp_subscriber_file, 'w') as f:
+            json.dump(sample_subscribers, f)
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store)
+        
+        with patch('app.storage.sub_store.write_json_atomic') as mock_write:
+            report = sub_store.bulk_upsert(sample_subscribers)
+        
+        assert report["unchanged"] == 2
+        mock_write.assert_not_called()
+        mock_ticker_store.refresh_tickers.assert_not_called()
+    
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    def test_bulk_upsert_keeps_other_process_changes(self, mock_is_known, temp_subscriber_file, mock_ticker_store):
+        """Test that a bulk upsert next to a signup process keeps the signups it journaled"""
+        store_a = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store, write_delay=60,
+                           journal_max_bytes=1024 * 1024)
+        store_b = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store,
+                           journal_max_bytes=1024 * 1024)
+        store_a.add_subscriber(name="Ann", email="ann@example.com", tickers=["TSLA"])
+        store_b.add_subscriber(name="Bob", email="bob@example.com", tickers=["MSFT"])
+        
+        report = store_a.bulk_upsert([
+            {"name": "Bob", "email": "bob@example.com", "tickers": "MSFT"},
+            {"name": "Cal", "email": "cal@example.com", "tickers": "TSLA"},
+        ])
+        
+        # Assert that Bob counted as already stored and is still there after the snapshot
+        assert (report["added"], report["unchanged"]) == (1, 1)
+        reopened = SubStore(file_path=temp_subscriber_file, ticker_store=mock_ticker_store,
+                            journal_max_bytes=1024 * 1024)
+        assert [sub["email"] for sub in reopened.get_all_subscribers()] == [
+            "ann@example.com", "bob@example.com", "cal@example.com"]
+        assert reopened.journal.entries() == []
+    
+    @patch('app.models.subscriber.is_known_ticker', return_value=True)
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    def test_reconcile_tickers_repairs_lost_delta(self, mock_ticker_cik, mock_is_known, temp_subscriber_file, ticker_store_with_data):
+        """Test that the per-cycle reconcile restores a ticker whose delta never reached the ticker store"""
+        sub_store = SubStore(file_path=temp_subscriber_file, ticker_store=ticker_store_with_data)
+        sub_store.add_subscriber(name="John", email="john@example.com", tickers=["AAPL", "MSFT"])
+        
+        # Lose MSFT from the ticker store behind the subscriber store's back
+        ticker_store_with_data.update_tickers(removed=["MSFT"])
+        # Another MSFT signup sends no delta, MSFT already has a subscriber
+        sub_store.add_subscriber(name="Jane", email="jane@example.com", tickers=["MSFT"])
+        assert "MSFT" not in [tick["ticker"] for tick in ticker_store_with_data.get_all_tickers()]
+        
+        sub_store.reconcile_tickers()
+        
+        # Assert that MSFT is watched again and AAPL kept its baseline
+        tickers = {tick["ticker"]: tick for tick in ticker_store_with_data.get_all_tickers()}
+        assert sorted(tickers) == ["AAPL", "MSFT"]
+        assert tickers["AAPL"]["last_filing"] == "0000320193-23-000001"
+
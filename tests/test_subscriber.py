@@ -1,5 +1,7 @@
 import pytest
 import re
+import json
+import tracemalloc
 from unittest.mock import patch, MagicMock
 
 from app.models.subscriber import Subscriber
@@ -7,11 +9,11 @@ from app.models.subscriber import Subscriber
 class TestSubscriber:
     """Test cases for the Subscriber model"""
 
-    @patch('app.models.subscriber.get_cik')
-    def test_valid_subscriber_creation(self, mock_get_cik):
+    @patch('app.models.subscriber.is_known_ticker')
+    def test_valid_subscriber_creation(self, mock_is_known):
         """Test creating a valid subscriber"""
-        # Mock the get_cik function to return a valid CIK
-        mock_get_cik.return_value = "0000320193"  # Example CIK for Apple
+        # Mock the ticker table to know every ticker
+        mock_is_known.return_value = True
         
         # Create a valid subscriber
         subscriber = Subscriber(
@@ -25,12 +27,12 @@ class TestSubscriber:
         assert subscriber.email == "john@example.com"
         assert subscriber.tickers == ["AAPL", "MSFT"]
         
-        # Assert that get_cik was called twice (once for each ticker)
-        assert mock_get_cik.call_count == 2
+        # Assert that the ticker table was checked twice (once for each ticker)
+        assert mock_is_known.call_count == 2
     
     def test_to_dict(self):
         """Test converting a subscriber to a dictionary"""
-        with patch('app.models.subscriber.get_cik', return_value="0000320193"):
+        with patch('app.models.subscriber.is_known_ticker', return_value=True):
             subscriber = Subscriber(
                 name="John",
                 email="john@example.com",
@@ -47,7 +49,7 @@ class TestSubscriber:
     
     def test_from_dict(self):
         """Test creating a subscriber from a dictionary"""
-        with patch('app.models.subscriber.get_cik', return_value="0000320193"):
+        with patch('app.models.subscriber.is_known_ticker', return_value=True):
             subscriber_dict = {
                 'name': 'John',
                 'email': 'john@example.com',
@@ -86,26 +88,104 @@ class TestSubscriber:
             # Should not raise an exception
             Subscriber.validate_email(email)
     
-    @patch('app.models.subscriber.get_cik')
-    def test_ticker_validation_empty(self, mock_get_cik):
+    @patch('app.models.subscriber.is_known_ticker')
+    def test_ticker_validation_empty(self, mock_is_known):
         """Test validation for empty tickers list"""
         with pytest.raises(ValueError, match="Tickers cannot be empty"):
             Subscriber.validate_tickers([])
     
-    @patch('app.models.subscriber.get_cik')
-    def test_ticker_validation_invalid(self, mock_get_cik):
+    @patch('app.models.subscriber.is_known_ticker')
+    def test_ticker_validation_invalid(self, mock_is_known):
         """Test validation for invalid tickers"""
-        # Mock get_cik to return empty string for invalid ticker
-        mock_get_cik.return_value = ""
+        # Mock the ticker table to not know the ticker
+        mock_is_known.return_value = False
         
         with pytest.raises(ValueError, match="Invalid ticker"):
             Subscriber.validate_tickers(["INVALID"])
     
-    @patch('app.models.subscriber.get_cik')
-    def test_ticker_validation_valid(self, mock_get_cik):
+    @patch('app.models.subscriber.is_known_ticker')
+    def test_ticker_validation_valid(self, mock_is_known):
         """Test validation for valid tickers"""
-        # Mock get_cik to return a valid CIK
-        mock_get_cik.return_value = "0000320193"
+        # Mock the ticker table to know every ticker
+        mock_is_known.return_value = True
         
         # Should not raise an exception
-        Subscriber.validate_tickers(["AAPL", "MSFT"])
\ No newline at end of file
+        Subscriber.validate_tickers(["AAPL", "MSFT"])
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_ticker_validation_uses_one_table_download(self, mock_get):
+        """Test that validating many tickers downloads the ticker table once"""
+        mock_get.return_value.json.return_value = {
+            "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+            "1": {"cik_str": 789019, "ticker": "MSFT", "title": "Microsoft Corp"}
+        }
+        
+        Subscriber(name="John", email="john@example.com", tickers=["AAPL", "msft", "AAPL"] * 5)
+        
+        # Assert that every ticker was checked against one download
+        assert mock_get.call_count == 1
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_ticker_validation_lists_every_invalid_ticker(self, mock_get):
+        """Test that one validation error names all unknown tickers"""
+        mock_get.return_value.json.return_value = {
+            "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}
+        }
+        
+        with pytest.raises(ValueError, match="Invalid ticker: FAKE, NOPE"):
+            Subscriber.validate_tickers(["FAKE", "AAPL", "NOPE", "FAKE"])
+    
+    @patch('app.services.sec_service.sec_client.session.get')
+    def test_from_dict_trusted_skips_validation(self, mock_get):
+        """Test that loading stored subscribers does no network I/O"""
+        records = [{'name': 'John', 'email': f'john{i}@example.com', 'tickers': ['AAPL', 'MSFT']} for i in range(1000)]
+        
+        subscribers = [Subscriber.from_dict(record) for record in records]
+        
+        # Assert that the records were loaded without touching the ticker table
+        assert len(subscribers) == 1000
+        assert subscribers[-1].tickers == ['AAPL', 'MSFT']
+        mock_get.assert_not_called()
+    
+    @patch('app.models.subscriber.is_known_ticker', return_value=False)
+    def test_from_dict_validate(self, mock_is_known):
+        """Test that from_dict still validates untrusted input when asked"""
+        with pytest.raises(ValueError, match="Invalid ticker"):
+            Subscriber.from_dict({'name': 'John', 'email': 'john@example.com', 'tickers': ['FAKE']}, validate=True)
+    
+    def test_slotted_with_interned_tickers(self):
+        """Test that subscribers have no per-instance dict and share their ticker strings"""
+        # JSON parsing gives every record its own copy of each ticker string
+        records = json.loads(json.dumps([
+            {'name': 'John', 'email': 'john@example.com', 'tickers': ['aapl', 'MSFT']},
+            {'name': 'Jane', 'email': 'jane@example.com', 'tickers': ['AAPL']}
+        ]))
+        
+        john, jane = (Subscriber.from_dict(record) for record in records)
+        
+        assert not hasattr(john, '__dict__')
+        assert john.tickers[0] is jane.tickers[0]
+        # Assert that to_dict hands out a copy, not the shared list
+        assert john.to_dict()['tickers'] is not john.tickers
+    
+    def test_memory_benchmark(self):
+        """Test that loaded subscribers take well under half the memory of the parsed JSON records"""
+        tickers = [f"TICK{i}" for i in range(50)]
+        data = json.dumps([
+            {'name': 'John', 'email': f'john{i}@example.com', 'tickers': tickers[i % 45:i % 45 + 5]}
+            for i in range(20000)
+        ])
+        
+        def traced(load):
+            tracemalloc.start()
+            try:
+                records = load()
+                return tracemalloc.get_traced_memory()[0], records
+            finally:
+                tracemalloc.stop()
+        
+        dict_bytes, _ = traced(lambda: json.loads(data))
+        subscriber_bytes, _ = traced(lambda: [Subscriber.from_dict(record) for record in json.loads(data)])
+        
+        # Assert that slots and interned tickers cut resident memory by more than half
+        assert subscriber_bytes < dict_bytes * 0.5, f"{subscriber_bytes} bytes as Subscribers vs {dict_bytes} as dicts"
@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.templates import render_filing, render_page
+
+FILING = {
+    "accessionNumber": "0000320193-23-000064",
+    "filingDate": "2023-05-05",
+    "reportDate": "2023-04-01",
+    "form": "10-Q",
+    "primaryDocument": "aapl-20230401.htm",
+    "primaryDocDescription": "10-Q",
+    "items": "",
+}
+
+
+class TestTemplates:
+    """Test cases for the filing notification templates"""
+
+    def test_render_filing_text(self):
+        """Test the plain text block of a filing"""
+        text, _ = render_filing("AAPL", FILING)
+
+        # Assert that the metadata the SEC sent is listed and empty fields are left out
+        assert text.splitlines()[:5] == [
+            "New AAPL filing",
+            "Form: 10-Q",
+            "Description: 10-Q",
+            "Filed: 2023-05-05",
+            "Period: 2023-04-01",
+        ]
+        assert "Items" not in text
+        assert "Accession number: 0000320193-23-000064" in text
+        assert "CIK=AAPL&type=10-Q" in text
+
+    def test_render_filing_html_escaped(self):
+        """Test that filing values are escaped in the HTML block"""
+        _, html = render_filing("AAPL", dict(FILING, primaryDocDescription="<b>Q&A</b>"))
+
+        # Assert that the markup of the value is escaped but the template's isn't
+        assert "&lt;b&gt;Q&amp;A&lt;/b&gt;" in html
+        assert "<table" in html
+        assert "&amp;type=10-Q" in html
+
+    def test_render_page(self):
+        """Test joining several filing blocks into one email"""
+        blocks = [render_filing("AAPL", FILING), render_filing("MSFT", dict(FILING, form="8-K"))]
+
+        text, html = render_page(blocks)
+
+        # Assert that both filings are in both bodies
+        assert text.count("New ") == 2
+        assert html.startswith("<html>") and html.count("<h3") == 2
@@ -1,10 +1,27 @@
 import pytest
 import os
 import json
+import zipfile
+import requests
 import pandas as pd
 from unittest.mock import patch, MagicMock, mock_open
 
 from app.storage.ticker_store import TickerStore
+from app.services import sec_service
+
+def submissions(*accession_numbers, forms=None):
+    """Builds a submissions JSON holding the given filings, newest first"""
+    count = len(accession_numbers)
+    return {
+        "filings": {
+            "recent": {
+                "accessionNumber": list(accession_numbers),
+                "filingDate": ["2023-01-02"] * count,
+                "reportDate": ["2022-12-31"] * count,
+                "form": forms or ["8-K"] * count
+            }
+        }
+    }
 
 class TestTickerStore:
     """Test cases for the TickerStore class"""
@@ -18,8 +35,8 @@ class TestTickerStore:
     def sample_tickers(self):
         """Fixture for sample ticker data"""
         return [
-            {"ticker": "AAPL", "last_filing": "0000320193-23-000001"},
-            {"ticker": "MSFT", "last_filing": "0000789019-23-000001"}
+            {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+            {"ticker": "MSFT", "cik": "0000789019", "last_filing": "0000789019-23-000001"}
         ]
     
     @patch('app.storage.ticker_store.os.path.exists')
@@ -56,9 +73,8 @@ class TestTickerStore:
             # Assert that the file was not opened
             mock_file_open.assert_not_called()
     
-    @patch('app.storage.ticker_store.open', new_callable=mock_open)
-    @patch('app.storage.ticker_store.json.dump')
-    def test_save_tickers(self, mock_json_dump, mock_file_open, mock_file_path, sample_tickers):
+    @patch('app.storage.ticker_store.write_json_atomic')
+    def test_save_tickers(self, mock_write_json, mock_file_path, sample_tickers):
         """Test saving tickers to the file"""
         # Create a TickerStore
         with patch('app.storage.ticker_store.os.path.exists', return_value=True):
@@ -67,11 +83,8 @@ class TestTickerStore:
             # Call save_tickers
             ticker_store.save_tickers(sample_tickers)
             
-            # Assert that the file was opened for writing
-            mock_file_open.assert_called_with(mock_file_path, 'w')
-            
-            # Assert that the tickers were written to the file
-            mock_json_dump.assert_called_with(sample_tickers, mock_file_open(), indent=2)
+            # Assert that the tickers were written to the file atomically
+            mock_write_json.assert_called_once_with(mock_file_path, sample_tickers)
     
     @patch('app.storage.ticker_store.open', new_callable=mock_open)
     @patch('app.storage.ticker_store.os.path.getsize')
@@ -124,13 +137,17 @@ class TestTickerStore:
             # Assert that the sample tickers were returned
             assert tickers == sample_tickers
     
+    @patch('app.storage.ticker_store.get_cik')
     @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
     @patch('app.storage.ticker_store.TickerStore.save_tickers')
-    def test_refresh_tickers_new_ticker(self, mock_save_tickers, mock_get_all_tickers, mock_file_path):
+    def test_refresh_tickers_new_ticker(self, mock_save_tickers, mock_get_all_tickers, mock_get_cik, mock_file_path):
         """Test refreshing tickers with a new ticker"""
         # Mock get_all_tickers to return an empty list
         mock_get_all_tickers.return_value = []
         
+        # Mock get_cik to resolve the new ticker
+        mock_get_cik.return_value = "0000320193"
+        
         # Create a TickerStore
         with patch('app.storage.ticker_store.os.path.exists', return_value=True):
             ticker_store = TickerStore(file_path=mock_file_path)
@@ -138,8 +155,36 @@ class TestTickerStore:
             # Call refresh_tickers with a new ticker
             ticker_store.refresh_tickers("AAPL")
             
-            # Assert that save_tickers was called with the new ticker
-            mock_save_tickers.assert_called_with([{"ticker": "AAPL", "last_filing": ""}])
+            # Assert that the CIK was resolved once for the new ticker
+            mock_get_cik.assert_called_once_with("AAPL")
+            
+            # Assert that save_tickers was called with the new ticker and its CIK
+            mock_save_tickers.assert_called_with([{"ticker": "AAPL", "cik": "0000320193", "last_filing": "", "last_filing_date": ""}])
+    
+    @patch('app.storage.ticker_store.get_cik')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_refresh_tickers_list(self, mock_save_tickers, mock_get_all_tickers, mock_get_cik, mock_file_path, sample_tickers):
+        """Test refreshing tickers with the list of all subscribed tickers"""
+        # Mock get_all_tickers to return sample tickers
+        mock_get_all_tickers.return_value = sample_tickers
+        mock_get_cik.return_value = "0001318605"
+        
+        # Create a TickerStore
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            # Call refresh_tickers with one existing and one new ticker
+            ticker_store.refresh_tickers(["AAPL", "TSLA"])
+            
+            # Assert that only the new ticker was resolved
+            mock_get_cik.assert_called_once_with("TSLA")
+            
+            # Assert that existing records were kept and the new one added
+            mock_save_tickers.assert_called_with([
+                {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+                {"ticker": "TSLA", "cik": "0001318605", "last_filing": "", "last_filing_date": ""}
+            ])
     
     @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
     @patch('app.storage.ticker_store.TickerStore.save_tickers')
@@ -156,19 +201,18 @@ class TestTickerStore:
             ticker_store.refresh_tickers("AAPL")
             
             # Assert that save_tickers was called with only the AAPL ticker
-            mock_save_tickers.assert_called_with([{"ticker": "AAPL", "last_filing": "0000320193-23-000001"}])
+            mock_save_tickers.assert_called_with([{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"}])
     
-    @patch('app.storage.ticker_store.get_filings')
+    @patch('app.storage.ticker_store.get_submissions')
     @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
     @patch('app.storage.ticker_store.TickerStore.save_tickers')
-    def test_check_filings_no_new_filings(self, mock_save_tickers, mock_get_all_tickers, mock_get_filings, mock_file_path):
+    def test_check_filings_no_new_filings(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
         """Test checking for filings when there are no new filings"""
         # Mock get_all_tickers to return a ticker with a last filing
-        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "last_filing": "0000320193-23-000001"}]
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"}]
         
-        # Mock get_filings to return a DataFrame with the same accessionNumber
-        mock_df = pd.DataFrame({"accessionNumber": ["0000320193-23-000001"]})
-        mock_get_filings.return_value = mock_df
+        # Mock get_submissions to return the same accessionNumber
+        mock_get_submissions.return_value = submissions("0000320193-23-000001")
         
         # Create a TickerStore
         with patch('app.storage.ticker_store.os.path.exists', return_value=True):
@@ -177,8 +221,8 @@ class TestTickerStore:
             # Call check_filings
             new_filings = ticker_store.check_filings()
             
-            # Assert that get_filings was called with the ticker
-            mock_get_filings.assert_called_with("AAPL")
+            # Assert that the filings were fetched by the stored CIK
+            mock_get_submissions.assert_called_with("0000320193", conditional=True)
             
             # Assert that save_tickers was called
             mock_save_tickers.assert_called_once()
@@ -186,17 +230,16 @@ class TestTickerStore:
             # Assert that no new filings were returned
             assert new_filings == {}
     
-    @patch('app.storage.ticker_store.get_filings')
+    @patch('app.storage.ticker_store.get_submissions')
     @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
     @patch('app.storage.ticker_store.TickerStore.save_tickers')
-    def test_check_filings_new_filing(self, mock_save_tickers, mock_get_all_tickers, mock_get_filings, mock_file_path):
+    def test_check_filings_new_filing(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
         """Test checking for filings when there is a new filing"""
         # Mock get_all_tickers to return a ticker with a last filing
-        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "last_filing": "0000320193-23-000001"}]
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"}]
         
-        # Mock get_filings to return a DataFrame with a different accessionNumber
-        mock_df = pd.DataFrame({"accessionNumber": ["0000320193-23-000002"]})
-        mock_get_filings.return_value = mock_df
+        # Mock get_submissions to return a newer accessionNumber
+        mock_get_submissions.return_value = submissions("0000320193-23-000002", "0000320193-23-000001")
         
         # Create a TickerStore
         with patch('app.storage.ticker_store.os.path.exists', return_value=True):
@@ -205,27 +248,27 @@ class TestTickerStore:
             # Call check_filings
             new_filings = ticker_store.check_filings()
             
-            # Assert that get_filings was called with the ticker
-            mock_get_filings.assert_called_with("AAPL")
+            # Assert that the filings were fetched by the stored CIK
+            mock_get_submissions.assert_called_with("0000320193", conditional=True)
             
             # Assert that save_tickers was called with the updated last_filing
             mock_save_tickers.assert_called_once()
+            assert mock_save_tickers.call_args[0][0][0]["last_filing"] == "0000320193-23-000002"
             
             # Assert that the new filing was returned
             assert "AAPL" in new_filings
-            assert new_filings["AAPL"] is mock_df.iloc[0]
+            assert [filing["accessionNumber"] for filing in new_filings["AAPL"]] == ["0000320193-23-000002"]
     
-    @patch('app.storage.ticker_store.get_filings')
+    @patch('app.storage.ticker_store.get_submissions')
     @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
     @patch('app.storage.ticker_store.TickerStore.save_tickers')
-    def test_check_filings_first_filing(self, mock_save_tickers, mock_get_all_tickers, mock_get_filings, mock_file_path):
+    def test_check_filings_first_filing(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
         """Test checking for filings when it's the first filing"""
         # Mock get_all_tickers to return a ticker with an empty last_filing
-        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "last_filing": ""}]
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "cik": "0000320193", "last_filing": ""}]
         
-        # Mock get_filings to return a DataFrame with an accessionNumber
-        mock_df = pd.DataFrame({"accessionNumber": ["0000320193-23-000001"]})
-        mock_get_filings.return_value = mock_df
+        # Mock get_submissions to return an accessionNumber
+        mock_get_submissions.return_value = submissions("0000320193-23-000001")
         
         # Create a TickerStore
         with patch('app.storage.ticker_store.os.path.exists', return_value=True):
@@ -234,11 +277,370 @@ class TestTickerStore:
             # Call check_filings
             new_filings = ticker_store.check_filings()
             
-            # Assert that get_filings was called with the ticker
-            mock_get_filings.assert_called_with("AAPL")
+            # Assert that the baseline was fetched unconditionally
+            mock_get_submissions.assert_called_with("0000320193", conditional=False)
             
             # Assert that save_tickers was called with the updated last_filing
             mock_save_tickers.assert_called_once()
+            assert mock_save_tickers.call_args[0][0][0]["last_filing"] == "0000320193-23-000001"
             
             # Assert that no new filings were returned (first filing is not considered "new")
-            assert new_filings == {}
\ No newline at end of file
+            assert new_filings == {}
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_not_modified(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
+        """Test that an unchanged (304) submissions file counts as no new filing"""
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"}]
+        
+        # Mock get_submissions to report the file as not modified
+        mock_get_submissions.return_value = None
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            new_filings = ticker_store.check_filings()
+            
+            # Assert that nothing changed
+            assert new_filings == {}
+            assert mock_save_tickers.call_args[0][0][0]["last_filing"] == "0000320193-23-000001"
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_shared_cik(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
+        """Test that share classes listed under one CIK are polled with one request"""
+        mock_get_all_tickers.return_value = [
+            {"ticker": "GOOGL", "cik": "0001652044", "last_filing": "0001652044-23-000001"},
+            {"ticker": "GOOG", "cik": "0001652044", "last_filing": ""}
+        ]
+        mock_get_submissions.return_value = submissions("0001652044-23-000002")
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            new_filings = ticker_store.check_filings()
+            
+            # Assert that the CIK was requested once, in full since GOOG has no baseline yet
+            mock_get_submissions.assert_called_once_with("0001652044", conditional=False)
+            
+            # Assert that both tickers were updated from the one response
+            assert list(new_filings) == ["GOOGL"]
+            saved = mock_save_tickers.call_args[0][0]
+            assert [tick["last_filing"] for tick in saved] == ["0001652044-23-000002"] * 2
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_error_clears_validators(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path, fresh_sec_client):
+        """Test that a failed cycle forgets validators so its filings are not hidden next cycle"""
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"}]
+        mock_get_submissions.side_effect = Exception("Test error")
+        fresh_sec_client._validators["https://example.com"] = {"ETag": '"abc"'}
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            with pytest.raises(Exception, match="Test error"):
+                ticker_store.check_filings()
+            
+            # Assert that nothing was saved and the validators were dropped
+            mock_save_tickers.assert_not_called()
+            assert fresh_sec_client._validators == {}
+    
+    @patch('app.storage.ticker_store.get_cik')
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_resolves_missing_cik(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_get_cik, mock_file_path):
+        """Test that a record saved without a CIK gets it resolved and stored"""
+        # Mock get_all_tickers to return a record from before CIKs were stored
+        mock_get_all_tickers.return_value = [{"ticker": "AAPL", "last_filing": "0000320193-23-000001"}]
+        mock_get_cik.return_value = "0000320193"
+        mock_get_submissions.return_value = submissions("0000320193-23-000001")
+        
+        # Create a TickerStore
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            # Call check_filings
+            ticker_store.check_filings()
+            
+            # Assert that the CIK was resolved and used for the filings request
+            mock_get_cik.assert_called_once_with("AAPL")
+            mock_get_submissions.assert_called_once_with("0000320193", conditional=True)
+            
+            # Assert that the CIK was saved with the record
+            saved = mock_save_tickers.call_args[0][0]
+            assert saved[0]["cik"] == "0000320193"
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_concurrent_matches_sequential(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
+        """Test that polling with several workers finds the same filings as one worker"""
+        latest = {
+            "0000320193": "0000320193-23-000002",
+            "0000789019": "0000789019-23-000001",
+            "0001318605": "0001318605-23-000009"
+        }
+        mock_get_submissions.side_effect = lambda cik, conditional: submissions(latest[cik])
+        
+        def records():
+            return [
+                {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+                {"ticker": "MSFT", "cik": "0000789019", "last_filing": "0000789019-23-000001"},
+                {"ticker": "TSLA", "cik": "0001318605", "last_filing": "0001318605-23-000001"}
+            ]
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            # Poll with one worker, then with several
+            mock_get_all_tickers.return_value = records()
+            sequential = ticker_store.check_filings(workers=1)
+            mock_get_all_tickers.return_value = records()
+            concurrent = ticker_store.check_filings(workers=3)
+            
+            # Assert that both found the same new filings in the same order
+            assert list(sequential) == list(concurrent) == ["AAPL", "TSLA"]
+            for ticker in sequential:
+                assert sequential[ticker] == concurrent[ticker]
+            
+            # Assert that both saved the same records
+            assert mock_save_tickers.call_args_list[0] == mock_save_tickers.call_args_list[1]
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_every_new_filing(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
+        """Test that every filing made since the last check is returned, oldest first"""
+        mock_get_all_tickers.return_value = [{
+            "ticker": "AAPL", "cik": "0000320193",
+            "last_filing": "0000320193-23-000001", "last_filing_date": "2023-01-02"
+        }]
+        
+        # Three filings since the last check, one of them an insider form
+        mock_get_submissions.return_value = submissions(
+            "0000320193-23-000004", "0000320193-23-000003", "0000320193-23-000002", "0000320193-23-000001",
+            forms=["10-Q", "4", "8-K", "8-K"]
+        )
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            
+            new_filings = ticker_store.check_filings()
+            
+            # Assert that both non-insider filings were returned, oldest first
+            assert [filing["accessionNumber"] for filing in new_filings["AAPL"]] == [
+                "0000320193-23-000002", "0000320193-23-000004"
+            ]
+            
+            # Assert that the record moved to the newest one
+            saved = mock_save_tickers.call_args[0][0][0]
+            assert saved["last_filing"] == "0000320193-23-000004"
+            assert saved["last_filing_date"] == "2023-01-02"
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_with_feed(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path):
+        """Test that with a feed only the CIKs that filed are polled"""
+        mock_get_all_tickers.return_value = [
+            {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+            {"ticker": "MSFT", "cik": "0000789019", "last_filing": "0000789019-23-000001"},
+            {"ticker": "TSLA", "cik": "0001318605", "last_filing": ""}
+        ]
+        mock_get_submissions.return_value = submissions("0000320193-23-000001")
+        
+        # Mock a feed in which only Apple filed
+        feed = MagicMock()
+        feed.changed_ciks.return_value = {"0000320193", "0000999999"}
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path, feed=feed)
+            
+            ticker_store.check_filings()
+            
+            # Assert that Apple and the ticker without a baseline were polled, Microsoft was not
+            polled = sorted(call.args[0] for call in mock_get_submissions.call_args_list)
+            assert polled == ["0000320193", "0001318605"]
+            
+            # Assert that the feed was committed after the tickers were saved
+            feed.commit.assert_called_once()
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_feed_not_committed_on_error(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path, sample_tickers):
+        """Test that a failed poll leaves the feed where it was, so the next cycle reads it again"""
+        mock_get_all_tickers.return_value = sample_tickers
+        mock_get_submissions.side_effect = requests.Timeout("timed out")
+        feed = MagicMock()
+        feed.changed_ciks.return_value = {"0000320193", "0000789019"}
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path, feed=feed)
+            
+            with pytest.raises(requests.Timeout):
+                ticker_store.check_filings()
+            
+            feed.commit.assert_not_called()
+            mock_save_tickers.assert_not_called()
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_check_filings_feed_falls_back(self, mock_save_tickers, mock_get_all_tickers, mock_get_submissions, mock_file_path, sample_tickers):
+        """Test that every CIK is polled when the feed can't tell what changed"""
+        mock_get_all_tickers.return_value = sample_tickers
+        mock_get_submissions.return_value = submissions("0000320193-23-000001")
+        feed = MagicMock()
+        feed.changed_ciks.return_value = None
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path, feed=feed)
+            
+            ticker_store.check_filings()
+            
+            assert mock_get_submissions.call_count == 2
+    
+    def test_bootstrap_from_submissions_zip(self, temp_ticker_file, temp_dir):
+        """Test setting baselines from a local submissions.zip in one pass"""
+        # Write a ticker file with two tickers waiting for a baseline and one already set
+        with open(temp_ticker_file, 'w') as f:
+            json.dump([
+                {"ticker": "AAPL", "cik": "0000320193", "last_filing": "", "last_filing_date": ""},
+                {"ticker": "MSFT", "cik": "0000789019", "last_filing": "0000789019-23-000001", "last_filing_date": "2023-01-02"},
+                {"ticker": "TSLA", "cik": "0001318605", "last_filing": "", "last_filing_date": ""}
+            ], f)
+        
+        # Build an archive holding Apple, Microsoft and an unwatched company, but not Tesla
+        zip_path = os.path.join(temp_dir, "submissions.zip")
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            archive.writestr("CIK0000320193.json", json.dumps(submissions("0000320193-23-000077", forms=["10-Q"])))
+            archive.writestr("CIK0000789019.json", json.dumps(submissions("0000789019-23-000099")))
+            archive.writestr("CIK0000000001.json", json.dumps(submissions("0000000001-23-000001")))
+        
+        ticker_store = TickerStore(file_path=temp_ticker_file)
+        
+        with patch('app.storage.ticker_store.read_bulk_submissions', wraps=sec_service.read_bulk_submissions) as mock_read:
+            updated = ticker_store.bootstrap(zip_path)
+            
+            # Assert that only the tickers waiting for a baseline were looked up
+            assert list(mock_read.call_args.args[1]) == ["0000320193", "0001318605"]
+        
+        # Assert that Apple got its baseline and the others were left alone
+        assert updated == 1
+        tickers = ticker_store.get_all_tickers()
+        assert tickers[0]["last_filing"] == "0000320193-23-000077"
+        assert tickers[0]["last_filing_date"] == "2023-01-02"
+        assert tickers[1]["last_filing"] == "0000789019-23-000001"
+        assert tickers[2]["last_filing"] == ""
+
+    def test_save_tickers_crash_keeps_old_file(self, temp_ticker_file, sample_tickers):
+        """Test that a save failing part way leaves the previous file readable"""
+        ticker_store = TickerStore(file_path=temp_ticker_file)
+        ticker_store.save_tickers(sample_tickers)
+        
+        # Fail while the new contents are being written
+        with patch('app.storage.json_file.os.fsync', side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                ticker_store.save_tickers([{"ticker": "TSLA"}])
+        
+        # Assert that the old tickers are intact and no temp file was left behind (only the lock file)
+        assert ticker_store.get_all_tickers() == sample_tickers
+        assert sorted(os.listdir(os.path.dirname(temp_ticker_file))) == [
+            os.path.basename(temp_ticker_file), os.path.basename(temp_ticker_file) + ".lock"]
+
+    @patch('app.storage.ticker_store.get_cik', return_value="0000789019")
+    @patch('app.storage.ticker_store.get_submissions')
+    def test_poll_keeps_tickers_added_meanwhile(self, mock_get_submissions, mock_get_cik, temp_ticker_file):
+        """Test that saving a poll keeps journal entries another process appended while it ran"""
+        with open(temp_ticker_file, 'w') as f:
+            json.dump([{"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001", "last_filing_date": "2023-01-02"}], f)
+        ticker_store = TickerStore(file_path=temp_ticker_file, journal_max_bytes=1024 * 1024)
+        #a second store on the same files, like manage.py importing subscribers during the poll
+        other_writer = TickerStore(file_path=temp_ticker_file, journal_max_bytes=1024 * 1024)
+        
+        def poll(cik, conditional=False):
+            other_writer.update_tickers(added=["MSFT"])
+            return submissions("0000320193-23-000002", "0000320193-23-000001")
+        mock_get_submissions.side_effect = poll
+        
+        new_filings = ticker_store.check_filings()
+        
+        # Assert that AAPL moved to its new filing and MSFT, added during the poll, is still there
+        assert [filing["accessionNumber"] for filing in new_filings["AAPL"]] == ["0000320193-23-000002"]
+        tickers = {tick["ticker"]: tick for tick in ticker_store.get_all_tickers()}
+        assert sorted(tickers) == ["AAPL", "MSFT"]
+        assert tickers["AAPL"]["last_filing"] == "0000320193-23-000002"
+        assert tickers["MSFT"]["cik"] == "0000789019"
+    
+    @patch('app.storage.ticker_store.get_submissions')
+    def test_check_filings_without_commit(self, mock_get_submissions, ticker_store_with_data):
+        """Test that check_filings(commit=False) finds the same filings again until commit_filings() is called"""
+        mock_get_submissions.side_effect = lambda cik, conditional=False: {
+            "0000320193": submissions("0000320193-23-000002", "0000320193-23-000001"),
+            "0000789019": submissions("0000789019-23-000001"),
+        }[cik]
+        
+        # Assert that an uncommitted check finds the filing a second time
+        assert list(ticker_store_with_data.check_filings(commit=False)) == ["AAPL"]
+        assert list(ticker_store_with_data.check_filings(commit=False)) == ["AAPL"]
+        
+        # Assert that once committed the filing is the new baseline
+        ticker_store_with_data.commit_filings()
+        assert ticker_store_with_data.check_filings() == {}
+    
+    @patch('app.storage.ticker_store.get_cik', return_value="0000000001")
+    def test_refresh_tickers_journaled(self, mock_get_cik, temp_ticker_file, sample_tickers):
+        """Test that ticker changes are appended to the journal until the next full save"""
+        with open(temp_ticker_file, 'w') as f:
+            json.dump(sample_tickers, f)
+        ticker_store = TickerStore(file_path=temp_ticker_file, journal_max_bytes=1024 * 1024)
+        
+        ticker_store.refresh_tickers(["AAPL", "TSLA"])
+        
+        # Assert that the file is untouched and the journal holds the change
+        with open(temp_ticker_file, 'r') as f:
+            assert json.load(f) == sample_tickers
+        assert [entry["op"] for entry in ticker_store.journal.entries()] == ["remove", "add"]
+        assert [tick["ticker"] for tick in ticker_store.get_all_tickers()] == ["AAPL", "TSLA"]
+        
+        # Assert that a full save folds the journal into the file
+        ticker_store.save_tickers(ticker_store.get_all_tickers())
+        assert ticker_store.journal.entries() == []
+        with open(temp_ticker_file, 'r') as f:
+            assert [tick["ticker"] for tick in json.load(f)] == ["AAPL", "TSLA"]
+
+    @patch('app.storage.ticker_store.TickerStore.get_all_tickers')
+    @patch('app.storage.ticker_store.TickerStore.save_tickers')
+    def test_refresh_tickers_removes_adjacent(self, mock_save_tickers, mock_get_all_tickers, mock_file_path):
+        """Test that removing several tickers in a row doesn't skip any of them"""
+        mock_get_all_tickers.return_value = [{"ticker": ticker, "cik": "0000000001"} for ticker in ["AAPL", "MSFT", "GOOGL", "AMZN"]]
+        
+        with patch('app.storage.ticker_store.os.path.exists', return_value=True):
+            ticker_store = TickerStore(file_path=mock_file_path)
+            ticker_store.refresh_tickers(["AMZN"])
+            
+            # Assert that every unwatched ticker was removed
+            mock_save_tickers.assert_called_once_with([{"ticker": "AMZN", "cik": "0000000001"}])
+
+    @patch('app.storage.ticker_store.get_cik', return_value="0001318605")
+    def test_update_tickers_delta(self, mock_get_cik, ticker_store_with_data):
+        """Test that only the given tickers are added and removed"""
+        ticker_store_with_data.update_tickers(added=["TSLA", "AAPL"], removed=["MSFT"])
+        
+        # Assert that AAPL kept its baseline and only TSLA was resolved
+        assert ticker_store_with_data.get_all_tickers() == [
+            {"ticker": "AAPL", "cik": "0000320193", "last_filing": "0000320193-23-000001"},
+            {"ticker": "TSLA", "cik": "0001318605", "last_filing": "", "last_filing_date": ""},
+        ]
+        mock_get_cik.assert_called_once_with("TSLA")
+        
+        # Assert that an empty delta doesn't rewrite the file
+        with patch.object(TickerStore, 'save_tickers') as mock_save_tickers:
+            ticker_store_with_data.update_tickers()
+            mock_save_tickers.assert_not_called()